@@ -1,25 +1,52 @@
 """Abstract base class for all AI agents."""
 
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
 
 
 class Agent(ABC):
     """
     An abstract base class for an AI agent.
 
-    All agents must implement the get_response method, which takes a user's
-    prompt and returns the agent's response as a string.
+    All agents must implement the stream_response method, which takes a user's
+    prompt and yields the agent's response incrementally as chunks of text.
+    The get_response method is provided for callers that only need the
+    finished response as a single string.
+    """
+
+    last_usage: dict[str, int] | None = None
+    """Token usage reported by the provider for the most recent response.
+
+    Agents whose provider reports usage set this to a dict with
+    "prompt_tokens" and "completion_tokens" once a response has finished.
     """
 
     @abstractmethod
+    def stream_response(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Streams a response to a given prompt.
+
+        Implementations should be async generators that yield each chunk of
+        the response as soon as it is available.
+
+        Args:
+            prompt: The user's input prompt.
+
+        Yields:
+            Successive chunks of the agent's response.
+        """
+        raise NotImplementedError
+
     async def get_response(self, prompt: str) -> str:
         """
         Generates a response to a given prompt.
 
+        This collects the output of stream_response into a single string.
+
         Args:
             prompt: The user's input prompt.
 
         Returns:
             The agent's response as a string.
         """
-        raise NotImplementedError
\ No newline at end of file
+        return "".join([chunk async for chunk in self.stream_response(prompt)])
@@ -0,0 +1,149 @@
+"""An opt-in, persistent cache of agent responses."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+CACHE_PATH_ENV_VAR = "AGENT_TERMINAL_CACHE"
+
+
+class ResponseCache:
+    """
+    A SQLite-backed cache of complete responses, keyed by request.
+
+    Entries are evicted least-recently-used first once the cache holds more
+    than max_entries responses, and expire ttl seconds after being stored.
+    Hit and miss counters are kept for the lifetime of the object so they can
+    be shown in the UI.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_entries: int = 1000,
+        ttl: float | None = 7 * 24 * 60 * 60,
+    ) -> None:
+        """
+        Initializes the ResponseCache, creating the database if needed.
+
+        Args:
+            path: The path of the SQLite database file.
+            max_entries: The maximum number of responses to keep.
+            ttl: The number of seconds a response stays valid, or None to
+                keep responses until they are evicted.
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache | None":
+        """
+        Opens the cache configured by the AGENT_TERMINAL_CACHE variable.
+
+        Returns:
+            A ResponseCache stored at the configured path, or None if caching
+            has not been enabled.
+        """
+        path = os.environ.get(CACHE_PATH_ENV_VAR)
+        if not path:
+            return None
+        return cls(Path(path).expanduser())
+
+    @staticmethod
+    def make_key(
+        agent_name: str, model: str, messages: list[dict[str, str]], params: dict
+    ) -> str:
+        """
+        Builds the cache key for a request.
+
+        Args:
+            agent_name: The class name of the agent making the request.
+            model: The model the request is sent to.
+            messages: The full message list of the request.
+            params: The sampling parameters of the request.
+
+        Returns:
+            A hex digest identifying the request.
+        """
+        payload = json.dumps(
+            [agent_name, model, messages, params], sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """
+        Looks up a cached response and marks it as recently used.
+
+        Args:
+            key: A key built by make_key.
+
+        Returns:
+            The cached response, or None if there is no valid entry.
+        """
+        now = time.time()
+        row = self._db.execute(
+            "SELECT response, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+
+        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """
+        Stores a response, evicting the least recently used ones if full.
+
+        Args:
+            key: A key built by make_key.
+            response: The complete response to cache.
+        """
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created, accessed)"
+            " VALUES (?, ?, ?, ?)",
+            (key, response, now, now),
+        )
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN"
+                " (SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        self._db.commit()
+
+    def __len__(self) -> int:
+        """Returns the number of responses currently stored."""
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return count
+
+    def close(self) -> None:
+        """Closes the underlying database."""
+        self._db.close()
@@ -0,0 +1,158 @@
+"""A process-wide registry of pooled HTTP clients shared by all agents."""
+
+import os
+
+import httpx
+import ollama
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from .timeouts import Timeouts
+
+CONNECTION_LIMITS_ENV_VAR = "AGENT_TERMINAL_CONNECTION_LIMITS"
+
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0
+)
+
+
+class ClientRegistry:
+    """
+    Hands out provider clients that share keep-alive connection pools.
+
+    Creating an SDK client per agent, or per prompt, means every turn opens a
+    new connection (and pays for a TLS handshake when the service is remote).
+    The registry keeps one client per endpoint and credential instead, so
+    every agent talking to the same service reuses warm connections.
+    """
+
+    def __init__(self, limits: httpx.Limits = DEFAULT_LIMITS) -> None:
+        """
+        Initializes the ClientRegistry.
+
+        Args:
+            limits: The connection limits applied to each pooled client.
+        """
+        self.limits = limits
+        self._openai_clients: dict[tuple[str, str | None], AsyncOpenAI] = {}
+        self._ollama_clients: dict[
+            tuple[str | None, Timeouts | None], ollama.AsyncClient
+        ] = {}
+
+    @classmethod
+    def from_env(cls) -> "ClientRegistry":
+        """
+        Creates a registry with the limits in AGENT_TERMINAL_CONNECTION_LIMITS.
+
+        The variable holds comma-separated settings such as
+        "max_connections=50,max_keepalive=20,keepalive_expiry=30"; "none"
+        removes a limit. Settings that are left out keep their defaults of
+        20 connections, 10 of them kept alive for 60 seconds.
+
+        Returns:
+            The configured registry.
+
+        Raises:
+            ValueError: If the variable is malformed.
+        """
+        settings = {
+            "max_connections": DEFAULT_LIMITS.max_connections,
+            "max_keepalive": DEFAULT_LIMITS.max_keepalive_connections,
+            "keepalive_expiry": DEFAULT_LIMITS.keepalive_expiry,
+        }
+        value = os.environ.get(CONNECTION_LIMITS_ENV_VAR, "")
+        for setting in filter(None, value.split(",")):
+            name, _, number = setting.partition("=")
+            name = name.strip()
+            if name not in settings:
+                raise ValueError(
+                    f"Unknown setting in {CONNECTION_LIMITS_ENV_VAR}: {name!r}"
+                )
+            number = number.strip().lower()
+            if number == "none":
+                settings[name] = None
+            elif name == "keepalive_expiry":
+                settings[name] = float(number)
+            else:
+                settings[name] = int(number)
+        return cls(
+            httpx.Limits(
+                max_connections=settings["max_connections"],
+                max_keepalive_connections=settings["max_keepalive"],
+                keepalive_expiry=settings["keepalive_expiry"],
+            )
+        )
+
+    def configure(self, limits: httpx.Limits) -> None:
+        """
+        Sets the connection limits used for clients created from now on.
+
+        Clients that already exist keep their pools; call aclose first to
+        apply new limits to every client.
+
+        Args:
+            limits: The connection limits applied to each pooled client.
+        """
+        self.limits = limits
+
+    def get_openai_client(
+        self, api_key: str, base_url: str | None = None
+    ) -> AsyncOpenAI:
+        """
+        Returns the shared OpenAI client for an API key and base URL.
+
+        Args:
+            api_key: The OpenAI API key.
+            base_url: An optional alternative API endpoint.
+
+        Returns:
+            An AsyncOpenAI client backed by a pooled HTTP client.
+        """
+        key = (api_key, base_url)
+        if key not in self._openai_clients:
+            self._openai_clients[key] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=DefaultAsyncHttpxClient(limits=self.limits),
+                # The request scheduler retries, pacing retries across agents.
+                max_retries=0,
+            )
+        return self._openai_clients[key]
+
+    def get_ollama_client(
+        self, host: str | None = None, timeouts: Timeouts | None = None
+    ) -> ollama.AsyncClient:
+        """
+        Returns the shared Ollama client for a host and timeouts.
+
+        Args:
+            host: The Ollama host, or None to use OLLAMA_HOST or the default.
+            timeouts: The connect and read timeouts of its requests, or None
+                for the SDK's defaults. The Ollama SDK only takes timeouts
+                per client, so agents with different timeouts get their own.
+
+        Returns:
+            An ollama.AsyncClient backed by a pooled HTTP client.
+        """
+        key = (host, timeouts)
+        if key not in self._ollama_clients:
+            options = {"timeout": timeouts.to_httpx()} if timeouts else {}
+            self._ollama_clients[key] = ollama.AsyncClient(
+                host=host, limits=self.limits, **options
+            )
+        return self._ollama_clients[key]
+
+    async def aclose(self) -> None:
+        """Closes every pooled client and forgets it."""
+        openai_clients = list(self._openai_clients.values())
+        ollama_clients = list(self._ollama_clients.values())
+        self._openai_clients.clear()
+        self._ollama_clients.clear()
+        for client in openai_clients:
+            await client.close()
+        for client in ollama_clients:
+            # ollama.AsyncClient does not expose a close method of its own.
+            await client._client.aclose()
+
+
+client_registry = ClientRegistry.from_env()
+"""The registry shared by every agent in the process."""
@@ -0,0 +1,126 @@
+"""Single-flight coalescing of identical requests that are in flight at once."""
+
+import asyncio
+import contextlib
+from typing import AsyncGenerator, AsyncIterator, Callable, Generic, TypeVar
+
+from ..metrics import metrics
+
+T = TypeVar("T")
+
+
+class _Flight(Generic[T]):
+    """One upstream request and the chunks it has produced so far."""
+
+    def __init__(self) -> None:
+        self.chunks: list[T] = []
+        self.error: Exception | None = None
+        self.done = False
+        self.subscribers = 0
+        self.task: asyncio.Task | None = None
+        self._updated = asyncio.Event()
+
+    def notify(self) -> None:
+        """Wakes every subscriber waiting for a chunk or the end."""
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def wait(self) -> None:
+        """Waits until the next chunk arrives or the request ends."""
+        await self._updated.wait()
+
+
+class RequestCoalescer:
+    """
+    Shares one upstream request between identical requests made at once.
+
+    When a broadcast, or several tabs, send the same messages to the same
+    model, the first request goes upstream and the others subscribe to it.
+    Each subscriber receives the whole stream, including the chunks that
+    arrived before it joined, and the error if the request fails. The
+    request is only cancelled once every subscriber has gone.
+
+    Nothing is kept after a request ends; caching finished responses is left
+    to ResponseCache.
+    """
+
+    def __init__(self) -> None:
+        """Initializes a RequestCoalescer with nothing in flight."""
+        self._flights: dict[str, _Flight] = {}
+
+    def __len__(self) -> int:
+        """Returns the number of upstream requests in flight."""
+        return len(self._flights)
+
+    async def stream(
+        self, key: str, open_stream: Callable[[], AsyncGenerator[T, None]]
+    ) -> AsyncIterator[T]:
+        """
+        Streams a request, sharing it with identical requests in flight.
+
+        Args:
+            key: Identifies the request, e.g. a key built by
+                ResponseCache.make_key from the provider, model, messages and
+                sampling parameters.
+            open_stream: Sends the request upstream and yields its chunks.
+                Only called if no identical request is in flight; it runs in
+                a task with the context of the request that started it.
+
+        Yields:
+            Every chunk of the shared response, in order.
+
+        Raises:
+            Exception: Whatever the shared request raised.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._pump(key, flight, open_stream))
+        else:
+            metrics.increment("agent_coalesced_requests_total")
+        flight.subscribers += 1
+        try:
+            index = 0
+            while True:
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    break
+                await flight.wait()
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if not flight.subscribers and not flight.task.done():
+                # Nobody is listening any more: abort the upstream request,
+                # and make sure no new request joins it on its way out.
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+                await asyncio.wait([flight.task])
+
+    async def _pump(
+        self,
+        key: str,
+        flight: _Flight,
+        open_stream: Callable[[], AsyncGenerator[T, None]],
+    ) -> None:
+        """Reads the upstream request into its flight until it ends."""
+        try:
+            async with contextlib.aclosing(open_stream()) as stream:
+                async for chunk in stream:
+                    flight.chunks.append(chunk)
+                    flight.notify()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            # Requests made from now on go upstream again.
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.notify()
+
+
+request_coalescer = RequestCoalescer()
+"""The coalescer shared by every agent in the process."""
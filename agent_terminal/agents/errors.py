@@ -0,0 +1,101 @@
+"""Errors that agents raise when a response cannot be produced."""
+
+
+class AgentError(Exception):
+    """
+    The base class of the errors an agent raises instead of responding.
+
+    Agents used to report failures as markup strings in their response,
+    which made them impossible to tell apart from an answer. They raise
+    these instead, carrying what the UI needs to show the failure and what a
+    caller needs to decide whether to try again.
+    """
+
+    retryable = False
+    """Whether the same request may succeed if it is sent again."""
+    retry_after: float | None = None
+    """How many seconds the service asked to wait before trying again."""
+
+    def __init__(
+        self, message: str, provider: str = "", hint: str | None = None
+    ) -> None:
+        """
+        Initializes the AgentError.
+
+        Args:
+            message: What went wrong, as plain text.
+            provider: The service the agent was talking to, e.g. "OpenAI".
+            hint: An optional suggestion for the user on how to fix it.
+        """
+        super().__init__(message)
+        self.provider = provider
+        self.hint = hint
+
+
+class AgentConnectionError(AgentError):
+    """The agent could not reach its service."""
+
+    retryable = True
+
+
+class AgentTimeoutError(AgentError):
+    """The service did not respond, or did not finish, in time."""
+
+    retryable = True
+
+    def __init__(
+        self,
+        message: str,
+        provider: str = "",
+        hint: str | None = None,
+        stage: str = "total",
+    ) -> None:
+        """
+        Initializes the AgentTimeoutError.
+
+        Args:
+            message: What went wrong, as plain text.
+            provider: The service the agent was talking to.
+            hint: An optional suggestion for the user on how to fix it.
+            stage: The timeout that expired: "connect", "read" or "total".
+        """
+        super().__init__(message, provider, hint)
+        self.stage = stage
+
+
+class ModelNotFoundError(AgentError):
+    """The service does not have the requested model."""
+
+
+class ProviderError(AgentError):
+    """The service answered the request with an error."""
+
+    def __init__(
+        self,
+        message: str,
+        provider: str = "",
+        hint: str | None = None,
+        status_code: int | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        """
+        Initializes the ProviderError.
+
+        Args:
+            message: What went wrong, as plain text.
+            provider: The service the agent was talking to.
+            hint: An optional suggestion for the user on how to fix it.
+            status_code: The HTTP status of the response, if there was one.
+            retry_after: The wait the response's Retry-After header asked
+                for, in seconds, if it had one.
+        """
+        super().__init__(message, provider, hint)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        """Whether the service is rate limiting or had a transient failure."""
+        return self.status_code is not None and (
+            self.status_code == 429 or self.status_code >= 500
+        )
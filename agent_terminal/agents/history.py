@@ -0,0 +1,135 @@
+"""Conversation memory that keeps an agent's context within a token budget."""
+
+from collections import deque
+from typing import Callable
+
+# Approximate per-message overhead of the chat format (role, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens in a piece of text.
+
+    Uses the common rule of thumb of roughly four characters per token for
+    English text, which is close enough for budgeting without depending on a
+    provider-specific tokenizer.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        The estimated token count.
+    """
+    return (len(text) + 3) // 4
+
+
+class ConversationHistory:
+    """
+    The running conversation of a single agent, windowed to a token budget.
+
+    Completed turns are stored together with their token counts, which are
+    computed once when the turn is added. Building the messages for a new
+    request therefore only sums cached counts, and turns that can no longer
+    fit in the budget are dropped, so both memory use and the request size
+    stay bounded however long the session runs.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str | None = None,
+        max_tokens: int = 4000,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ) -> None:
+        """
+        Initializes the ConversationHistory.
+
+        Args:
+            system_prompt: An optional system message sent with every request.
+            max_tokens: The token budget for the messages of a request.
+            count_tokens: The function used to count the tokens in a message.
+        """
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens
+        self._system_tokens = (
+            self._message_tokens(system_prompt) if system_prompt else 0
+        )
+        # Each entry is (user message, assistant message, tokens for both).
+        self._turns: deque[tuple[str, str, int]] = deque()
+        self._turn_tokens = 0
+        self.turns_recorded = 0
+        """The number of turns recorded so far, including dropped ones."""
+
+    def __len__(self) -> int:
+        """Returns the number of completed turns currently remembered."""
+        return len(self._turns)
+
+    @property
+    def last_turn(self) -> tuple[str, str] | None:
+        """The most recent turn as (prompt, response), if still remembered."""
+        if not self._turns:
+            return None
+        prompt, response, _ = self._turns[-1]
+        return prompt, response
+
+    def _message_tokens(self, content: str) -> int:
+        """Counts the tokens a message contributes to a request."""
+        return self.count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+    def build_messages(self, prompt: str) -> list[dict[str, str]]:
+        """
+        Builds the message list for a request, newest turns first to fit.
+
+        The system prompt and the new prompt are always included; as many of
+        the most recent turns as fit in the remaining budget are added between
+        them.
+
+        Args:
+            prompt: The user's new input prompt.
+
+        Returns:
+            The messages to send, in chat-completion format.
+        """
+        budget = self.max_tokens - self._system_tokens - self._message_tokens(prompt)
+        window = []
+        for user_message, assistant_message, tokens in reversed(self._turns):
+            if tokens > budget:
+                break
+            budget -= tokens
+            window.append((user_message, assistant_message))
+
+        messages = []
+        if self.system_prompt:
+            messages.append({"role": "system", "content": self.system_prompt})
+        for user_message, assistant_message in reversed(window):
+            messages.append({"role": "user", "content": user_message})
+            messages.append({"role": "assistant", "content": assistant_message})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def add_turn(self, prompt: str, response: str) -> None:
+        """
+        Records a completed turn and drops turns that no longer fit.
+
+        Only turns that finished successfully should be recorded, so failed or
+        cancelled requests do not leak into later context.
+
+        Args:
+            prompt: The user's input prompt.
+            response: The agent's complete response to it.
+        """
+        tokens = self._message_tokens(prompt) + self._message_tokens(response)
+        self._turns.append((prompt, response, tokens))
+        self._turn_tokens += tokens
+        self.turns_recorded += 1
+
+        budget = self.max_tokens - self._system_tokens
+        while self._turn_tokens > budget and self._turns:
+            _, _, dropped_tokens = self._turns.popleft()
+            self._turn_tokens -= dropped_tokens
+
+    def clear(self) -> None:
+        """Forgets every recorded turn."""
+        self._turns.clear()
+        self._turn_tokens = 0
@@ -1,54 +1,285 @@
 """An agent that uses a local Ollama service to generate responses."""
 
+import contextlib
+import os
+from functools import partial
+from typing import AsyncIterator
+
+import httpx
 import ollama
+
 from .base import Agent
+from .cache import ResponseCache
+from .clients import client_registry
+from .coalescing import RequestCoalescer, request_coalescer
+from .errors import (
+    AgentConnectionError,
+    AgentError,
+    AgentTimeoutError,
+    ModelNotFoundError,
+    ProviderError,
+)
+from .history import ConversationHistory
+from .residency import (
+    DEFAULT_KEEP_ALIVE,
+    KEEP_ALIVE_ENV_VAR,
+    ModelResidency,
+    ollama_residency,
+)
+from .scheduler import RequestScheduler, estimate_request_tokens, request_scheduler
+from .semantic_cache import SemanticCache, default_semantic_cache
+from .timeouts import Timeouts, before_deadline, iterate_before_deadline
+
+_NOT_RUNNING_HINT = (
+    "Please ensure the Ollama application is running on your local machine."
+)
 
 
 class OllamaAgent(Agent):
     """An agent that uses a local Ollama service to generate responses."""
 
-    def __init__(self, model: str = "llama3"):
+    def __init__(
+        self,
+        model: str = "llama3",
+        max_context_tokens: int = 4000,
+        cache: ResponseCache | None = None,
+        semantic_cache: SemanticCache | None = None,
+        timeouts: Timeouts | None = None,
+        scheduler: RequestScheduler | None = None,
+        coalescer: RequestCoalescer | None = None,
+        keep_alive: float | str | None = None,
+        residency: ModelResidency | None = None,
+    ):
         """
         Initializes the OllamaAgent.
 
         Args:
             model: The name of the Ollama model to use (e.g., "llama3", "codellama").
                    This model must be pulled via `ollama pull <model_name>` first.
+            max_context_tokens: The token budget for the conversation history
+                   sent with each prompt.
+            cache: An optional cache that identical requests are answered from.
+            semantic_cache: A cache that rephrased prompts are answered from.
+                   Defaults to the one configured by AGENT_TERMINAL_SEMANTIC_CACHE,
+                   if any.
+            timeouts: How long to wait for Ollama. Defaults to the timeouts
+                   configured by AGENT_TERMINAL_TIMEOUTS.
+            scheduler: Paces and retries the agent's requests. Defaults to
+                   the scheduler shared by every agent.
+            coalescer: Shares identical requests that are in flight at once.
+                   Defaults to the coalescer shared by every agent.
+            keep_alive: How long Ollama keeps the model loaded after a
+                   request, in seconds or as a duration such as "10m"; a
+                   negative value keeps it loaded. Defaults to
+                   AGENT_TERMINAL_OLLAMA_KEEP_ALIVE, or 30 minutes.
+            residency: Tracks which models are loaded. Defaults to the one
+                   shared by every Ollama agent.
         """
         self.model = model
-        # We will check for Ollama service availability in the get_response method
-        # to provide a more dynamic error message in the chat window.
+        self.history = ConversationHistory(max_tokens=max_context_tokens)
+        self.cache = cache
+        self.semantic_cache = (
+            semantic_cache if semantic_cache is not None else default_semantic_cache
+        )
+        self.timeouts = timeouts if timeouts is not None else Timeouts.from_env()
+        self.scheduler = scheduler if scheduler is not None else request_scheduler
+        self.coalescer = coalescer if coalescer is not None else request_coalescer
+        if keep_alive is None:
+            keep_alive = os.environ.get(KEEP_ALIVE_ENV_VAR, DEFAULT_KEEP_ALIVE)
+        self.keep_alive = keep_alive
+        self.residency = residency if residency is not None else ollama_residency
+        # We will check for Ollama service availability in the stream_response
+        # method to provide a more dynamic error message in the chat window.
 
-    async def get_response(self, prompt: str) -> str:
+    async def stream_response(self, prompt: str) -> AsyncIterator[str]:
         """
-        Fetches a response from the local Ollama model.
+        Streams a response from the local Ollama model.
 
         Args:
             prompt: The user's input prompt.
 
-        Returns:
-            The AI's response as a string, or an error message if the service
-            is unavailable or the model call fails.
+        Yields:
+            Chunks of the AI's response as they are generated.
+
+        Raises:
+            AgentError: If the service cannot be reached, does not respond in
+                time, does not have the model or returns an error. Cancelling
+                the consumer closes the HTTP stream.
         """
+        self.last_usage = None
+        messages = self.history.build_messages(prompt)
+        # Ollama is called with the model's default sampling options.
+        request_key = ResponseCache.make_key(
+            type(self).__name__, self.model, messages, {}
+        )
+        cache_key = None
+        if self.cache is not None:
+            cache_key = request_key
+            cached_response = self.cache.get(cache_key)
+            if cached_response is not None:
+                self.history.add_turn(prompt, cached_response)
+                yield cached_response
+                return
+        # The deadline covers everything the response waits for, embedding
+        # the prompt for the semantic cache included.
+        deadline = self.timeouts.deadline()
+        namespace = vector = None
+        if self.semantic_cache is not None:
+            # Only the prompt is compared by meaning; the conversation before
+            # it and the request's settings must match exactly.
+            namespace = ResponseCache.make_key(
+                type(self).__name__, self.model, messages[:-1], {}
+            )
+            vector = await self.semantic_cache.embed(prompt, self.timeouts, deadline)
+            if vector is not None:
+                cached_response = self.semantic_cache.get(namespace, vector)
+                if cached_response is not None:
+                    self.history.add_turn(prompt, cached_response)
+                    yield cached_response
+                    return
+
+        # Ollama has no response length limit, so only the prompt is counted
+        # up front and the response is charged once it is known.
+        cost = estimate_request_tokens(messages)
+        parts = []
+        # The request may be shared by requests with other deadlines, so it
+        # has none of its own: each requester stops reading at its own
+        # deadline, and the request is closed once the last one has.
+        send_request = partial(
+            self.scheduler.stream,
+            "Ollama",
+            self.model,
+            cost,
+            partial(self._stream_chunks, messages, None),
+        )
+        # Identical requests from other tabs share this one. Closing the
+        # response, e.g. on cancellation, leaves it, and the last to leave
+        # closes the request. The model is not unloaded while it responds.
+        async with (
+            self.residency.in_use(self.model, self._unload, self.keep_alive),
+            contextlib.aclosing(
+                self.coalescer.stream(request_key, send_request)
+            ) as stream,
+        ):
+            async for content in iterate_before_deadline(stream, deadline, "Ollama"):
+                parts.append(content)
+                yield content
+        if self.last_usage:
+            self.scheduler.settle(
+                "Ollama",
+                self.model,
+                cost,
+                self.last_usage["prompt_tokens"]
+                + self.last_usage["completion_tokens"],
+            )
+        if parts:
+            response = "".join(parts)
+            self.history.add_turn(prompt, response)
+            if cache_key is not None:
+                self.cache.put(cache_key, response)
+            if vector is not None:
+                self.semantic_cache.put(namespace, vector, response)
+
+    async def warm_up(self) -> None:
+        """
+        Loads the model into memory so the first prompt does not wait for it.
+
+        Does nothing if the model is loaded, or being loaded, already.
+
+        Raises:
+            AgentError: If the service cannot be reached or does not have
+                the model.
+        """
+        await self.residency.warm(
+            self.model, self._load, self._unload, self.keep_alive
+        )
+
+    async def _load(self) -> None:
+        """Asks Ollama to load the model, without generating anything."""
+        client = client_registry.get_ollama_client(timeouts=self.timeouts)
         try:
-            # The ollama library's async client needs to be created inside an
-            # async function's context.
-            client = ollama.AsyncClient()
-            response = await client.chat(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            # A request without a prompt only loads the model.
+            await client.generate(model=self.model, keep_alive=self.keep_alive)
+        except (ollama.ResponseError, httpx.TransportError) as e:
+            raise _to_agent_error(e, self.model) from e
+
+    async def _unload(self, model: str) -> None:
+        """Asks Ollama to unload a model, to make room for this one."""
+        client = client_registry.get_ollama_client(timeouts=self.timeouts)
+        # If this fails the model is unloaded when its keep-alive runs out.
+        with contextlib.suppress(ollama.ResponseError, httpx.TransportError):
+            await client.generate(model=model, keep_alive=0)
+
+    async def _stream_chunks(
+        self, messages: list[dict[str, str]], deadline: float | None
+    ) -> AsyncIterator[str]:
+        """
+        Sends one request to Ollama and yields its content as it is generated.
+
+        Args:
+            messages: The messages to send.
+            deadline: The event loop time to give up at.
+
+        Yields:
+            The non-empty content of each part.
+
+        Raises:
+            AgentError: If the service cannot be reached, does not respond in
+                time, does not have the model or returns an error.
+        """
+        stream = None
+        try:
+            # The shared client keeps connections to Ollama alive between turns.
+            client = client_registry.get_ollama_client(timeouts=self.timeouts)
+            stream = await before_deadline(
+                client.chat(
+                    model=self.model,
+                    messages=messages,
+                    stream=True,
+                    keep_alive=self.keep_alive,
+                ),
+                deadline,
+                "Ollama",
+            )
+            async for part in iterate_before_deadline(stream, deadline, "Ollama"):
+                if part.get("done"):
+                    self.last_usage = {
+                        "prompt_tokens": part.get("prompt_eval_count", 0),
+                        "completion_tokens": part.get("eval_count", 0),
+                    }
+                content = part["message"]["content"]
+                if content:
+                    yield content
+        except (ollama.ResponseError, httpx.TransportError) as e:
+            raise _to_agent_error(e, self.model) from e
+        finally:
+            # Closing the stream ends the request, whether the response
+            # ended, failed or was cancelled.
+            if stream is not None:
+                await stream.aclose()
+
+
+def _to_agent_error(
+    error: ollama.ResponseError | httpx.TransportError, model: str
+) -> AgentError:
+    """Translates an Ollama SDK or transport error into the matching AgentError."""
+    if isinstance(error, ollama.ResponseError):
+        if error.status_code == 404 or "not found" in error.error:
+            return ModelNotFoundError(
+                f"Model '{model}' not found.",
+                "Ollama",
+                f"Please pull it first by running: ollama pull {model}",
             )
-            return response["message"]["content"]
-        except ollama.ResponseError as e:
-            if "model not found" in e.error:
-                return (
-                    f"[bold red]Error: Model '{self.model}' not found.[/bold red]\n\n"
-                    f"Please pull it first by running: `ollama pull {self.model}`"
-                )
-            return f"[bold red]An Ollama API error occurred: {e.error}[/bold red]"
-        except Exception as e:
-            # This broad exception often catches connection errors.
-            return (
-                "[bold red]Error: Could not connect to Ollama service.[/bold red]\n\n"
-                "Please ensure the Ollama application is running on your local machine."
-            )
\ No newline at end of file
+        return ProviderError(
+            f"Ollama API error: {error.error}", "Ollama", status_code=error.status_code
+        )
+    if isinstance(error, httpx.TimeoutException):
+        return AgentTimeoutError(
+            "Ollama did not respond in time.",
+            "Ollama",
+            "Large models can take a while to load; raise the read timeout.",
+            stage="connect" if isinstance(error, httpx.ConnectTimeout) else "read",
+        )
+    return AgentConnectionError(
+        "Could not connect to Ollama service.", "Ollama", _NOT_RUNNING_HINT
+    )
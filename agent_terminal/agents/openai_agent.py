@@ -1,19 +1,62 @@
 """An agent that uses the OpenAI API to generate responses."""
 
+import contextlib
+import email.utils
 import os
-from openai import AsyncOpenAI, OpenAIError
+import time
+from functools import partial
+from typing import AsyncIterator
+
+import httpx
+import openai
+
 from .base import Agent
+from .cache import ResponseCache
+from .clients import client_registry
+from .coalescing import RequestCoalescer, request_coalescer
+from .errors import (
+    AgentConnectionError,
+    AgentError,
+    AgentTimeoutError,
+    ModelNotFoundError,
+    ProviderError,
+)
+from .history import ConversationHistory
+from .scheduler import RequestScheduler, estimate_request_tokens, request_scheduler
+from .semantic_cache import SemanticCache, default_semantic_cache
+from .timeouts import Timeouts, before_deadline, iterate_before_deadline
 
 
 class OpenAIAgent(Agent):
     """An agent that uses the OpenAI API to generate responses."""
 
-    def __init__(self, model: str = "gpt-4o"):
+    def __init__(
+        self,
+        model: str = "gpt-4o",
+        max_context_tokens: int = 4000,
+        cache: ResponseCache | None = None,
+        semantic_cache: SemanticCache | None = None,
+        timeouts: Timeouts | None = None,
+        scheduler: RequestScheduler | None = None,
+        coalescer: RequestCoalescer | None = None,
+    ):
         """
         Initializes the OpenAIAgent.
 
         Args:
             model: The OpenAI model to use (e.g., "gpt-4o", "gpt-3.5-turbo").
+            max_context_tokens: The token budget for the conversation history
+                sent with each prompt.
+            cache: An optional cache that identical requests are answered from.
+            semantic_cache: A cache that rephrased prompts are answered from.
+                Defaults to the one configured by AGENT_TERMINAL_SEMANTIC_CACHE,
+                if any.
+            timeouts: How long to wait for the API. Defaults to the timeouts
+                configured by AGENT_TERMINAL_TIMEOUTS.
+            scheduler: Paces and retries the agent's requests. Defaults to
+                the scheduler shared by every agent.
+            coalescer: Shares identical requests that are in flight at once.
+                Defaults to the coalescer shared by every agent.
 
         Raises:
             ValueError: If the OPENAI_API_KEY environment variable is not set.
@@ -24,33 +67,207 @@ class OpenAIAgent(Agent):
             # This error will be caught during agent creation to provide a
             # graceful message to the user in the UI.
             raise ValueError("OPENAI_API_KEY environment variable not set.")
-        self.client = AsyncOpenAI(api_key=api_key)
+        # Agents with the same key share one client and its connection pool.
+        self.client = client_registry.get_openai_client(api_key)
+        self.history = ConversationHistory(
+            system_prompt="You are a helpful assistant.",
+            max_tokens=max_context_tokens,
+        )
+        self.sampling_params = {"temperature": 0.7, "max_tokens": 1500}
+        self.cache = cache
+        self.semantic_cache = (
+            semantic_cache if semantic_cache is not None else default_semantic_cache
+        )
+        self.timeouts = timeouts if timeouts is not None else Timeouts.from_env()
+        self.scheduler = scheduler if scheduler is not None else request_scheduler
+        self.coalescer = coalescer if coalescer is not None else request_coalescer
 
-    async def get_response(self, prompt: str) -> str:
+    async def stream_response(self, prompt: str) -> AsyncIterator[str]:
         """
-        Fetches a response from the specified OpenAI model.
+        Streams a response from the specified OpenAI model.
 
         Args:
             prompt: The user's input prompt.
 
-        Returns:
-            The AI's response as a string, or an error message if the API
-            call fails.
+        Yields:
+            Chunks of the AI's response as they arrive.
+
+        Raises:
+            AgentError: If the API cannot be reached, does not respond in
+                time or returns an error. Cancelling the consumer closes the
+                HTTP stream.
+        """
+        self.last_usage = None
+        messages = self.history.build_messages(prompt)
+        request_key = ResponseCache.make_key(
+            type(self).__name__, self.model, messages, self.sampling_params
+        )
+        cache_key = None
+        if self.cache is not None:
+            cache_key = request_key
+            cached_response = self.cache.get(cache_key)
+            if cached_response is not None:
+                self.history.add_turn(prompt, cached_response)
+                yield cached_response
+                return
+        # The deadline covers everything the response waits for, embedding
+        # the prompt for the semantic cache included.
+        deadline = self.timeouts.deadline()
+        namespace = vector = None
+        if self.semantic_cache is not None:
+            # Only the prompt is compared by meaning; the conversation before
+            # it and the request's settings must match exactly.
+            namespace = ResponseCache.make_key(
+                type(self).__name__, self.model, messages[:-1], self.sampling_params
+            )
+            vector = await self.semantic_cache.embed(prompt, self.timeouts, deadline)
+            if vector is not None:
+                cached_response = self.semantic_cache.get(namespace, vector)
+                if cached_response is not None:
+                    self.history.add_turn(prompt, cached_response)
+                    yield cached_response
+                    return
+
+        cost = estimate_request_tokens(messages, self.sampling_params["max_tokens"])
+        parts = []
+        # The request may be shared by requests with other deadlines, so it
+        # has none of its own: each requester stops reading at its own
+        # deadline, and the request is closed once the last one has.
+        send_request = partial(
+            self.scheduler.stream,
+            "OpenAI",
+            self.model,
+            cost,
+            partial(self._stream_chunks, messages, None),
+        )
+        # Identical requests from other tabs share this one. Closing the
+        # response, e.g. on cancellation, leaves it, and the last to leave
+        # closes the request.
+        async with contextlib.aclosing(
+            self.coalescer.stream(request_key, send_request)
+        ) as stream:
+            async for content in iterate_before_deadline(stream, deadline, "OpenAI"):
+                parts.append(content)
+                yield content
+        if self.last_usage:
+            self.scheduler.settle(
+                "OpenAI",
+                self.model,
+                cost,
+                self.last_usage["prompt_tokens"]
+                + self.last_usage["completion_tokens"],
+            )
+        if not parts:
+            yield "The AI returned an empty response."
+            return
+        response = "".join(parts)
+        self.history.add_turn(prompt, response)
+        if cache_key is not None:
+            self.cache.put(cache_key, response)
+        if vector is not None:
+            self.semantic_cache.put(namespace, vector, response)
+
+    async def _stream_chunks(
+        self, messages: list[dict[str, str]], deadline: float | None
+    ) -> AsyncIterator[str]:
+        """
+        Sends one request to the API and yields its content as it arrives.
+
+        Args:
+            messages: The messages to send.
+            deadline: The event loop time to give up at.
+
+        Yields:
+            The non-empty content of each chunk.
+
+        Raises:
+            AgentError: If the API cannot be reached, does not respond in
+                time or returns an error.
         """
+        stream = None
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.7,
-                max_tokens=1500,
+            stream = await before_deadline(
+                self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    **self.sampling_params,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=self.timeouts.to_httpx(),
+                ),
+                deadline,
+                "OpenAI",
             )
-            if response.choices:
-                return response.choices[0].message.content or "No response from AI."
-            return "The AI returned an empty response."
-        except OpenAIError as e:
-            return f"[bold red]An OpenAI API error occurred: {e}[/bold red]"
-        except Exception as e:
-            return f"[bold red]An unexpected error occurred: {e}[/bold red]"
\ No newline at end of file
+            async for chunk in iterate_before_deadline(stream, deadline, "OpenAI"):
+                if chunk.usage:
+                    self.last_usage = {
+                        "prompt_tokens": chunk.usage.prompt_tokens,
+                        "completion_tokens": chunk.usage.completion_tokens,
+                    }
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
+        except openai.OpenAIError as e:
+            raise _to_agent_error(e, self.model) from e
+        # Errors while reading the stream come straight from httpx.
+        except httpx.TimeoutException as e:
+            raise AgentTimeoutError(
+                "OpenAI stopped responding.", "OpenAI", stage="read"
+            ) from e
+        except httpx.TransportError as e:
+            raise AgentConnectionError(
+                f"The connection to OpenAI was lost: {e}", "OpenAI"
+            ) from e
+        finally:
+            # Stops the download, whether the response ended, failed or was
+            # cancelled.
+            if stream is not None:
+                await stream.close()
+
+
+def _to_agent_error(error: openai.OpenAIError, model: str) -> AgentError:
+    """Translates an OpenAI SDK error into the matching AgentError."""
+    if isinstance(error, openai.APITimeoutError):
+        return AgentTimeoutError(
+            "OpenAI did not respond in time.", "OpenAI", stage="read"
+        )
+    if isinstance(error, openai.APIConnectionError):
+        return AgentConnectionError(
+            f"Could not connect to OpenAI: {error}",
+            "OpenAI",
+            "Check your network connection and OPENAI_BASE_URL, if set.",
+        )
+    if isinstance(error, openai.NotFoundError):
+        return ModelNotFoundError(f"OpenAI model '{model}' was not found.", "OpenAI")
+    if isinstance(error, openai.APIStatusError):
+        return ProviderError(
+            f"OpenAI API error: {error.message}",
+            "OpenAI",
+            status_code=error.status_code,
+            retry_after=_retry_after(error.response.headers),
+        )
+    return ProviderError(f"OpenAI API error: {error}", "OpenAI")
+
+
+def _retry_after(headers: httpx.Headers) -> float | None:
+    """
+    Reads how long a response asked to wait before retrying, in seconds.
+
+    OpenAI sends retry-after-ms as well as the standard Retry-After, which
+    may be a number of seconds or an HTTP date.
+    """
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                retry_at = email.utils.parsedate_to_datetime(value).timestamp()
+                return max(retry_at - time.time(), 0.0)
+    except (TypeError, ValueError):
+        pass
+    return None
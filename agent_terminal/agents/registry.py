@@ -0,0 +1,285 @@
+"""A registry of agent types, described by metadata and imported on demand."""
+
+import warnings
+from importlib import import_module
+from importlib.metadata import entry_points
+from pathlib import Path
+from typing import Iterator, MutableMapping, NamedTuple, Union
+
+from .base import Agent
+
+ENTRY_POINT_GROUP = "agent_terminal.agents"
+"""The entry point group that agent plugins register their AgentSpec under."""
+
+AgentEntry = Union[str, "type[Agent]"]
+"""An agent class, or the "module:ClassName" path it is imported from."""
+
+
+class AgentInput(NamedTuple):
+    """A value the user provides to create an agent."""
+
+    name: str
+    """The keyword argument the value is passed to the agent class as."""
+    label: str
+    placeholder: str = ""
+    is_path: bool = False
+    """Whether the value is a file path."""
+
+
+MODEL_INPUT = AgentInput("model", "Model Name", "e.g., codellama")
+
+
+class AgentSpec(NamedTuple):
+    """
+    Declares an agent type without importing it.
+
+    Specs live in cheap modules and point at their agent class by import
+    path, so the selection screen and the dispatcher can be built from them
+    while the agent's module, and everything it imports, is only loaded once
+    the agent type is chosen.
+    """
+
+    name: str
+    """The name the agent type is registered and saved under."""
+    target: str
+    """The "module:ClassName" path of the agent class."""
+    presets: tuple[tuple[str, str | None], ...]
+    """The entries offered on the selection screen, as (display name, model).
+    A preset without a model asks the user for one."""
+    inputs: tuple[AgentInput, ...] = (MODEL_INPUT,)
+    """The values the agent class requires, in the order they are saved."""
+    streams: bool = True
+    """Whether responses arrive in chunks rather than all at once."""
+    latency: str = "interactive"
+    """The expected latency class: "interactive" or "slow"."""
+    import_cost: str = "light"
+    """"light" if the agent's module may be imported ahead of time, or
+    "heavy" if importing it loads large libraries or audio devices."""
+    title: str = "{name}: {model}"
+    """The tab title, formatted with the agent's name and its inputs. Path
+    inputs are pathlib.Path objects, e.g. "{audio_path.stem}"."""
+    options: tuple[str, ...] = ()
+    """The optional keyword arguments the agent class accepts besides its
+    inputs: "cache" for a ResponseCache, and "play" if it speaks its
+    responses and can be told not to. Others are never passed."""
+
+    def arguments(self, values: tuple) -> dict:
+        """
+        Pairs the values chosen on the selection screen with their inputs.
+
+        Args:
+            values: The values of the spec's inputs, in order.
+
+        Returns:
+            The keyword arguments to create the agent with.
+
+        Raises:
+            ValueError: If a required value is missing.
+        """
+        arguments = {}
+        for index, agent_input in enumerate(self.inputs):
+            value = values[index] if index < len(values) else None
+            if not value:
+                raise ValueError(f"{agent_input.label} is required for {self.name}.")
+            arguments[agent_input.name] = value
+        return arguments
+
+    def optional_arguments(self, **available) -> dict:
+        """
+        Picks the optional arguments the agent class accepts.
+
+        Args:
+            **available: The optional arguments the caller can provide; those
+                that are None are left out.
+
+        Returns:
+            The keyword arguments to add to those of the agent's inputs.
+        """
+        return {
+            name: value
+            for name, value in available.items()
+            if name in self.options and value is not None
+        }
+
+    def tab_title(self, arguments: dict) -> str:
+        """Returns the title of the tab of an agent created with arguments."""
+        fields = {
+            agent_input.name: (
+                Path(arguments[agent_input.name])
+                if agent_input.is_path
+                else arguments[agent_input.name]
+            )
+            for agent_input in self.inputs
+        }
+        return self.title.format(name=self.name, **fields)
+
+    def describe(self) -> str:
+        """Returns a one-line summary of the agent type's capabilities."""
+        streams = "Streams responses" if self.streams else "Responds all at once"
+        return f"{streams} · {self.latency} latency · {self.import_cost} to load"
+
+
+OPENAI_AGENT = AgentSpec(
+    name="OpenAIAgent",
+    target="agent_terminal.agents.openai_agent:OpenAIAgent",
+    presets=(
+        ("OpenAI: GPT-4o", "gpt-4o"),
+        ("OpenAI: GPT-3.5 Turbo", "gpt-3.5-turbo"),
+    ),
+    options=("cache",),
+)
+
+OLLAMA_AGENT = AgentSpec(
+    name="OllamaAgent",
+    target="agent_terminal.agents.ollama_agent:OllamaAgent",
+    presets=(("Ollama: Llama 3", "llama3"), ("Ollama: Custom", None)),
+    options=("cache",),
+)
+
+VOICE_CLONING_AGENT = AgentSpec(
+    name="VoiceCloningAgent",
+    target="agent_terminal.agents.voice_cloning_agent:VoiceCloningAgent",
+    presets=(("Voice Cloning (GPT-4o)", "gpt-4o"),),
+    inputs=(
+        MODEL_INPUT,
+        AgentInput(
+            "audio_path", "Reference Audio Path", "/path/to/voice.wav", is_path=True
+        ),
+    ),
+    latency="slow",
+    import_cost="heavy",
+    title="VC: {audio_path.stem}",
+    options=("cache", "play"),
+)
+
+BUILTIN_AGENTS = (OPENAI_AGENT, OLLAMA_AGENT, VOICE_CLONING_AGENT)
+
+
+class AgentRegistry(MutableMapping[str, "type[Agent]"]):
+    """
+    Agent classes by name, each imported the first time it is looked up.
+
+    Importing an agent module pulls in its provider SDK (and, for voice
+    agents, the audio stack), which can take longer than drawing the whole
+    UI. The registry holds import paths instead, so only the agent types
+    that are actually created are ever imported. Agent types registered
+    with an AgentSpec also carry the metadata the UI is built from.
+    """
+
+    def __init__(self, entries: dict[str, AgentEntry] | None = None) -> None:
+        """
+        Initializes the AgentRegistry.
+
+        Args:
+            entries: Agent classes, or their "module:ClassName" import paths,
+                by name.
+        """
+        self._entries: dict[str, AgentEntry] = dict(entries or {})
+        self._specs: dict[str, AgentSpec] = {}
+
+    @classmethod
+    def from_entry_points(
+        cls,
+        group: str = ENTRY_POINT_GROUP,
+        builtins: tuple[AgentSpec, ...] = BUILTIN_AGENTS,
+    ) -> "AgentRegistry":
+        """
+        Builds a registry of the built-in agents and every installed plugin.
+
+        Plugins declare an AgentSpec under the agent_terminal.agents entry
+        point group; loading it only imports the module the spec is defined
+        in. A plugin may replace a built-in agent by using its name. Plugins
+        that fail to load are skipped with a warning.
+
+        Args:
+            group: The entry point group to discover plugins in.
+            builtins: The specs registered before any plugin.
+
+        Returns:
+            The populated registry.
+        """
+        registry = cls()
+        for spec in builtins:
+            registry.register(spec)
+        for entry_point in entry_points(group=group):
+            try:
+                spec = entry_point.load()
+                if not isinstance(spec, AgentSpec):
+                    raise TypeError(f"expected an AgentSpec, got {spec!r}")
+                registry.register(spec)
+            except Exception as e:
+                warnings.warn(f"Could not load agent plugin {entry_point.name}: {e}")
+        return registry
+
+    def register(self, spec: AgentSpec) -> None:
+        """Registers an agent type by its spec."""
+        self._specs[spec.name] = spec
+        self._entries[spec.name] = spec.target
+
+    def spec(self, name: str) -> AgentSpec:
+        """
+        Returns the spec of an agent type.
+
+        Agent types registered without a spec get a default one that takes a
+        model name.
+        """
+        if name in self._specs:
+            return self._specs[name]
+        return AgentSpec(name=name, target="", presets=())
+
+    def specs(self) -> list[AgentSpec]:
+        """Returns the specs of every agent type, in registration order."""
+        return [self.spec(name) for name in self._entries]
+
+    def __getitem__(self, name: str) -> "type[Agent]":
+        """Returns an agent class, importing its module if necessary."""
+        entry = self._entries[name]
+        if isinstance(entry, str):
+            module_name, _, class_name = entry.partition(":")
+            entry = self._entries[name] = getattr(
+                import_module(module_name), class_name
+            )
+        return entry
+
+    def __setitem__(self, name: str, entry: AgentEntry) -> None:
+        """Registers an agent class or its import path under a name."""
+        self._entries[name] = entry
+
+    def __delitem__(self, name: str) -> None:
+        """Removes an agent type."""
+        del self._entries[name]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the names of the agent types."""
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        """Returns the number of agent types."""
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Removes every agent type without importing anything."""
+        self._entries.clear()
+
+    def copy(self) -> dict[str, AgentEntry]:
+        """Returns the entries without importing anything."""
+        return dict(self._entries)
+
+    def is_loaded(self, name: str) -> bool:
+        """Returns whether an agent type's class has been imported."""
+        return not isinstance(self._entries[name], str)
+
+
+def prewarm(registry: AgentRegistry) -> None:
+    """
+    Imports the light agent modules ahead of time so creating an agent is quick.
+
+    Agent types whose import cost is "heavy" are left alone. This blocks for
+    as long as the imports take; run it in a worker thread once the UI is up.
+
+    Args:
+        registry: The registry whose agent types to import.
+    """
+    for spec in registry.specs():
+        if spec.import_cost != "heavy" and spec.name in registry:
+            registry[spec.name]
@@ -0,0 +1,241 @@
+"""Tracks which local models are loaded, and keeps their number bounded."""
+
+import asyncio
+import contextlib
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import AsyncIterator, Awaitable, Callable
+
+MAX_MODELS_ENV_VAR = "AGENT_TERMINAL_OLLAMA_MAX_MODELS"
+KEEP_ALIVE_ENV_VAR = "AGENT_TERMINAL_OLLAMA_KEEP_ALIVE"
+
+DEFAULT_KEEP_ALIVE = "30m"
+"""How long Ollama keeps a model loaded after its last request, by default.
+
+Ollama's own default is five minutes, which unloads a model between turns
+of an unhurried conversation.
+"""
+
+COLD = "cold"
+LOADING = "loading"
+LOADED = "loaded"
+FAILED = "failed"
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+Unload = Callable[[str], Awaitable[None]]
+"""Unloads the model of the given name."""
+
+
+def keep_alive_seconds(keep_alive: float | str) -> float | None:
+    """
+    Converts an Ollama keep_alive value to seconds.
+
+    Args:
+        keep_alive: A number of seconds or a duration such as "10m" or
+            "1h30m". Negative values keep the model loaded forever.
+
+    Returns:
+        The number of seconds, or None for forever.
+
+    Raises:
+        ValueError: If keep_alive is not a duration.
+    """
+    if isinstance(keep_alive, str):
+        text = keep_alive.strip()
+        try:
+            seconds = float(text)
+        except ValueError:
+            parts = _DURATION_PART.findall(text.lstrip("-"))
+            if not parts or "".join(map("".join, parts)) != text.lstrip("-"):
+                raise ValueError(f"Invalid keep_alive duration: {keep_alive!r}")
+            seconds = sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+            if text.startswith("-"):
+                seconds = -seconds
+    else:
+        seconds = float(keep_alive)
+    return None if seconds < 0 else seconds
+
+
+class ModelResidency:
+    """
+    Which models a local service has loaded, shared by every agent using it.
+
+    Loading a model's weights can take longer than generating a whole
+    response, and a service that runs out of memory evicts one model to
+    load the next. The residency warms models ahead of their first prompt,
+    remembers when their keep-alive will unload them, and keeps at most
+    max_loaded models loaded by unloading the least recently used idle one
+    before another is loaded. Listeners are told whenever a model's state
+    changes, so the UI can show it.
+    """
+
+    def __init__(self, max_loaded: int | None = 2) -> None:
+        """
+        Initializes the ModelResidency.
+
+        Args:
+            max_loaded: The most models to keep loaded at once, or None for
+                no limit.
+        """
+        self.max_loaded = max_loaded
+        self._states: dict[str, str] = {}
+        # Loaded models, least recently used first, with when they expire.
+        self._expiry: OrderedDict[str, float | None] = OrderedDict()
+        self._in_use: Counter[str] = Counter()
+        self._warming: dict[str, asyncio.Task] = {}
+        self._listeners: list[Callable[[str, str], None]] = []
+
+    @classmethod
+    def from_env(cls) -> "ModelResidency":
+        """
+        Creates a residency limited by AGENT_TERMINAL_OLLAMA_MAX_MODELS.
+
+        The variable holds the most models to keep loaded, or "none" for no
+        limit. It defaults to 2.
+        """
+        value = os.environ.get(MAX_MODELS_ENV_VAR, "2").strip().lower()
+        return cls(None if value == "none" else int(value))
+
+    def state(self, model: str) -> str:
+        """Returns whether a model is cold, loading, loaded or failed to load."""
+        state = self._states.get(model, COLD)
+        if state == LOADED:
+            expires = self._expiry.get(model)
+            if expires is not None and time.monotonic() >= expires:
+                self._set(model, COLD)
+                return COLD
+        return state
+
+    def loaded(self) -> list[str]:
+        """Returns the loaded models, least recently used first."""
+        return [model for model in list(self._expiry) if self.state(model) == LOADED]
+
+    def add_listener(self, listener: Callable[[str, str], None]) -> None:
+        """Calls listener with a model and its new state whenever it changes."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, str], None]) -> None:
+        """Stops calling a listener added with add_listener, if it was."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    async def warm(
+        self,
+        model: str,
+        load: Callable[[], Awaitable[None]],
+        unload: Unload,
+        keep_alive: float | str,
+    ) -> None:
+        """
+        Loads a model, unless it is loaded or being loaded already.
+
+        Args:
+            model: The model to load.
+            load: Loads the model.
+            unload: Unloads another model, to stay within max_loaded.
+            keep_alive: How long the service keeps the model loaded.
+
+        Raises:
+            Exception: Whatever load raised; the model's state is "failed".
+        """
+        if self.state(model) == LOADED:
+            self._touch(model, keep_alive)
+            return
+        task = self._warming.get(model)
+        if task is None:
+            self._set(model, LOADING)
+            task = self._warming[model] = asyncio.create_task(
+                self._warm(model, load, unload, keep_alive)
+            )
+        await asyncio.shield(task)
+
+    @contextlib.asynccontextmanager
+    async def in_use(
+        self, model: str, unload: Unload, keep_alive: float | str
+    ) -> AsyncIterator[None]:
+        """
+        Marks a model as in use for the duration of a request.
+
+        A model in use is never unloaded to make room for another. If the
+        model is not loaded, room is made for it, as the request loads it.
+
+        Args:
+            model: The model the request is for.
+            unload: Unloads another model, to stay within max_loaded.
+            keep_alive: How long the service keeps the model loaded.
+        """
+        self._in_use[model] += 1
+        try:
+            if self.state(model) not in (LOADED, LOADING):
+                self._set(model, LOADING)
+                await self._make_room(model, unload)
+            yield
+        except Exception:
+            if self.state(model) == LOADING and model not in self._warming:
+                self._set(model, FAILED)
+            raise
+        except BaseException:
+            if self.state(model) == LOADING and model not in self._warming:
+                self._set(model, COLD)
+            raise
+        else:
+            self._touch(model, keep_alive)
+        finally:
+            self._in_use[model] -= 1
+            if not self._in_use[model]:
+                del self._in_use[model]
+
+    async def _warm(
+        self,
+        model: str,
+        load: Callable[[], Awaitable[None]],
+        unload: Unload,
+        keep_alive: float | str,
+    ) -> None:
+        """Loads a model, recording its state, for warm."""
+        try:
+            await self._make_room(model, unload)
+            await load()
+        except BaseException:
+            self._set(model, FAILED)
+            raise
+        else:
+            self._touch(model, keep_alive)
+        finally:
+            del self._warming[model]
+
+    async def _make_room(self, model: str, unload: Unload) -> None:
+        """Unloads idle models until model fits within max_loaded."""
+        if self.max_loaded is None:
+            return
+        resident = [loaded for loaded in self.loaded() if loaded != model]
+        idle = [loaded for loaded in resident if not self._in_use[loaded]]
+        for victim in idle[: max(len(resident) + 1 - self.max_loaded, 0)]:
+            del self._expiry[victim]
+            self._set(victim, COLD)
+            await unload(victim)
+
+    def _touch(self, model: str, keep_alive: float | str) -> None:
+        """Marks a model as loaded and just used."""
+        seconds = keep_alive_seconds(keep_alive)
+        self._expiry[model] = None if seconds is None else time.monotonic() + seconds
+        self._expiry.move_to_end(model)
+        self._set(model, LOADED)
+
+    def _set(self, model: str, state: str) -> None:
+        """Records a model's state and tells the listeners if it changed."""
+        if self._states.get(model, COLD) == state:
+            return
+        self._states[model] = state
+        if state != LOADED:
+            self._expiry.pop(model, None)
+        for listener in list(self._listeners):
+            listener(model, state)
+
+
+ollama_residency = ModelResidency.from_env()
+"""The residency of the models of the local Ollama service."""
@@ -0,0 +1,384 @@
+"""A shared scheduler that paces, queues and retries requests to providers."""
+
+import asyncio
+import os
+import random
+from collections import OrderedDict, deque
+from typing import AsyncGenerator, AsyncIterator, Callable, NamedTuple, TypeVar
+
+from ..metrics import metrics, request_labels
+from .errors import AgentError
+from .history import MESSAGE_OVERHEAD_TOKENS, estimate_tokens
+from .timeouts import before_deadline
+
+RATE_LIMITS_ENV_VAR = "AGENT_TERMINAL_RATE_LIMITS"
+
+T = TypeVar("T")
+
+
+class RateLimit(NamedTuple):
+    """A provider's quota; None leaves that dimension unlimited."""
+
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+
+
+class RetryPolicy(NamedTuple):
+    """How failed requests are retried."""
+
+    max_attempts: int = 4
+    """The most times a request is sent, including the first."""
+    base_delay: float = 0.5
+    """The backoff ceiling, in seconds, after the first failure."""
+    max_delay: float = 30.0
+    """The largest backoff ceiling, in seconds."""
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """
+        Returns how long to wait before sending a request again.
+
+        The wait is drawn uniformly below an exponentially growing ceiling
+        ("full jitter"), so clients that failed together do not retry
+        together. If the provider said when to retry, the wait is at least
+        that long.
+
+        Args:
+            attempt: The number of attempts that have failed, from 1.
+            retry_after: The wait the provider asked for, if any.
+        """
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after + random.uniform(0, self.base_delay))
+        return delay
+
+
+class TokenBucket:
+    """Refills continuously at a per-minute rate, up to one minute's worth."""
+
+    def __init__(self, per_minute: float, now: float) -> None:
+        """
+        Initializes a full TokenBucket.
+
+        Args:
+            per_minute: The number of tokens added per minute.
+            now: The current event loop time.
+        """
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        """Adds the tokens accrued since the last update."""
+        accrued = (now - self.updated) * self.rate
+        self.tokens = min(self.capacity, self.tokens + accrued)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Returns how long until amount tokens are available."""
+        self._refill(now)
+        # A request larger than the bucket waits for a full bucket instead.
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing, 0) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        """Removes tokens; the bucket may go into debt for oversized requests."""
+        self._refill(now)
+        self.tokens -= amount
+
+    def give_back(self, amount: float) -> None:
+        """Returns tokens that were reserved but not used."""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _Lane:
+    """The buckets and the queue of one provider and model."""
+
+    def __init__(self, limit: RateLimit, now: float) -> None:
+        self.limit = limit
+        self.requests = (
+            TokenBucket(limit.requests_per_minute, now)
+            if limit.requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket(limit.tokens_per_minute, now)
+            if limit.tokens_per_minute
+            else None
+        )
+        self.blocked_until = 0.0
+        # Waiting requests by flow; flows are served round-robin.
+        self.flows: OrderedDict[str, deque[tuple[asyncio.Future, int]]] = (
+            OrderedDict()
+        )
+        self.dispatcher: asyncio.Task | None = None
+
+    def wait_time(self, cost: int, now: float) -> float:
+        """Returns how long until a request of cost tokens may be sent."""
+        wait = self.blocked_until - now
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(cost, now))
+        return wait
+
+    def take(self, cost: int, now: float) -> None:
+        """Charges a request that is being sent."""
+        if self.requests is not None:
+            self.requests.take(1, now)
+        if self.tokens is not None:
+            self.tokens.take(cost, now)
+
+
+class RequestScheduler:
+    """
+    Paces requests to stay within each provider's quota, and retries them.
+
+    Every provider and model has its own lane with a requests-per-minute and
+    a tokens-per-minute token bucket. A request that fits is sent at once;
+    otherwise it queues, and queued requests are granted round-robin across
+    flows (tabs) as the buckets refill. A request that fails with a
+    retryable error, such as a 429 or a 5xx, is retried with jittered
+    exponential backoff that honors Retry-After, and the whole lane pauses
+    for that long so other requests do not run into the same limit.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, RateLimit] | None = None,
+        retry: RetryPolicy = RetryPolicy(),
+    ) -> None:
+        """
+        Initializes the RequestScheduler.
+
+        Args:
+            limits: Quotas keyed by "provider" or "provider/model"; a model's
+                own quota takes precedence over its provider's. Providers
+                without one are not paced.
+            retry: How failed requests are retried.
+        """
+        self.limits = {key.lower(): limit for key, limit in (limits or {}).items()}
+        self.retry = retry
+        self._lanes: dict[tuple[str, str], _Lane] = {}
+
+    @classmethod
+    def from_env(cls) -> "RequestScheduler":
+        """
+        Creates a scheduler with the quotas set by AGENT_TERMINAL_RATE_LIMITS.
+
+        The variable holds comma-separated quotas of the form
+        "provider[/model]=requests_per_minute/tokens_per_minute", e.g.
+        "openai=500/30000,openai/gpt-4o=100/none". Unset, nothing is paced
+        but failed requests are still retried.
+
+        Raises:
+            ValueError: If the variable is malformed.
+        """
+        limits = {}
+        settings = os.environ.get(RATE_LIMITS_ENV_VAR, "").split(",")
+        for setting in filter(None, settings):
+            key, _, value = setting.partition("=")
+            requests, _, tokens = value.partition("/")
+            try:
+                limits[key.strip()] = RateLimit(
+                    _per_minute(requests), _per_minute(tokens)
+                )
+            except ValueError:
+                raise ValueError(
+                    f"Invalid quota in {RATE_LIMITS_ENV_VAR}: {setting!r}"
+                ) from None
+        return cls(limits)
+
+    def limit(self, provider: str, model: str) -> RateLimit:
+        """Returns the quota that applies to a provider and model."""
+        provider = provider.lower()
+        return self.limits.get(
+            f"{provider}/{model.lower()}", self.limits.get(provider, RateLimit())
+        )
+
+    async def acquire(
+        self, provider: str, model: str, cost: int, deadline: float | None = None
+    ) -> None:
+        """
+        Waits until a request may be sent, and charges it to the quota.
+
+        Requests that have to wait are queued by the tab they come from, as
+        recorded in request_labels, and the tabs take turns.
+
+        Args:
+            provider: The service the request goes to.
+            model: The model the request is for.
+            cost: The tokens the request is expected to use.
+            deadline: The event loop time to give up waiting at.
+
+        Raises:
+            AgentTimeoutError: If the deadline passes while waiting.
+        """
+        lane = self._lane(provider, model)
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if not lane.flows and lane.wait_time(cost, now) <= 0:
+            lane.take(cost, now)
+            return
+        waiter = loop.create_future()
+        flow = dict(request_labels.get()).get("tab", "")
+        lane.flows.setdefault(flow, deque()).append((waiter, cost))
+        if lane.dispatcher is None:
+            lane.dispatcher = asyncio.create_task(self._dispatch(lane))
+        try:
+            await before_deadline(waiter, deadline, provider)
+        except BaseException:
+            # Timed out or cancelled: leave the queue instead of holding it up.
+            queue = lane.flows.get(flow)
+            if queue is not None and (waiter, cost) in queue:
+                queue.remove((waiter, cost))
+                if not queue:
+                    del lane.flows[flow]
+            if not lane.flows and lane.dispatcher is not None:
+                lane.dispatcher.cancel()
+                lane.dispatcher = None
+            raise
+        metrics.observe(
+            "agent_rate_limit_wait_seconds", loop.time() - now, provider=provider
+        )
+
+    def settle(self, provider: str, model: str, reserved: int, used: int) -> None:
+        """
+        Corrects a request's charge once its actual token use is known.
+
+        Args:
+            provider: The service the request went to.
+            model: The model the request was for.
+            reserved: The cost the request was acquired with.
+            used: The tokens it actually used.
+        """
+        lane = self._lane(provider, model)
+        if lane.tokens is None:
+            return
+        if used < reserved:
+            lane.tokens.give_back(reserved - used)
+        else:
+            lane.tokens.take(used - reserved, asyncio.get_running_loop().time())
+
+    async def stream(
+        self,
+        provider: str,
+        model: str,
+        cost: int,
+        open_stream: Callable[[], AsyncGenerator[T, None]],
+        deadline: float | None = None,
+    ) -> AsyncIterator[T]:
+        """
+        Sends a streaming request when the quota allows, retrying failures.
+
+        A request is only retried if it failed before yielding anything, so
+        a response is never repeated or spliced together from two attempts.
+
+        Args:
+            provider: The service the request goes to.
+            model: The model the request is for.
+            cost: The tokens the request is expected to use.
+            open_stream: Returns an async generator that sends the request
+                and yields its response; called once per attempt.
+            deadline: The event loop time after which no more waiting or
+                retrying is done.
+
+        Yields:
+            The items of the successful attempt's stream.
+
+        Raises:
+            AgentError: The last error, once it is not retryable, the
+                request has been tried RetryPolicy.max_attempts times or the
+                next retry would miss the deadline.
+        """
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            attempt += 1
+            await self.acquire(provider, model, cost, deadline)
+            started = False
+            stream = open_stream()
+            try:
+                async for item in stream:
+                    started = True
+                    yield item
+                return
+            except AgentError as e:
+                if started or not e.retryable or attempt >= self.retry.max_attempts:
+                    raise
+                delay = self.retry.delay(attempt, e.retry_after)
+                if deadline is not None and loop.time() + delay >= deadline:
+                    raise
+                if e.retry_after is not None:
+                    # The provider is rate limiting: hold back the whole lane.
+                    lane = self._lane(provider, model)
+                    lane.blocked_until = max(lane.blocked_until, loop.time() + delay)
+            finally:
+                await stream.aclose()
+            metrics.increment("agent_retries_total", provider=provider)
+            await asyncio.sleep(delay)
+
+    def _lane(self, provider: str, model: str) -> _Lane:
+        """Returns the lane of a provider and model, creating it if needed."""
+        key = (provider.lower(), model.lower())
+        lane = self._lanes.get(key)
+        if lane is None:
+            now = asyncio.get_running_loop().time()
+            lane = self._lanes[key] = _Lane(self.limit(provider, model), now)
+        return lane
+
+    async def _dispatch(self, lane: _Lane) -> None:
+        """Grants queued requests round-robin across flows as quota frees up."""
+        loop = asyncio.get_running_loop()
+        try:
+            while lane.flows:
+                flow, queue = next(iter(lane.flows.items()))
+                waiter, cost = queue[0]
+                if not waiter.done():
+                    wait = lane.wait_time(cost, loop.time())
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                        continue
+                    lane.take(cost, loop.time())
+                    waiter.set_result(None)
+                # The flow goes to the back of the line, or leaves it if empty.
+                queue.popleft()
+                if queue:
+                    lane.flows.move_to_end(flow)
+                else:
+                    del lane.flows[flow]
+        finally:
+            # A cancelled dispatcher may already have been replaced.
+            if lane.dispatcher is asyncio.current_task():
+                lane.dispatcher = None
+
+
+def estimate_request_tokens(
+    messages: list[dict[str, str]], completion_tokens: int = 0
+) -> int:
+    """
+    Estimates the tokens a chat request counts against a tokens-per-minute quota.
+
+    Args:
+        messages: The messages sent with the request.
+        completion_tokens: The most tokens the response may have, which
+            providers reserve against the quota up front.
+    """
+    prompt_tokens = sum(
+        estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
+    return prompt_tokens + completion_tokens
+
+
+def _per_minute(value: str) -> float | None:
+    """Parses a per-minute quota, where "none" or nothing means unlimited."""
+    value = value.strip().lower()
+    if value in ("", "none"):
+        return None
+    return float(value)
+
+
+request_scheduler = RequestScheduler.from_env()
+"""The scheduler shared by every agent in the process."""
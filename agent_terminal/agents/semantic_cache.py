@@ -0,0 +1,370 @@
+"""An opt-in cache that answers rephrased prompts by their meaning."""
+
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Callable, NamedTuple
+
+import httpx
+import numpy as np
+import ollama
+
+from ..metrics import metrics
+from .clients import client_registry
+from .errors import AgentError
+from .timeouts import Timeouts, before_deadline
+
+SEMANTIC_CACHE_ENV_VAR = "AGENT_TERMINAL_SEMANTIC_CACHE"
+
+Embed = Callable[[str, "Timeouts | None"], Awaitable[np.ndarray]]
+"""Returns the embedding vector of a piece of text, within the timeouts given."""
+
+
+class SemanticMatch(NamedTuple):
+    """A cached response and how similar its prompt is to the one looked up."""
+
+    similarity: float
+    response: str
+
+
+class VectorIndex:
+    """
+    Unit vectors in one float32 matrix, searched by cosine similarity.
+
+    Each vector belongs to a namespace and carries a response. A search is
+    one matrix-vector product over every stored vector, masked to the
+    namespace: about 30ms at 100k 768-dimensional entries, with no index
+    structure to maintain. Once the vectors, responses, namespaces and
+    bookkeeping would take more than max_bytes, the least recently used
+    entries are overwritten, and namespaces left without entries are
+    forgotten.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        """
+        Initializes an empty VectorIndex.
+
+        Args:
+            max_bytes: The most memory, in bytes, the entries may take.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._vectors: np.ndarray | None = None
+        # Per entry: its namespace, when it was last used and its response.
+        self._namespaces = np.empty(0, dtype=np.int64)
+        self._last_used = np.empty(0, dtype=np.float64)
+        self._responses: list[str] = []
+        self._response_bytes = 0
+        # The namespaces that have entries, by ID, and how many each has.
+        self._namespace_ids: dict[str, int] = {}
+        self._namespace_names: dict[int, str] = {}
+        self._namespace_entries: Counter[int] = Counter()
+        self._namespace_bytes = 0
+        self._next_namespace_id = 0
+
+    def __len__(self) -> int:
+        """Returns the number of entries."""
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        """Roughly the memory, in bytes, taken by the entries."""
+        if self._vectors is None:
+            return 0
+        per_entry = self._vectors.itemsize * self._vectors.shape[1] + 16
+        return self.size * per_entry + self._response_bytes + self._namespace_bytes
+
+    def add(self, namespace: str, vector: np.ndarray, response: str) -> None:
+        """
+        Stores a response under a vector, evicting old entries if full.
+
+        Args:
+            namespace: Only searches in the same namespace find the entry.
+            vector: The embedding of the prompt the response answers.
+            response: The response.
+
+        Raises:
+            ValueError: If vector has a different dimension from the others.
+        """
+        vector = _normalize(vector)
+        if self._vectors is None:
+            self._vectors = np.empty((0, len(vector)), dtype=np.float32)
+        if len(vector) != self._vectors.shape[1]:
+            raise ValueError(
+                f"Expected a vector of dimension {self._vectors.shape[1]}, "
+                f"got {len(vector)}."
+            )
+        entry_bytes = (
+            self._vectors.itemsize * len(vector) + 16 + len(response.encode("utf-8"))
+        )
+        if entry_bytes + self._new_namespace_bytes(namespace) > self.max_bytes:
+            return
+
+        while self.size and (
+            self.nbytes + entry_bytes + self._new_namespace_bytes(namespace)
+            > self.max_bytes
+        ):
+            self._remove(int(np.argmin(self._last_used[: self.size])))
+        if self.size == len(self._vectors):
+            self._grow()
+        namespace_id = self._namespace_ids.get(namespace)
+        if namespace_id is None:
+            namespace_id = self._next_namespace_id
+            self._next_namespace_id += 1
+            self._namespace_ids[namespace] = namespace_id
+            self._namespace_names[namespace_id] = namespace
+            self._namespace_bytes += _namespace_bytes(namespace)
+        self._namespace_entries[namespace_id] += 1
+        slot = self.size
+        self.size += 1
+        self._vectors[slot] = vector
+        self._namespaces[slot] = namespace_id
+        self._last_used[slot] = time.monotonic()
+        self._responses.append(response)
+        self._response_bytes += len(response.encode("utf-8"))
+
+    def search(
+        self, namespace: str, vector: np.ndarray, k: int = 1
+    ) -> list[SemanticMatch]:
+        """
+        Finds the entries of a namespace most similar to a vector.
+
+        The entries found are marked as recently used.
+
+        Args:
+            namespace: The namespace to search.
+            vector: The embedding of the prompt being looked up.
+            k: The most matches to return.
+
+        Returns:
+            Up to k matches, most similar first.
+        """
+        namespace_id = self._namespace_ids.get(namespace)
+        if namespace_id is None or not self.size:
+            return []
+        scores = self._vectors[: self.size] @ _normalize(vector)
+        scores[self._namespaces[: self.size] != namespace_id] = -np.inf
+        k = min(k, self.size)
+        if k == 1:
+            best = np.array([np.argmax(scores)])
+        else:
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+        best = best[np.isfinite(scores[best])]
+        self._last_used[best] = time.monotonic()
+        return [
+            SemanticMatch(float(scores[slot]), self._responses[slot]) for slot in best
+        ]
+
+    def _grow(self) -> None:
+        """Doubles the room for entries."""
+        rows = max(2 * len(self._vectors), 64)
+        vectors = np.empty((rows, self._vectors.shape[1]), dtype=np.float32)
+        vectors[: self.size] = self._vectors[: self.size]
+        self._vectors = vectors
+        self._namespaces = np.resize(self._namespaces, rows)
+        self._last_used = np.resize(self._last_used, rows)
+
+    def _new_namespace_bytes(self, namespace: str) -> int:
+        """Returns the memory a namespace would add, if it has no entries yet."""
+        if namespace in self._namespace_ids:
+            return 0
+        return _namespace_bytes(namespace)
+
+    def _remove(self, slot: int) -> None:
+        """Removes an entry, moving the last entry into its slot."""
+        last = self.size - 1
+        self._response_bytes -= len(self._responses[slot].encode("utf-8"))
+        namespace_id = int(self._namespaces[slot])
+        self._namespace_entries[namespace_id] -= 1
+        if not self._namespace_entries[namespace_id]:
+            # Each conversation gets its own namespace, so they would pile up.
+            del self._namespace_entries[namespace_id]
+            namespace = self._namespace_names.pop(namespace_id)
+            self._namespace_bytes -= _namespace_bytes(namespace)
+            del self._namespace_ids[namespace]
+        self._vectors[slot] = self._vectors[last]
+        self._namespaces[slot] = self._namespaces[last]
+        self._last_used[slot] = self._last_used[last]
+        self._responses[slot] = self._responses[last]
+        self._responses.pop()
+        self.size = last
+
+
+class SemanticCache:
+    """
+    Answers prompts that mean the same as one answered before.
+
+    ResponseCache only matches requests that are identical down to the
+    character. This cache embeds each prompt with a local embedding model
+    and returns the response of the most similar earlier prompt, if it is
+    at least threshold similar. The conversation before the prompt, the
+    model and the sampling parameters still have to match exactly; they
+    make up the namespace an entry is stored and looked up in.
+    """
+
+    def __init__(
+        self, embed: Embed, threshold: float = 0.9, max_bytes: int = 64 * 2**20
+    ) -> None:
+        """
+        Initializes the SemanticCache.
+
+        Args:
+            embed: Returns the embedding of a prompt.
+            threshold: The least cosine similarity, from -1 to 1, at which a
+                cached response is returned.
+            max_bytes: The most memory the cached entries may take.
+        """
+        self.embed_text = embed
+        self.threshold = threshold
+        self.index = VectorIndex(max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "SemanticCache | None":
+        """
+        Creates the cache configured by AGENT_TERMINAL_SEMANTIC_CACHE.
+
+        The variable names the Ollama embedding model to use, optionally
+        followed by settings, e.g. "nomic-embed-text,threshold=0.92,max_mb=128".
+
+        Returns:
+            The configured cache, or None if it has not been enabled.
+
+        Raises:
+            ValueError: If the variable is malformed.
+        """
+        value = os.environ.get(SEMANTIC_CACHE_ENV_VAR)
+        if not value:
+            return None
+        model, *settings = (setting.strip() for setting in value.split(","))
+        options = {}
+        for setting in settings:
+            name, _, number = setting.partition("=")
+            if name == "threshold":
+                options["threshold"] = float(number)
+            elif name == "max_mb":
+                options["max_bytes"] = int(float(number) * 2**20)
+            else:
+                raise ValueError(
+                    f"Unknown setting in {SEMANTIC_CACHE_ENV_VAR}: {name!r}"
+                )
+        return cls(OllamaEmbedder(model), **options)
+
+    async def embed(
+        self,
+        prompt: str,
+        timeouts: Timeouts | None = None,
+        deadline: float | None = None,
+    ) -> np.ndarray | None:
+        """
+        Embeds a prompt to look it up, or store its response, with.
+
+        Args:
+            prompt: The prompt.
+            timeouts: The timeouts of the agent the prompt was sent to.
+            deadline: The deadline of the request; the embedding counts
+                towards it.
+
+        Returns:
+            The embedding, or None if the embedding model failed or did not
+            answer in time, in which case the prompt is simply not cached.
+        """
+        try:
+            return await before_deadline(
+                self.embed_text(prompt, timeouts), deadline, "The embedding model"
+            )
+        except AgentError:
+            return None
+
+    def get(self, namespace: str, vector: np.ndarray) -> str | None:
+        """
+        Looks up the response to the most similar earlier prompt.
+
+        Args:
+            namespace: Identifies everything about the request but its prompt.
+            vector: The embedding of the prompt.
+
+        Returns:
+            The cached response, or None if no earlier prompt is similar
+            enough.
+        """
+        start = time.perf_counter()
+        matches = self.index.search(namespace, vector)
+        metrics.observe("semantic_cache_lookup_seconds", time.perf_counter() - start)
+        if matches and matches[0].similarity >= self.threshold:
+            self.hits += 1
+            metrics.increment("semantic_cache_hits_total")
+            return matches[0].response
+        self.misses += 1
+        metrics.increment("semantic_cache_misses_total")
+        return None
+
+    def put(self, namespace: str, vector: np.ndarray, response: str) -> None:
+        """
+        Stores the response to a prompt.
+
+        Args:
+            namespace: Identifies everything about the request but its prompt.
+            vector: The embedding of the prompt.
+            response: The complete response.
+        """
+        self.index.add(namespace, vector, response)
+
+
+class OllamaEmbedder:
+    """Embeds text with an embedding model served by the local Ollama."""
+
+    def __init__(self, model: str) -> None:
+        """
+        Initializes the OllamaEmbedder.
+
+        Args:
+            model: The embedding model, e.g. "nomic-embed-text". It must be
+                pulled with `ollama pull <model>` first.
+        """
+        self.model = model
+
+    async def __call__(
+        self, text: str, timeouts: Timeouts | None = None
+    ) -> np.ndarray:
+        """
+        Returns the embedding of text.
+
+        Args:
+            text: The text to embed.
+            timeouts: The connect and read timeouts of the request. Defaults
+                to those configured by AGENT_TERMINAL_TIMEOUTS.
+
+        Raises:
+            AgentError: If Ollama cannot be reached, times out or lacks the
+                model.
+        """
+        # Imported here, as the Ollama agent's module imports this one.
+        from .ollama_agent import _to_agent_error
+
+        if timeouts is None:
+            timeouts = Timeouts.from_env()
+        client = client_registry.get_ollama_client(timeouts=timeouts)
+        try:
+            response = await client.embeddings(model=self.model, prompt=text)
+        except (ollama.ResponseError, httpx.TransportError) as e:
+            raise _to_agent_error(e, self.model) from e
+        return np.asarray(response["embedding"], dtype=np.float32)
+
+
+def _namespace_bytes(namespace: str) -> int:
+    """Returns roughly the memory a namespace takes in a VectorIndex."""
+    return len(namespace.encode("utf-8")) + 16
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    """Returns vector scaled to unit length, as float32."""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+default_semantic_cache = SemanticCache.from_env()
+"""The semantic cache shared by every agent, or None if it is not enabled."""
@@ -0,0 +1,135 @@
+"""Per-agent timeouts and the deadline shared by the stages of a request."""
+
+import asyncio
+import contextvars
+import os
+from typing import AsyncIterator, Awaitable, NamedTuple, TypeVar
+
+import httpx
+
+from .errors import AgentTimeoutError
+
+TIMEOUTS_ENV_VAR = "AGENT_TERMINAL_TIMEOUTS"
+
+T = TypeVar("T")
+
+request_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+"""The event loop time by which the current request must have finished.
+
+Set by whoever starts a request, such as a voice agent driving its text
+agent, so every stage below it gives up at the same moment instead of each
+starting its own clock.
+"""
+
+
+class Timeouts(NamedTuple):
+    """How long an agent waits for its service, in seconds; None waits forever."""
+
+    connect: float | None = 10.0
+    """The longest a connection may take to open."""
+    read: float | None = 60.0
+    """The longest the service may go quiet, before or between chunks."""
+    total: float | None = 300.0
+    """The longest a whole response may take."""
+
+    @classmethod
+    def from_env(cls) -> "Timeouts":
+        """
+        Reads the default timeouts from the AGENT_TERMINAL_TIMEOUTS variable.
+
+        The variable holds comma-separated settings such as
+        "connect=5,read=30,total=120"; "none" disables a timeout. Settings
+        that are left out keep their defaults.
+
+        Returns:
+            The configured timeouts.
+
+        Raises:
+            ValueError: If the variable is malformed.
+        """
+        settings = {}
+        for setting in filter(None, os.environ.get(TIMEOUTS_ENV_VAR, "").split(",")):
+            name, _, value = setting.partition("=")
+            name = name.strip()
+            if name not in cls._fields:
+                raise ValueError(f"Unknown timeout in {TIMEOUTS_ENV_VAR}: {name!r}")
+            value = value.strip().lower()
+            settings[name] = None if value == "none" else float(value)
+        return cls(**settings)
+
+    def to_httpx(self) -> httpx.Timeout:
+        """Returns the connect and read timeouts as an httpx.Timeout."""
+        return httpx.Timeout(
+            connect=self.connect, read=self.read, write=self.read, pool=self.connect
+        )
+
+    def deadline(self) -> float | None:
+        """
+        Returns the deadline of a request starting now.
+
+        This is the request's own total timeout or the deadline inherited
+        from the request it is part of, whichever is sooner.
+        """
+        inherited = request_deadline.get()
+        if self.total is None:
+            return inherited
+        own = asyncio.get_running_loop().time() + self.total
+        return own if inherited is None else min(own, inherited)
+
+
+async def before_deadline(
+    awaitable: Awaitable[T], deadline: float | None, provider: str = ""
+) -> T:
+    """
+    Awaits something, giving up once a deadline has passed.
+
+    Args:
+        awaitable: What to wait for. It is cancelled if the deadline passes.
+        deadline: The event loop time to give up at, or None to wait forever.
+        provider: The service being waited for, for the error message.
+
+    Returns:
+        The result of awaitable.
+
+    Raises:
+        AgentTimeoutError: If the deadline passes first.
+    """
+    if deadline is None:
+        return await awaitable
+    remaining = deadline - asyncio.get_running_loop().time()
+    try:
+        return await asyncio.wait_for(awaitable, max(remaining, 0))
+    except asyncio.TimeoutError:
+        raise AgentTimeoutError(
+            f"{provider or 'The agent'} did not finish responding in time.",
+            provider,
+            f"Raise the total timeout in {TIMEOUTS_ENV_VAR} for long responses.",
+        ) from None
+
+
+async def iterate_before_deadline(
+    stream: AsyncIterator[T], deadline: float | None, provider: str = ""
+) -> AsyncIterator[T]:
+    """
+    Yields the items of a stream, giving up once a deadline has passed.
+
+    Args:
+        stream: The stream to read.
+        deadline: The event loop time to give up at, or None to wait forever.
+        provider: The service the stream comes from, for the error message.
+
+    Yields:
+        Each item of stream.
+
+    Raises:
+        AgentTimeoutError: If the deadline passes before the stream ends.
+    """
+    iterator = stream.__aiter__()
+    while True:
+        try:
+            item = await before_deadline(iterator.__anext__(), deadline, provider)
+        except StopAsyncIteration:
+            return
+        yield item
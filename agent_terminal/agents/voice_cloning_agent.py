@@ -1,94 +1,257 @@
 """An agent that clones a user's voice to respond to prompts."""
 
 import asyncio
-import tempfile
+import time
 from pathlib import Path
-from typing import TYPE_CHECKING
-
-import sounddevice as sd
-import soundfile as sf
+from typing import TYPE_CHECKING, AsyncIterator
 
+from ..audio.export import WavExporter, WavRecording
+from ..audio.player import Clip, playback_service
+from ..audio.sentences import SentenceSplitter
+from ..audio.tts import tts_model_registry
+from ..audio.voices import conditioning_cache
+from ..metrics import metrics
 from .base import Agent
+from .cache import ResponseCache
 from .openai_agent import OpenAIAgent
+from .timeouts import Timeouts, before_deadline, request_deadline
 
 if TYPE_CHECKING:
-    from chatterbox.tts import ChatterboxTTS
+    import numpy as np
+    import torch
+    from chatterbox.tts import ChatterboxTTS, Conditionals
 
 
 class VoiceCloningAgent(Agent):
     """
     An agent that uses a voice sample to generate spoken responses.
 
-    This agent first generates a text response using an OpenAI model and then
-    synthesizes it into speech using the provided voice sample. The final
-    output is the played audio.
+    This agent generates a text response using an OpenAI model and
+    synthesizes it into speech using the provided voice sample, one sentence
+    at a time as the text arrives. The final output is the played audio.
     """
 
-    def __init__(self, model: str, audio_path: str) -> None:
+    def __init__(
+        self,
+        model: str,
+        audio_path: str,
+        cache: ResponseCache | None = None,
+        exporter: WavExporter | None = None,
+        timeouts: Timeouts | None = None,
+        play: bool = True,
+    ) -> None:
         """
         Initializes the VoiceCloningAgent.
 
         Args:
             model: The name of the OpenAI model to use for text generation.
             audio_path: The path to the audio file for voice cloning.
+            cache: An optional cache that the text agent answers identical
+                requests from.
+            exporter: An optional exporter that saves each spoken response
+                as a WAV file. Defaults to the one configured by
+                AGENT_TERMINAL_VOICE_EXPORT, if any.
+            timeouts: How long to wait for the text API, and the total time a
+                spoken response may take. Defaults to the timeouts configured
+                by AGENT_TERMINAL_TIMEOUTS.
+            play: Whether to play the speech. Without playback, e.g. in batch
+                mode, the speech is only exported and the stream yields the
+                text of the response.
+
+        Raises:
+            FileNotFoundError: If the audio file does not exist.
+            ValueError: If play is False and there is no exporter to save
+                the speech with.
         """
         if not Path(audio_path).is_file():
             raise FileNotFoundError(f"Audio file not found at: {audio_path}")
 
         self.model = model
         self.audio_path = audio_path
-        self.text_agent = OpenAIAgent(model=self.model)
-        self.tts_model: "ChatterboxTTS | None" = None
+        self.timeouts = timeouts if timeouts is not None else Timeouts.from_env()
+        self.text_agent = OpenAIAgent(model=self.model, timeouts=self.timeouts)
+        self.text_agent.cache = cache
+        # The spoken conversation is the text agent's conversation.
+        self.history = self.text_agent.history
+        self.exporter = exporter if exporter is not None else WavExporter.from_env()
+        self.play = play
+        if not play and self.exporter is None:
+            raise ValueError(
+                "Set AGENT_TERMINAL_VOICE_EXPORT to a directory to save the "
+                "speech of a voice agent that does not play it."
+            )
+        self.last_audio: Path | None = None
+        """The WAV file of the most recent response, if it was exported."""
+        # This agent's speech is queued on its own playback channel.
+        self.channel = f"voice-{id(self):x}"
 
-    async def _lazy_load_model(self) -> None:
-        """Load the TTS model on demand to avoid slow startup times."""
-        if self.tts_model is None:
-            import torch
-            from chatterbox.tts import ChatterboxTTS
+    async def stream_response(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Generates a text response and speaks it sentence by sentence.
 
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.tts_model = ChatterboxTTS.from_pretrained(device=device)
+        The text is split into sentences as it streams in. Each sentence is
+        synthesized as soon as it is complete and appended to one clip on the
+        shared playback service, so the next sentence is synthesized while the
+        previous one plays. If other agents are speaking, the clip waits its
+        turn. The stream ends once the clip has been played; if it is skipped
+        or interrupted, the rest of the response is neither requested nor
+        synthesized.
 
-    async def get_response(self, prompt: str) -> str:
-        """
-        Generates a text response and synthesizes it as spoken audio.
+        Audio goes from the model straight to the output stream without
+        touching the disk. If an exporter is set, a WAV copy is written
+        alongside and is only kept if the response completes.
 
-        Args:
-            prompt: The user's input prompt.
+        If the agent does not play its speech, nothing waits for playback:
+        each sentence is synthesized straight into the WAV file, and the
+        text of the response is yielded once the file is complete.
 
-        Returns:
-            A message indicating that the audio response is being played.
-        """
-        await self._lazy_load_model()
-        text_response = await self.text_agent.get_response(prompt)
+        The TTS model is shared with every other voice agent and is loaded on
+        first use; it stays held only for the duration of the response.
 
-        # Generate audio from the text response
-        wav = self.tts_model.generate(
-            text_response,
-            audio_prompt_path=self.audio_path,
-        )
+        The total timeout is a deadline for the whole response, text and
+        speech alike; the text agent inherits it rather than starting its
+        own. Cancelling the consumer closes the text stream and stops the
+        speech.
 
-        # Save the generated audio to a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as fp:
-            sf.write(fp.name, wav.squeeze().cpu().numpy(), self.tts_model.sr)
-            temp_audio_path = fp.name
+        Args:
+            prompt: The user's input prompt.
 
-        # Play the audio in a separate thread to avoid blocking
-        asyncio.create_task(self._play_audio(temp_audio_path))
+        Yields:
+            A message indicating that the audio response is being played,
+            or the text of the response if it is not played.
 
-        return f"Playing audio response for: '{prompt}'"
+        Raises:
+            AgentError: If the text response fails or the deadline passes.
+        """
+        start = time.perf_counter()
+        deadline = self.timeouts.deadline()
+        self.last_audio = None
+        async with tts_model_registry.use() as tts:
+            # The reference voice is encoded once and reused across turns and
+            # agents.
+            conditionals = await tts.executor.run(
+                conditioning_cache.get, tts.model, self.audio_path
+            )
 
-    async def _play_audio(self, audio_path: str) -> None:
+            # Start the export first so that, if it fails, no text request is
+            # left running for a response that will never be spoken.
+            recording: WavRecording | None = None
+            if self.exporter is not None:
+                voice = Path(self.audio_path).stem
+                recording = self.exporter.start(voice, tts.model.sr)
+            sentences: asyncio.Queue[str | None] = asyncio.Queue()
+            text: list[str] = []
+            text_task = asyncio.create_task(
+                self._queue_sentences(prompt, sentences, deadline, text)
+            )
+            clip: Clip | None = None
+            synthesized = False
+            try:
+                while (sentence := await sentences.get()) is not None:
+                    if clip is not None and clip.finished:
+                        break
+                    synthesis_start = time.perf_counter()
+                    wav = await before_deadline(
+                        tts.executor.run(
+                            _synthesize, tts.model, conditionals, sentence
+                        ),
+                        deadline,
+                    )
+                    metrics.observe(
+                        "tts_synthesis_seconds", time.perf_counter() - synthesis_start
+                    )
+                    metrics.increment("tts_sentences_total")
+                    if clip is not None and clip.finished:
+                        break
+                    samples = _to_samples(wav)
+                    first = not synthesized
+                    synthesized = True
+                    if first and self.play:
+                        clip = playback_service.play(self.channel, tts.model.sr)
+                    if clip is not None:
+                        clip.write(samples)
+                    if first:
+                        metrics.observe(
+                            "tts_time_to_first_audio_seconds",
+                            time.perf_counter() - start,
+                        )
+                    if recording is not None:
+                        await asyncio.to_thread(recording.write, samples)
+                    if first and self.play:
+                        yield f"Playing audio response for: '{prompt}'"
+                if clip is not None and clip.finished:
+                    # The speech was skipped or interrupted, so stop generating
+                    # the rest and free the shared TTS model for other agents.
+                    return
+                await text_task
+                if not self.play:
+                    if recording is not None and synthesized:
+                        self.last_audio = recording.finish()
+                        recording = None
+                    yield "".join(text)
+                    return
+                if clip is None:
+                    yield f"No speech to play for: '{prompt}'"
+                    return
+                clip.end()
+                await before_deadline(clip.wait(), deadline)
+                if recording is not None:
+                    self.last_audio = recording.finish()
+                    recording = None
+            finally:
+                # Wait for the text stream to close, so a cancelled or failed
+                # response leaves no request behind.
+                text_task.cancel()
+                await asyncio.wait([text_task])
+                if clip is not None:
+                    clip.cancel()
+                if recording is not None:
+                    recording.discard()
+
+    async def _queue_sentences(
+        self,
+        prompt: str,
+        sentences: asyncio.Queue[str | None],
+        deadline: float | None,
+        text: list[str],
+    ) -> None:
         """
-        Plays the audio file at the given path.
+        Streams the text response and queues each complete sentence.
 
         Args:
-            audio_path: The path to the audio file to play.
+            prompt: The user's input prompt.
+            sentences: The queue to put sentences on; None marks the end.
+            deadline: The deadline of the spoken response, which the text
+                request must also meet.
+            text: The list to append the chunks of the text to.
         """
+        # This runs in its own task, so the deadline only applies to it.
+        request_deadline.set(deadline)
+        splitter = SentenceSplitter()
         try:
-            data, fs = sf.read(audio_path, dtype="float32")
-            sd.play(data, fs)
-            sd.wait()
+            async for chunk in self.text_agent.stream_response(prompt):
+                text.append(chunk)
+                for sentence in splitter.feed(chunk):
+                    sentences.put_nowait(sentence)
+            for sentence in splitter.flush():
+                sentences.put_nowait(sentence)
         finally:
-            # Clean up the temporary file
-            Path(audio_path).unlink()
\ No newline at end of file
+            sentences.put_nowait(None)
+
+
+def _synthesize(
+    model: "ChatterboxTTS", conditionals: "Conditionals", text: str
+) -> "torch.Tensor":
+    """Synthesize text in the voice described by conditionals (blocking)."""
+    model.conds = conditionals
+    return model.generate(text)
+
+
+def _to_samples(wav: "torch.Tensor") -> "np.ndarray":
+    """
+    Flattens a waveform into mono float32 samples for playback.
+
+    For a contiguous float32 tensor on the CPU, which is what the model
+    returns there, every step is a view and the samples share its memory.
+    """
+    return wav.detach().reshape(-1).cpu().float().numpy()
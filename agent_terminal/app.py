@@ -1,17 +1,59 @@
 """The main application for the Agent Terminal."""
 
-from pathlib import Path
-
+import asyncio
+import contextlib
+import os
+import sys
+import time
+from functools import partial
+
+from rich.markup import escape
 from textual.app import App, ComposeResult
 from textual.containers import Vertical
 from textual.widgets import Footer, Header, Input, TabbedContent, TabPane
+from textual.worker import Worker, get_current_worker
 
 from agent_terminal.agents.base import Agent
-from agent_terminal.agents.ollama_agent import OllamaAgent
-from agent_terminal.agents.openai_agent import OpenAIAgent
-from agent_terminal.agents.voice_cloning_agent import VoiceCloningAgent
+from agent_terminal.agents.cache import ResponseCache
+from agent_terminal.agents.errors import AgentError
+from agent_terminal.agents.registry import AgentRegistry, prewarm
+from agent_terminal.agents.residency import LOADED, ModelResidency
+from agent_terminal.metrics import (
+    EXPORT_INTERVAL,
+    MetricsExporter,
+    RequestTimer,
+    metrics,
+    request_labels,
+)
 from agent_terminal.screens import AgentSelectionScreen
+from agent_terminal.session import RESTORE_TAIL_MESSAGES, SavedTab, Session
 from agent_terminal.widgets.agent_view import AgentView
+from agent_terminal.widgets.metrics_panel import MetricsPanel
+
+MAX_IN_FLIGHT_ENV_VAR = "AGENT_TERMINAL_MAX_IN_FLIGHT"
+
+DEFAULT_MAX_IN_FLIGHT = 4
+"""The most requests a broadcast runs at once, by default."""
+
+
+def max_in_flight_from_env() -> int:
+    """
+    Reads how many requests a broadcast runs at once from its variable.
+
+    Returns:
+        The value of AGENT_TERMINAL_MAX_IN_FLIGHT, or DEFAULT_MAX_IN_FLIGHT
+        if it is not set.
+
+    Raises:
+        ValueError: If the variable is not a positive whole number.
+    """
+    value = os.environ.get(MAX_IN_FLIGHT_ENV_VAR, "").strip()
+    if not value:
+        return DEFAULT_MAX_IN_FLIGHT
+    max_in_flight = int(value)
+    if max_in_flight < 1:
+        raise ValueError(f"{MAX_IN_FLIGHT_ENV_VAR} must be at least 1.")
+    return max_in_flight
 
 
 class AgentTerminal(App):
@@ -21,19 +63,45 @@ class AgentTerminal(App):
     BINDINGS = [
         ("ctrl+t", "add_agent", "Add Agent"),
         ("ctrl+w", "remove_agent", "Remove Agent"),
+        ("ctrl+b", "broadcast", "Broadcast"),
+        ("escape", "cancel_request", "Cancel Request"),
+        ("ctrl+s", "skip_speech", "Skip Speech"),
+        ("f2", "toggle_metrics", "Metrics"),
         ("q", "quit", "Quit"),
     ]
 
-    agent_classes = {
-        "OpenAIAgent": OpenAIAgent,
-        "OllamaAgent": OllamaAgent,
-        "VoiceCloningAgent": VoiceCloningAgent,
-    }
+    # The built-in agent types and any installed plugins. Agent modules, and
+    # the SDKs they use, are only imported once an agent of that type is created.
+    agent_classes = AgentRegistry.from_entry_points()
 
-    def __init__(self) -> None:
-        """Initialize the app."""
+    def __init__(
+        self, max_in_flight: int | None = None, prewarm: bool = True
+    ) -> None:
+        """Initialize the app.
+
+        Args:
+            max_in_flight: The maximum number of requests a broadcast runs at
+                once. Further agents wait for a free slot. Defaults to the
+                limit configured by AGENT_TERMINAL_MAX_IN_FLIGHT, or 4.
+            prewarm: Whether to import the provider SDKs in the background
+                once the UI is up, so creating the first agent is quick.
+        """
         super().__init__()
         self.agents: dict[str, Agent] = {}
+        self.requests: dict[str, Worker] = {}
+        self.max_in_flight = (
+            max_in_flight if max_in_flight is not None else max_in_flight_from_env()
+        )
+        self.prewarm = prewarm
+        self.response_cache = ResponseCache.from_env()
+        self.session = Session.from_env()
+        self.metrics_exporter = MetricsExporter.from_env()
+        # Restored tabs whose agent is only created once they are opened.
+        self.saved_tabs: dict[str, SavedTab] = {}
+        # Tab titles without the load state of their agent's model, and the
+        # residencies whose load states are shown.
+        self.tab_titles: dict[str, str] = {}
+        self.residencies: set[ModelResidency] = set()
         self.agent_count = 0
 
     def compose(self) -> ComposeResult:
@@ -46,10 +114,134 @@ class AgentTerminal(App):
             )
         yield Footer()
 
-    def on_mount(self) -> None:
+    async def on_mount(self) -> None:
         """Called when the app is first mounted."""
+        self._update_cache_stats()
+        if self.metrics_exporter:
+            self.set_interval(EXPORT_INTERVAL, self._export_metrics)
+        if self.prewarm:
+            self.call_after_refresh(
+                self.run_worker,
+                partial(prewarm, self.agent_classes),
+                thread=True,
+                group="prewarm",
+            )
+        if self.session:
+            saved_tabs = self.session.load_tabs()
+            if saved_tabs:
+                await self._show_saved_tabs(saved_tabs)
+                return
         self.action_add_agent()
 
+    async def on_unmount(self) -> None:
+        """Close the pooled HTTP clients, the caches, the session and audio output."""
+        for residency in self.residencies:
+            residency.remove_listener(self._show_model_state)
+        # Only modules that were imported can have anything to close.
+        if player := sys.modules.get("agent_terminal.audio.player"):
+            player.playback_service.close()
+        if clients := sys.modules.get("agent_terminal.agents.clients"):
+            await clients.client_registry.aclose()
+        if self.response_cache:
+            self.response_cache.close()
+        if self.session:
+            self.session.close()
+        self._export_metrics()
+
+    def on_tabbed_content_tab_activated(
+        self, event: TabbedContent.TabActivated
+    ) -> None:
+        """Restore a saved tab the first time it is opened."""
+        if event.pane.id in self.saved_tabs:
+            self._restore_tab(event.pane.id)
+
+    async def _show_saved_tabs(self, saved_tabs: list[SavedTab]) -> None:
+        """Add a tab for each saved tab, showing only its latest messages.
+
+        No agent is created and no full history is read until a tab is
+        opened, so startup does not slow down as history builds up.
+        """
+        tabs = self.query_one(TabbedContent)
+        # The last tab is added first, so it is the one that becomes active;
+        # the others are inserted before it.
+        last = saved_tabs[-1]
+        for saved in [last, *saved_tabs[:-1]]:
+            agent_view = AgentView()
+            tail = self.session.read_tail(saved.pane_id, RESTORE_TAIL_MESSAGES)
+            for message in tail:
+                agent_view.add_message(
+                    message.sender, message.text, message.style, message.markdown
+                )
+            self.saved_tabs[saved.pane_id] = saved
+            pane = _make_pane(saved.title, agent_view, saved.pane_id)
+            await tabs.add_pane(pane, before=None if saved is last else last.pane_id)
+            self.agent_count = max(
+                self.agent_count, int(saved.pane_id.rpartition("_")[2])
+            )
+
+    def _restore_tab(self, pane_id: str) -> None:
+        """Create a saved tab's agent and show its full history."""
+        saved = self.saved_tabs.pop(pane_id)
+        pane = self.query_one(TabbedContent).get_pane(pane_id)
+        agent_view = pane.query_one(AgentView)
+        messages, turns = self.session.read_tab(pane_id)
+        agent_view.clear()
+        for message in messages:
+            agent_view.add_message(
+                message.sender, message.text, message.style, message.markdown
+            )
+        agent_view.session = self.session.tab(pane_id)
+
+        try:
+            agent, _ = self._create_agent(*saved.config)
+        except Exception as e:
+            agent_view.add_message(
+                "System", f"[bold red]Failed to restore agent: {e}[/bold red]"
+            )
+            return
+        history = getattr(agent, "history", None)
+        if history is not None:
+            for prompt, response in turns:
+                history.add_turn(prompt, response)
+        self.agents[pane_id] = agent
+        self._warm_up(pane_id, agent, saved.title)
+        self.query_one("#prompt_input", Input).disabled = False
+
+    def _warm_up(self, pane_id: str, agent: Agent, title: str) -> None:
+        """Load a local agent's model in the background, showing its progress.
+
+        Agents of services that load models on demand, like Ollama, track
+        them in a ModelResidency; other agents are left alone.
+        """
+        residency = getattr(agent, "residency", None)
+        if not isinstance(residency, ModelResidency):
+            return
+        if residency not in self.residencies:
+            residency.add_listener(self._show_model_state)
+            self.residencies.add(residency)
+        self.tab_titles[pane_id] = title
+        self._show_model_state(agent.model, residency.state(agent.model))
+        # Failures show in the title; the first prompt reports them in full.
+        self.run_worker(agent.warm_up(), group="warm_up", exit_on_error=False)
+
+    def _show_model_state(self, model: str, state: str) -> None:
+        """Show a model's load state in the titles of the tabs using it."""
+        tabs = self.query_one(TabbedContent)
+        for pane_id, title in self.tab_titles.items():
+            agent = self.agents.get(pane_id)
+            if getattr(agent, "model", None) != model:
+                continue
+            label = title if state == LOADED else f"{title} ({state})"
+            tabs.get_tab(pane_id).label = label
+
+    def _update_cache_stats(self) -> None:
+        """Show the response cache's hit and miss counts in the header."""
+        if self.response_cache:
+            self.sub_title = (
+                f"Cache: {self.response_cache.hits} hits, "
+                f"{self.response_cache.misses} misses"
+            )
+
     async def on_input_submitted(self, message: Input.Submitted) -> None:
         """Handle user prompt submission."""
         prompt = message.value
@@ -71,54 +263,182 @@ class AgentTerminal(App):
                 )
                 return
 
+            if active_pane_id in self.requests:
+                # Each pane streams one response at a time; other tabs stay usable.
+                self.bell()
+                self.notify(
+                    "This agent is still responding. Press Esc to cancel it.",
+                    severity="warning",
+                )
+                return
+
             agent_view.add_message("User", prompt)
             input_widget.clear()
-            input_widget.disabled = True
-            agent_view.add_message(
-                "System", "[italic]Agent is thinking...[/italic]", sender_style="dim"
-            )
+            self._dispatch_prompt(active_pane_id, agent, agent_view, prompt)
 
-            response = await agent.get_response(prompt)
-            agent_view.add_message(
-                agent.__class__.__name__, response, sender_style="bold blue"
-            )
-
-            input_widget.disabled = False
-            input_widget.focus()
-
-    def _add_agent_tab(
+    def _dispatch_prompt(
+        self,
+        pane_id: str,
+        agent: Agent,
+        agent_view: AgentView,
+        prompt: str,
+        limiter: asyncio.Semaphore | None = None,
+    ) -> Worker:
+        """Run a prompt against an agent in a worker bound to its pane.
+
+        The worker belongs to the pane's AgentView, so closing the tab cancels
+        any request still in flight for it.
+        """
+        worker = agent_view.run_worker(
+            self._run_prompt(pane_id, agent, agent_view, prompt, limiter),
+            name=f"prompt:{pane_id}",
+            group="prompt",
+            exit_on_error=False,
+        )
+        self.requests[pane_id] = worker
+        return worker
+
+    async def _run_prompt(
         self,
-        agent_class_name: str,
-        model_name: str,
-        audio_path: str | None = None,
+        pane_id: str,
+        agent: Agent,
+        agent_view: AgentView,
+        prompt: str,
+        limiter: asyncio.Semaphore | None = None,
     ) -> None:
+        """Stream an agent's response to a prompt into its AgentView.
+
+        Args:
+            pane_id: The ID of the tab the request belongs to.
+            agent: The agent to send the prompt to.
+            agent_view: The view the response is rendered into.
+            prompt: The user's input prompt.
+            limiter: An optional semaphore bounding how many requests run at
+                once, shared by all requests of a broadcast.
+        """
+        agent_view.set_busy(True)
+        # Everything the request records, down to speech synthesis, is
+        # counted against its tab. Each worker runs in a copy of the context.
+        request_labels.set((("agent", type(agent).__name__), ("tab", pane_id)))
+        timer = RequestTimer(metrics)
+        # Turns the agent remembers are saved so a restored tab recalls them.
+        history = getattr(agent, "history", None)
+        turns_recorded = history.turns_recorded if history is not None else 0
+        try:
+            async with limiter or contextlib.nullcontext():
+                agent_view.add_message(
+                    "System",
+                    "[italic]Agent is thinking...[/italic]",
+                    sender_style="dim",
+                )
+                timer.started()
+                chunk_count = 0
+                agent_view.begin_message(
+                    agent.__class__.__name__, sender_style="bold blue", markdown=True
+                )
+                # Closing the stream on any exit, including cancellation,
+                # aborts the agent's HTTP request and speech.
+                async with contextlib.aclosing(agent.stream_response(prompt)) as stream:
+                    async for chunk in stream:
+                        if not chunk_count:
+                            timer.first_chunk()
+                        chunk_count += 1
+                        agent_view.append_to_message(chunk)
+                agent_view.end_message()
+                usage = agent.last_usage
+                elapsed = timer.finished(
+                    usage["completion_tokens"] if usage else chunk_count
+                )
+                if (
+                    agent_view.session is not None
+                    and history is not None
+                    and history.turns_recorded > turns_recorded
+                    and history.last_turn is not None
+                ):
+                    agent_view.session.turn(*history.last_turn)
+                agent_view.add_message(
+                    "System",
+                    _format_response_stats(elapsed, usage, chunk_count),
+                    sender_style="dim",
+                )
+        except asyncio.CancelledError:
+            if agent_view.is_attached:
+                agent_view.end_message()
+                agent_view.add_message(
+                    "System", "[italic]Request cancelled.[/italic]", sender_style="dim"
+                )
+            raise
+        except AgentError as e:
+            timer.failed()
+            agent_view.end_message()
+            agent_view.add_message("System", _format_agent_error(e))
+        except Exception as e:
+            timer.failed()
+            agent_view.end_message()
+            agent_view.add_message(
+                "System",
+                f"[bold red]An unexpected error occurred: {escape(str(e))}[/bold red]",
+            )
+        finally:
+            agent_view.end_message()
+            agent_view.set_busy(False)
+            self._update_cache_stats()
+            if self.requests.get(pane_id) is get_current_worker():
+                del self.requests[pane_id]
+
+    async def _report_broadcast(self, workers: list[Worker]) -> None:
+        """Wait for every request of a broadcast and report the wall time."""
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(worker.wait() for worker in workers), return_exceptions=True
+        )
+        elapsed = time.perf_counter() - start
+        self.notify(f"Broadcast to {len(workers)} agents finished in {elapsed:.2f}s.")
+
+    def _create_agent(self, agent_class_name: str, *values: str) -> tuple[Agent, str]:
+        """Creates an agent from its configuration.
+
+        Args:
+            agent_class_name: The name of the agent type in the registry.
+            *values: The values of the agent type's inputs, as chosen on the
+                AgentSelectionScreen.
+
+        Returns:
+            The agent and the title of its tab.
+
+        Raises:
+            ValueError: If a value the agent type requires is missing.
+        """
+        spec = self.agent_classes.spec(agent_class_name)
+        arguments = spec.arguments(values)
+        agent_class = self.agent_classes[agent_class_name]
+        # Agents only get a cache when the user has opted in to one, and
+        # their agent type accepts it.
+        arguments.update(spec.optional_arguments(cache=self.response_cache))
+        return agent_class(**arguments), spec.tab_title(arguments)
+
+    def _add_agent_tab(self, agent_class_name: str, *values: str) -> None:
         """Creates a new agent and its corresponding tab."""
         self.agent_count += 1
         pane_id = f"agent_{self.agent_count}"
         tabs = self.query_one(TabbedContent)
 
         try:
-            agent_class = self.agent_classes[agent_class_name]
-
-            if agent_class_name == "VoiceCloningAgent":
-                if not audio_path:
-                    raise ValueError("Audio path is required for VoiceCloningAgent.")
-                agent = agent_class(model=model_name, audio_path=audio_path)
-                pane_title = f"VC: {Path(audio_path).stem}"
-            else:
-                agent = agent_class(model=model_name)
-                pane_title = f"{agent_class_name}: {model_name}"
-
+            config = (agent_class_name, *values)
+            agent, pane_title = self._create_agent(*config)
             self.agents[pane_id] = agent
 
             agent_view = AgentView()
+            if self.session:
+                agent_view.session = self.session.open_tab(pane_id, pane_title, config)
             agent_view.add_message(
                 "System", f"Agent '{pane_title}' started.", sender_style="bold green"
             )
 
-            new_pane = TabPane(pane_title, agent_view, id=pane_id)
+            new_pane = _make_pane(pane_title, agent_view, pane_id)
             tabs.add_pane(new_pane)
             tabs.active = pane_id
+            self.call_after_refresh(self._warm_up, pane_id, agent, pane_title)
             self.query_one("#prompt_input", Input).disabled = False
 
         except (ValueError, FileNotFoundError) as e:
@@ -127,7 +447,7 @@ class AgentTerminal(App):
             agent_view.add_message(
                 "System", f"[bold red]Failed to create agent: {e}[/bold red]"
             )
-            new_pane = TabPane(pane_title, agent_view, id=pane_id)
+            new_pane = _make_pane(pane_title, agent_view, pane_id)
             tabs.add_pane(new_pane)
             tabs.active = pane_id
         except Exception as e:
@@ -136,7 +456,7 @@ class AgentTerminal(App):
             agent_view.add_message(
                 "System", f"[bold red]An unexpected error occurred: {e}[/bold red]"
             )
-            new_pane = TabPane(pane_title, agent_view, id=pane_id)
+            new_pane = _make_pane(pane_title, agent_view, pane_id)
             tabs.add_pane(new_pane)
             tabs.active = pane_id
 
@@ -145,16 +465,11 @@ class AgentTerminal(App):
 
         def on_select_closed(result: tuple | None) -> None:
             if result:
-                if len(result) == 3:
-                    agent_class_name, model_name, audio_path = result
-                    self._add_agent_tab(agent_class_name, model_name, audio_path)
-                else:
-                    agent_class_name, model_name = result
-                    self._add_agent_tab(agent_class_name, model_name)
+                self._add_agent_tab(*result)
             elif not self.agents:
                 self.exit()
 
-        self.push_screen(AgentSelectionScreen(), on_select_closed)
+        self.push_screen(AgentSelectionScreen(self.agent_classes), on_select_closed)
 
     def action_remove_agent(self) -> None:
         """Remove the active agent tab."""
@@ -166,6 +481,13 @@ class AgentTerminal(App):
 
         if active_pane_id in self.agents:
             del self.agents[active_pane_id]
+        self.saved_tabs.pop(active_pane_id, None)
+        self.tab_titles.pop(active_pane_id, None)
+        if self.session:
+            self.session.close_tab(active_pane_id)
+
+        if active_pane_id in self.requests:
+            self.requests.pop(active_pane_id).cancel()
 
         tabs.remove_pane(active_pane_id)
 
@@ -173,6 +495,90 @@ class AgentTerminal(App):
             self.query_one("#prompt_input", Input).disabled = True
 
 
+    def action_broadcast(self) -> None:
+        """Send the current prompt to every open agent at once."""
+        input_widget = self.query_one("#prompt_input", Input)
+        prompt = input_widget.value
+        if not prompt or input_widget.disabled:
+            self.bell()
+            return
+
+        tabs = self.query_one(TabbedContent)
+        limiter = asyncio.Semaphore(self.max_in_flight)
+        workers = []
+        for pane_id, agent in self.agents.items():
+            agent_view = tabs.get_pane(pane_id).query_one(AgentView)
+            if pane_id in self.requests:
+                agent_view.add_message(
+                    "System",
+                    "[yellow]Skipped broadcast: agent is still responding.[/yellow]",
+                    sender_style="dim",
+                )
+                continue
+            agent_view.add_message("User", prompt)
+            workers.append(
+                self._dispatch_prompt(pane_id, agent, agent_view, prompt, limiter)
+            )
+
+        if not workers:
+            self.bell()
+            return
+
+        input_widget.clear()
+        self.run_worker(
+            self._report_broadcast(workers), group="broadcast", exit_on_error=False
+        )
+
+    def action_cancel_request(self) -> None:
+        """Cancel the request in flight for the active agent tab, if any."""
+        active_pane_id = self.query_one(TabbedContent).active
+        worker = self.requests.get(active_pane_id)
+        if worker is not None:
+            worker.cancel()
+
+    def action_toggle_metrics(self) -> None:
+        """Show or hide the metrics panel of the active agent tab."""
+        tabs = self.query_one(TabbedContent)
+        if tabs.active:
+            tabs.get_pane(tabs.active).query_one(MetricsPanel).toggle()
+
+    def _export_metrics(self) -> None:
+        """Write the metrics to the configured file, if any."""
+        if self.metrics_exporter:
+            self.metrics_exporter.write(metrics)
+
+    def action_skip_speech(self) -> None:
+        """Skip the spoken response that is currently playing, if any."""
+        if player := sys.modules.get("agent_terminal.audio.player"):
+            player.playback_service.skip()
+
+
+def _make_pane(title: str, agent_view: AgentView, pane_id: str) -> TabPane:
+    """Create an agent tab holding its AgentView and its metrics panel."""
+    return TabPane(title, agent_view, MetricsPanel(metrics, pane_id), id=pane_id)
+
+
+def _format_agent_error(error: AgentError) -> str:
+    """Format an agent's error, and how to fix it, for display."""
+    message = f"[bold red]Error: {escape(str(error))}[/bold red]"
+    if error.hint:
+        message += f"\n\n{escape(error.hint)}"
+    return message
+
+
+def _format_response_stats(
+    elapsed: float, usage: dict[str, int] | None, chunk_count: int
+) -> str:
+    """Format the latency and size of a finished response for display."""
+    if usage:
+        size = f"{usage['completion_tokens']} tokens"
+        if elapsed > 0:
+            size += f", {usage['completion_tokens'] / elapsed:.1f} tokens/s"
+    else:
+        size = f"{chunk_count} chunks"
+    return f"[italic]Completed in {elapsed:.2f}s ({size}).[/italic]"
+
+
 if __name__ == "__main__":
     app = AgentTerminal()
     app.run()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""Optional export of spoken responses to WAV files."""
+
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+VOICE_EXPORT_DIR_ENV_VAR = "AGENT_TERMINAL_VOICE_EXPORT"
+
+
+class WavRecording:
+    """
+    A WAV file that a response's audio is appended to as it is synthesized.
+
+    The file only exists once the recording has been finished; a recording
+    that is discarded, for example because the response failed or was
+    cancelled, leaves nothing behind.
+    """
+
+    def __init__(self, path: Path, samplerate: int) -> None:
+        """
+        Initializes the WavRecording and creates its file.
+
+        Args:
+            path: The path of the WAV file to write.
+            samplerate: The sample rate of the audio that will be written.
+        """
+        self.path = path
+        self._partial_path = path.with_name(path.name + ".part")
+        self._file = sf.SoundFile(
+            self._partial_path, "w", samplerate=samplerate, channels=1, format="WAV"
+        )
+
+    def write(self, samples: np.ndarray) -> None:
+        """
+        Appends a chunk of mono audio to the recording.
+
+        Args:
+            samples: Mono float32 audio samples.
+        """
+        self._file.write(samples)
+
+    def finish(self) -> Path:
+        """
+        Closes the recording and moves it to its final path.
+
+        Returns:
+            The path of the finished WAV file.
+        """
+        self._file.close()
+        self._partial_path.replace(self.path)
+        return self.path
+
+    def discard(self) -> None:
+        """Closes the recording and deletes what was written so far."""
+        self._file.close()
+        self._partial_path.unlink(missing_ok=True)
+
+
+class WavExporter:
+    """Saves a WAV copy of each spoken response into a directory."""
+
+    def __init__(self, directory: str | Path) -> None:
+        """
+        Initializes the WavExporter.
+
+        Args:
+            directory: The directory to write WAV files to.
+        """
+        self.directory = Path(directory).expanduser()
+
+    @classmethod
+    def from_env(cls) -> "WavExporter | None":
+        """
+        Creates an exporter for AGENT_TERMINAL_VOICE_EXPORT, if it is set.
+
+        Returns:
+            A WavExporter, or None if exporting has not been enabled.
+        """
+        directory = os.environ.get(VOICE_EXPORT_DIR_ENV_VAR)
+        return cls(directory) if directory else None
+
+    def start(self, name: str, samplerate: int) -> WavRecording:
+        """
+        Starts recording a response.
+
+        Args:
+            name: A short name to include in the file name.
+            samplerate: The sample rate of the audio that will be written.
+
+        Returns:
+            The recording to write the response's audio to.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return WavRecording(self.directory / f"{timestamp}-{name}.wav", samplerate)
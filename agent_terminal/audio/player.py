@@ -0,0 +1,254 @@
+"""A shared playback service that queues speech from every voice agent."""
+
+import asyncio
+import heapq
+import itertools
+import threading
+from collections import Counter, deque
+
+import numpy as np
+import sounddevice as sd
+
+
+class Clip:
+    """
+    One piece of speech queued for playback, such as a whole response.
+
+    Audio can be written to a clip while it is already playing, so speech is
+    heard as soon as its first sentence is synthesized. The clip finishes
+    once it has been ended and everything written to it has played, or as
+    soon as it is cancelled, skipped or stopped.
+    """
+
+    def __init__(
+        self, service: "PlaybackService", channel: str, priority: int
+    ) -> None:
+        """
+        Initializes the Clip; use PlaybackService.play to create one.
+
+        Args:
+            service: The service that plays the clip.
+            channel: The channel, usually one per agent, the clip belongs to.
+            priority: Clips with a higher priority are played first.
+        """
+        self.channel = channel
+        self.priority = priority
+        self.frames_played = 0
+        self.underruns = 0
+        self._service = service
+        self._chunks: deque[np.ndarray] = deque()
+        self._offset = 0
+        self._starved = False
+        self._ended = False
+        self._finished = False
+        self._loop = asyncio.get_running_loop()
+        self._done = self._loop.create_future()
+
+    @property
+    def finished(self) -> bool:
+        """Whether the clip has played to the end or has been dropped."""
+        return self._finished
+
+    def write(self, samples: np.ndarray) -> None:
+        """
+        Appends mono audio to the clip.
+
+        Args:
+            samples: Mono float32 audio samples at the service's sample rate.
+        """
+        chunk = np.asarray(samples, dtype=np.float32).reshape(-1)
+        with self._service._lock:
+            self._chunks.append(chunk)
+
+    def end(self) -> None:
+        """Marks the clip complete; it finishes once its audio has played."""
+        with self._service._lock:
+            self._ended = True
+
+    def cancel(self) -> None:
+        """Drops the clip, whether it is playing or still queued."""
+        with self._service._lock:
+            self._service._drop(self)
+
+    async def wait(self) -> None:
+        """Waits until the clip has finished playing or has been dropped."""
+        await asyncio.shield(self._done)
+
+    def _finish(self) -> None:
+        """Marks the clip finished and wakes its waiters (lock held)."""
+        if not self._finished:
+            self._finished = True
+            self._chunks.clear()
+            if not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._set_done)
+
+    def _set_done(self) -> None:
+        """Resolves the clip's future on its event loop."""
+        if not self._done.done():
+            self._done.set_result(None)
+
+
+class PlaybackService:
+    """
+    Plays queued clips one after another on a single long-lived stream.
+
+    The output stream is opened on first use and kept open, and its audio is
+    pulled by PortAudio's own callback thread, so playback never blocks the
+    event loop and overlapping responses never cut each other off. Waiting
+    clips play highest priority first and in the order they were queued
+    within a priority. Each clip belongs to a channel so an agent's speech
+    can be skipped or stopped without touching anyone else's.
+
+    A clip that has started playing but runs out of audio before it has
+    ended, because synthesis is falling behind, is an underrun: silence is
+    played until more audio arrives, and each such gap is counted per channel.
+    """
+
+    def __init__(self) -> None:
+        """Initializes the PlaybackService; the stream opens on first use."""
+        self.samplerate: int | None = None
+        self.underruns: Counter[str] = Counter()
+        self._stream: sd.OutputStream | None = None
+        self._current: Clip | None = None
+        self._queue: list[tuple[int, int, Clip]] = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def play(
+        self,
+        channel: str,
+        samplerate: int,
+        priority: int = 0,
+        interrupt: bool = False,
+    ) -> Clip:
+        """
+        Queues a new clip for playback.
+
+        Args:
+            channel: The channel, usually one per agent, the clip belongs to.
+            samplerate: The sample rate of the clip's audio.
+            priority: Clips with a higher priority are played first.
+            interrupt: Whether to skip the clip that is currently playing so
+                this one starts right away.
+
+        Returns:
+            The clip to write audio to.
+
+        Raises:
+            ValueError: If audio at another sample rate is still playing.
+        """
+        self._ensure_stream(samplerate)
+        clip = Clip(self, channel, priority)
+        with self._lock:
+            heapq.heappush(self._queue, (-priority, next(self._order), clip))
+            if interrupt and self._current is not None:
+                self._drop(self._current)
+        return clip
+
+    def skip(self, channel: str | None = None) -> None:
+        """
+        Drops the clip that is currently playing.
+
+        Args:
+            channel: If given, only skip the current clip if it belongs to
+                this channel.
+        """
+        with self._lock:
+            clip = self._current
+            if clip is not None and channel in (None, clip.channel):
+                self._drop(clip)
+
+    def stop(self, channel: str | None = None) -> None:
+        """
+        Drops the current clip and every queued one.
+
+        Args:
+            channel: If given, only drop the clips of this channel.
+        """
+        with self._lock:
+            clips = [clip for _, _, clip in self._queue]
+            if self._current is not None:
+                clips.append(self._current)
+            for clip in clips:
+                if channel in (None, clip.channel):
+                    self._drop(clip)
+
+    def close(self) -> None:
+        """Drops every clip and releases the output stream."""
+        self.stop()
+        if self._stream is not None:
+            self._stream.abort()
+            self._stream.close()
+            self._stream = None
+            self.samplerate = None
+
+    def _ensure_stream(self, samplerate: int) -> None:
+        """Opens the output stream, reopening it if the rate changed while idle."""
+        if self._stream is not None and samplerate == self.samplerate:
+            return
+        if self._stream is not None:
+            with self._lock:
+                busy = self._current is not None or bool(self._queue)
+            if busy:
+                raise ValueError(
+                    f"Cannot play {samplerate} Hz audio while {self.samplerate} Hz "
+                    "audio is playing."
+                )
+            self.close()
+        self._stream = sd.OutputStream(
+            samplerate=samplerate,
+            channels=1,
+            dtype="float32",
+            callback=self._callback,
+        )
+        self.samplerate = samplerate
+        self._stream.start()
+
+    def _drop(self, clip: Clip) -> None:
+        """Removes a clip from playback and finishes it (lock held)."""
+        if clip is self._current:
+            self._current = None
+        else:
+            entries = [entry for entry in self._queue if entry[2] is not clip]
+            if len(entries) != len(self._queue):
+                self._queue = entries
+                heapq.heapify(self._queue)
+        clip._finish()
+
+    def _callback(self, outdata: np.ndarray, frames: int, time, status) -> None:
+        """Fills PortAudio's output buffer from the current and queued clips."""
+        filled = 0
+        with self._lock:
+            while filled < frames:
+                clip = self._current
+                if clip is None:
+                    if not self._queue:
+                        break
+                    clip = self._current = heapq.heappop(self._queue)[2]
+                if not clip._chunks:
+                    if clip._ended:
+                        self._current = None
+                        clip._finish()
+                        continue
+                    if clip.frames_played and not clip._starved:
+                        clip._starved = True
+                        clip.underruns += 1
+                        self.underruns[clip.channel] += 1
+                    break
+                clip._starved = False
+                chunk = clip._chunks[0]
+                count = min(frames - filled, len(chunk) - clip._offset)
+                outdata[filled : filled + count, 0] = chunk[
+                    clip._offset : clip._offset + count
+                ]
+                filled += count
+                clip._offset += count
+                clip.frames_played += count
+                if clip._offset == len(chunk):
+                    clip._chunks.popleft()
+                    clip._offset = 0
+        outdata[filled:] = 0
+
+
+playback_service = PlaybackService()
+"""The service every voice agent in the process plays its speech through."""
@@ -0,0 +1,61 @@
+"""Incremental splitting of streamed text into speakable sentences."""
+
+import re
+
+# A sentence ends at terminal punctuation (optionally followed by closing
+# quotes or brackets) and whitespace, or at a line break.
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n+")
+
+
+class SentenceSplitter:
+    """
+    Splits text that arrives in arbitrary chunks into whole sentences.
+
+    Text is buffered until a sentence boundary is seen, so each sentence can
+    be handed to speech synthesis as soon as it is complete. Very short
+    sentences are merged with the following one, since synthesizing a lone
+    "Sure." costs nearly as much as a full sentence.
+    """
+
+    def __init__(self, min_length: int = 20) -> None:
+        """
+        Initializes the SentenceSplitter.
+
+        Args:
+            min_length: The minimum number of characters in an emitted
+                sentence, except for the last one.
+        """
+        self.min_length = min_length
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        """
+        Adds a chunk of text and returns any sentences it completed.
+
+        Args:
+            text: The next chunk of streamed text.
+
+        Returns:
+            The sentences completed by this chunk, in order.
+        """
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            sentence = self._buffer[start : match.end()].strip()
+            if len(sentence) >= self.min_length:
+                sentences.append(sentence)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> list[str]:
+        """
+        Returns whatever text remains once the stream has ended.
+
+        Returns:
+            The final sentence, or an empty list if nothing is buffered.
+        """
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return [remainder] if remainder else []
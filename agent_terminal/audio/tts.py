@@ -0,0 +1,186 @@
+"""Loading, sharing and running text-to-speech models off the event loop."""
+
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, TypeVar
+
+if TYPE_CHECKING:
+    from chatterbox.tts import ChatterboxTTS
+
+T = TypeVar("T")
+
+
+class TTSExecutor:
+    """
+    Runs blocking TTS calls on a dedicated thread with a bounded queue.
+
+    Model loading and inference are CPU/GPU-heavy calls that would freeze
+    the whole UI if run on the event loop. They run on the executor's own
+    thread instead (torch releases the GIL while it computes), and at most
+    max_pending calls may be queued or running at once: further callers wait
+    for a slot, which applies backpressure instead of piling up work.
+    """
+
+    def __init__(self, max_pending: int = 2, max_workers: int = 1) -> None:
+        """
+        Initializes the TTSExecutor.
+
+        Args:
+            max_pending: The maximum number of calls queued or running.
+            max_workers: The number of threads running calls.
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tts"
+        )
+        self._slots = asyncio.Semaphore(max_pending)
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Runs a blocking call on the executor's thread.
+
+        If the awaiting task is cancelled, a call that has not started yet is
+        dropped from the queue. A call that is already running cannot be
+        interrupted, but its result is discarded.
+
+        Args:
+            func: The blocking function to call.
+            *args: Positional arguments for func.
+            **kwargs: Keyword arguments for func.
+
+        Returns:
+            The return value of func.
+        """
+        async with self._slots:
+            future = self._executor.submit(partial(func, *args, **kwargs))
+            try:
+                return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+
+    def shutdown(self) -> None:
+        """Drops queued calls and lets the worker thread exit."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def load_tts_model(device: str | None = None) -> "ChatterboxTTS":
+    """
+    Imports torch and Chatterbox and loads the TTS model (blocking).
+
+    Args:
+        device: The torch device to load onto, or None to use CUDA when it is
+            available and the CPU otherwise.
+
+    Returns:
+        The loaded ChatterboxTTS model.
+    """
+    import torch
+    from chatterbox.tts import ChatterboxTTS
+
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    return ChatterboxTTS.from_pretrained(device=device)
+
+
+class SharedTTSModel:
+    """
+    A TTS model shared by every voice agent using the same device.
+
+    All calls that touch the model go through its executor, whose single
+    thread serializes inference so agents cannot interleave calls that set
+    the voice conditioning and then generate with it.
+    """
+
+    def __init__(self) -> None:
+        """Initializes the SharedTTSModel; the model itself loads on first use."""
+        self.model: "ChatterboxTTS | None" = None
+        self.executor = TTSExecutor(max_pending=8)
+        self.users = 0
+        self._loading: "asyncio.Future[ChatterboxTTS] | None" = None
+        self._unload_timer: asyncio.TimerHandle | None = None
+
+
+class TTSModelRegistry:
+    """
+    Loads each TTS model once per device and shares it between agents.
+
+    Agents hold the model only while they use it, through the use context
+    manager. The registry counts those users, and once a model has had no
+    users for idle_timeout seconds it is unloaded to free its memory; the
+    next user loads it again.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = 300.0,
+        loader: Callable[[str | None], "ChatterboxTTS"] = load_tts_model,
+    ) -> None:
+        """
+        Initializes the TTSModelRegistry.
+
+        Args:
+            idle_timeout: Seconds without users after which a model unloads.
+            loader: The blocking function that loads a model for a device.
+        """
+        self.idle_timeout = idle_timeout
+        self.loader = loader
+        self._entries: dict[str | None, SharedTTSModel] = {}
+
+    def is_loaded(self, device: str | None = None) -> bool:
+        """Returns whether the model for a device is currently in memory."""
+        entry = self._entries.get(device)
+        return entry is not None and entry.model is not None
+
+    @contextlib.asynccontextmanager
+    async def use(self, device: str | None = None) -> AsyncIterator[SharedTTSModel]:
+        """
+        Provides the shared model for a device, loading it if necessary.
+
+        Args:
+            device: The torch device, or None to pick one automatically.
+
+        Yields:
+            The shared model, loaded and ready for inference.
+        """
+        entry = self._entries.get(device)
+        if entry is None:
+            entry = self._entries[device] = SharedTTSModel()
+        entry.users += 1
+        if entry._unload_timer is not None:
+            entry._unload_timer.cancel()
+            entry._unload_timer = None
+        try:
+            if entry.model is None:
+                if entry._loading is None:
+                    entry._loading = asyncio.ensure_future(
+                        entry.executor.run(self.loader, device)
+                    )
+                try:
+                    # Shielded so one cancelled user does not abort the load
+                    # that other users are waiting on.
+                    entry.model = await asyncio.shield(entry._loading)
+                except Exception:
+                    entry._loading = None
+                    raise
+            yield entry
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                entry._unload_timer = asyncio.get_running_loop().call_later(
+                    self.idle_timeout, self._unload_if_idle, device, entry
+                )
+
+    def _unload_if_idle(self, device: str | None, entry: SharedTTSModel) -> None:
+        """Drops a model that still has no users once its idle timer fires."""
+        if entry.users or self._entries.get(device) is not entry:
+            return
+        del self._entries[device]
+        entry.model = None
+        entry._loading = None
+        entry.executor.shutdown()
+
+
+tts_model_registry = TTSModelRegistry()
+"""The registry shared by every voice agent in the process."""
@@ -0,0 +1,104 @@
+"""Caching of the speaker conditioning computed from reference voices."""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from chatterbox.tts import ChatterboxTTS, Conditionals
+
+VOICE_CACHE_DIR_ENV_VAR = "AGENT_TERMINAL_VOICE_CACHE"
+
+
+class ConditioningCache:
+    """
+    Keeps the speaker conditioning for each reference audio file.
+
+    Encoding a reference voice means loading, resampling and embedding the
+    WAV, which Chatterbox otherwise repeats on every generate call. The
+    result only depends on the file's contents and the model's device, so it
+    is computed once and shared by every turn and every agent that clones the
+    same voice. When a cache directory is configured the conditioning is also
+    saved to disk and survives restarts.
+
+    The methods block and are meant to run on the TTS executor's thread.
+    """
+
+    def __init__(self, cache_dir: str | Path | None = None) -> None:
+        """
+        Initializes the ConditioningCache.
+
+        Args:
+            cache_dir: An optional directory to persist conditioning in.
+        """
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else None
+        self._conditionals: dict[str, "Conditionals"] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ConditioningCache":
+        """
+        Creates a cache persisted to AGENT_TERMINAL_VOICE_CACHE, if it is set.
+
+        Returns:
+            A ConditioningCache, in memory only unless a directory is set.
+        """
+        return cls(os.environ.get(VOICE_CACHE_DIR_ENV_VAR))
+
+    @staticmethod
+    def make_key(audio_path: str, device: str) -> str:
+        """
+        Builds the cache key for a reference voice on a device.
+
+        The key changes whenever the file is modified, so an edited reference
+        is re-encoded rather than served stale.
+
+        Args:
+            audio_path: The path to the reference audio file.
+            device: The device the conditioning tensors live on.
+
+        Returns:
+            A hex digest identifying the voice.
+        """
+        path = Path(audio_path).resolve()
+        stat = path.stat()
+        identity = f"{path}:{stat.st_mtime_ns}:{stat.st_size}:{device}"
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def get(self, model: "ChatterboxTTS", audio_path: str) -> "Conditionals":
+        """
+        Returns the conditioning for a voice, computing it only if needed.
+
+        Args:
+            model: The TTS model that will use the conditioning.
+            audio_path: The path to the reference audio file.
+
+        Returns:
+            The speaker conditioning for the voice.
+        """
+        key = self.make_key(audio_path, str(model.device))
+        with self._lock:
+            conditionals = self._conditionals.get(key)
+            if conditionals is not None:
+                return conditionals
+
+            disk_path = self.cache_dir / f"{key}.pt" if self.cache_dir else None
+            if disk_path is not None and disk_path.is_file():
+                from chatterbox.tts import Conditionals
+
+                conditionals = Conditionals.load(disk_path).to(model.device)
+            else:
+                model.prepare_conditionals(audio_path)
+                conditionals = model.conds
+                if disk_path is not None:
+                    disk_path.parent.mkdir(parents=True, exist_ok=True)
+                    conditionals.save(disk_path)
+
+            self._conditionals[key] = conditionals
+            return conditionals
+
+
+conditioning_cache = ConditioningCache.from_env()
+"""The cache shared by every voice agent in the process."""
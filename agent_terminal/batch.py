@@ -0,0 +1,481 @@
+"""Runs a file of prompts through agents without the UI.
+
+Usage:
+    python -m agent_terminal.batch prompts.jsonl results.jsonl
+        --agent OllamaAgent:llama3 [--agent OpenAIAgent:gpt-4o ...]
+        [--concurrency 4] [--restart] [--progress-interval 5]
+
+Each line of the input is a JSON object with a "prompt" and, optionally,
+an "id"; lines without one are identified by their line number. Every
+prompt is sent to every agent, each prompt on its own, without the
+conversation of the prompts before it. Each result is appended to the
+output as soon as it is complete, and a run that is interrupted picks up
+where it left off when started again with the same output.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import IO, Iterable, Iterator, NamedTuple
+
+from agent_terminal.agents.base import Agent
+from agent_terminal.agents.cache import ResponseCache
+from agent_terminal.agents.errors import AgentError
+from agent_terminal.agents.registry import AgentRegistry
+from agent_terminal.metrics import (
+    MetricsExporter,
+    RequestTimer,
+    metrics,
+    request_labels,
+)
+
+
+class BatchItem(NamedTuple):
+    """A prompt read from the input."""
+
+    id: str
+    prompt: str
+
+
+class AgentConfig(NamedTuple):
+    """An agent that every prompt is sent to."""
+
+    label: str
+    """How the agent was given on the command line, e.g. "OllamaAgent:llama3".
+    Results are recorded under it."""
+    name: str
+    """The name of the agent type in the registry."""
+    values: tuple[str, ...]
+    """The values of the agent type's inputs, in order."""
+
+    @classmethod
+    def parse(cls, text: str, registry: AgentRegistry) -> "AgentConfig":
+        """
+        Parses an agent given as "AgentType:value[:value...]".
+
+        The values are the agent type's inputs, in the order the selection
+        screen asks for them, e.g. "VoiceCloningAgent:gpt-4o:/path/voice.wav".
+        The last value may itself contain colons.
+
+        Raises:
+            ValueError: If the agent type is unknown or a value is missing.
+        """
+        name, _, rest = text.partition(":")
+        if name not in registry:
+            known = ", ".join(registry)
+            raise ValueError(f"Unknown agent type {name!r}; choose from {known}.")
+        spec = registry.spec(name)
+        values = tuple(rest.split(":", len(spec.inputs) - 1)) if rest else ()
+        spec.arguments(values)
+        return cls(text, name, values)
+
+
+class BatchStats(NamedTuple):
+    """How a batch run went."""
+
+    completed: int
+    """Results recorded without an error."""
+    failed: int
+    """Results recorded with an error."""
+    skipped: int
+    """Results already recorded by an earlier run."""
+    elapsed: float
+    """The wall time of the run, in seconds."""
+
+    @property
+    def items_per_second(self) -> float:
+        """The results recorded per second, whether they failed or not."""
+        if self.elapsed <= 0:
+            return 0.0
+        return (self.completed + self.failed) / self.elapsed
+
+
+def read_items(path: str | Path) -> Iterator[BatchItem]:
+    """
+    Reads the prompts of a JSONL file one line at a time.
+
+    Blank lines are skipped, but still count towards the line numbers that
+    identify prompts without an "id".
+
+    Raises:
+        ValueError: If a line is not a JSON object with a "prompt".
+    """
+    with Path(path).open(encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                prompt = record["prompt"]
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                raise ValueError(
+                    f'{path}:{number}: expected a JSON object with a "prompt".'
+                ) from e
+            yield BatchItem(str(record.get("id", number)), prompt)
+
+
+class ResultLog:
+    """
+    The JSONL file results are appended to, which is also the checkpoint.
+
+    Each record is flushed to the operating system as soon as it is
+    written, so results survive the process crashing, and fsynced when the
+    log is closed. Reopening the log reads which prompts each agent has
+    already answered without an error; the last record of a prompt is the
+    one that counts, so failed prompts are tried again.
+    """
+
+    def __init__(self, path: str | Path, restart: bool = False) -> None:
+        """
+        Opens the log, creating it if needed.
+
+        Args:
+            path: The JSONL file to append results to.
+            restart: Whether to discard the results of earlier runs instead
+                of resuming from them.
+        """
+        self.path = Path(path)
+        self.done: set[tuple[str, str]] = set()
+        if restart:
+            self.path.unlink(missing_ok=True)
+        else:
+            self._load()
+        self._file: IO[str] = self.path.open("a", encoding="utf-8")
+
+    def write(self, record: dict) -> None:
+        """Appends a result record."""
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        """Fsyncs and closes the log."""
+        if not self._file.closed:
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def _load(self) -> None:
+        """Reads the results of earlier runs, dropping a torn last line."""
+        try:
+            file = self.path.open("r+b")
+        except FileNotFoundError:
+            return
+        with file:
+            end = 0
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                key = (record.get("id"), record.get("agent"))
+                if record.get("error") is None:
+                    self.done.add(key)
+                else:
+                    self.done.discard(key)
+            # A run killed mid-write leaves half a record, which the next
+            # record would otherwise be appended to.
+            file.truncate(end)
+
+
+class BatchRunner:
+    """
+    Sends prompts to agents, a bounded number at a time per agent.
+
+    Each agent given gets its own pool of concurrency agent instances, which
+    take prompts from a short queue. Prompts are read as the queues make
+    room for them, so however long the input is, only a few per agent are
+    held in memory; the input is read as fast as the slowest agent answers.
+    Requests still go through the shared scheduler, so provider rate limits
+    and retries apply as they do in the app.
+    """
+
+    def __init__(
+        self,
+        agents: list[AgentConfig],
+        concurrency: int = 4,
+        registry: AgentRegistry | None = None,
+        cache: ResponseCache | None = None,
+        progress: IO[str] | None = None,
+        progress_interval: float = 5.0,
+    ) -> None:
+        """
+        Initializes the BatchRunner.
+
+        Args:
+            agents: The agents to send every prompt to.
+            concurrency: The most prompts each agent answers at once.
+            registry: The agent types the configs name. Defaults to the
+                built-in agents and installed plugins.
+            cache: An optional cache that the agents answer identical
+                requests from.
+            progress: Where to report progress, or None for nowhere.
+            progress_interval: How often, in seconds, to report progress.
+        """
+        self.agents = agents
+        self.concurrency = concurrency
+        self.registry = (
+            registry if registry is not None else AgentRegistry.from_entry_points()
+        )
+        self.cache = cache
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def create_agent(self, config: AgentConfig) -> Agent:
+        """
+        Creates an agent from its configuration.
+
+        Raises:
+            ValueError: If a value the agent type requires is missing.
+        """
+        spec = self.registry.spec(config.name)
+        arguments = spec.arguments(config.values)
+        # Nobody is listening to a batch, so agents that speak only export
+        # their speech, without waiting for it to be played.
+        arguments.update(spec.optional_arguments(cache=self.cache, play=False))
+        return self.registry[config.name](**arguments)
+
+    async def run(self, items: Iterable[BatchItem], log: ResultLog) -> BatchStats:
+        """
+        Sends every prompt to every agent and records the results.
+
+        Args:
+            items: The prompts, read lazily.
+            log: The log to record results to; results it already holds are
+                skipped.
+
+        Returns:
+            How the run went.
+
+        Raises:
+            ValueError: If an agent cannot be created.
+            FileNotFoundError: If a file an agent needs does not exist.
+        """
+        start = time.perf_counter()
+        # Agents are created up front, so a misconfigured one fails the run
+        # before anything is sent.
+        pools = {
+            config: [self.create_agent(config) for _ in range(self.concurrency)]
+            for config in self.agents
+        }
+        queues: dict[AgentConfig, asyncio.Queue[BatchItem | None]] = {
+            config: asyncio.Queue(maxsize=2 * self.concurrency)
+            for config in self.agents
+        }
+        workers = [
+            asyncio.create_task(self._work(config, agent, queues[config], log))
+            for config, pool in pools.items()
+            for agent in pool
+        ]
+        reporter = None
+        if self.progress is not None:
+            reporter = asyncio.create_task(self._report_progress(start))
+        # If a worker fails, the feeder is cancelled rather than left waiting
+        # for room in its queue.
+        feeder = asyncio.create_task(self._feed(items, queues, pools, log))
+        tasks = [feeder, *workers]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if reporter is not None:
+                tasks.append(reporter)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return BatchStats(
+            self.completed, self.failed, self.skipped, time.perf_counter() - start
+        )
+
+    async def _feed(
+        self,
+        items: Iterable[BatchItem],
+        queues: "dict[AgentConfig, asyncio.Queue[BatchItem | None]]",
+        pools: dict[AgentConfig, list[Agent]],
+        log: ResultLog,
+    ) -> None:
+        """Queues each prompt for every agent that has yet to answer it."""
+        for item in items:
+            for config in self.agents:
+                if (item.id, config.label) in log.done:
+                    self.skipped += 1
+                else:
+                    await queues[config].put(item)
+        for config, pool in pools.items():
+            for _ in pool:
+                await queues[config].put(None)
+
+    async def _work(
+        self,
+        config: AgentConfig,
+        agent: Agent,
+        queue: "asyncio.Queue[BatchItem | None]",
+        log: ResultLog,
+    ) -> None:
+        """Answers prompts from a queue with one agent until it ends."""
+        # Each worker runs in its own task, and so its own copy of the
+        # context. Its requests are counted, and paced, under its agent.
+        request_labels.set((("agent", config.name), ("tab", config.label)))
+        history = getattr(agent, "history", None)
+        while (item := await queue.get()) is not None:
+            if history is not None:
+                history.clear()
+            record = await self._answer(config, agent, item)
+            log.write(record)
+            if record["error"] is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    async def _answer(
+        self, config: AgentConfig, agent: Agent, item: BatchItem
+    ) -> dict:
+        """Sends one prompt to an agent and returns its result record."""
+        timer = RequestTimer(metrics)
+        timer.started()
+        started_at = time.time()
+        chunks: list[str] = []
+        error = None
+        try:
+            stream = agent.stream_response(item.prompt)
+            async with contextlib.aclosing(stream):
+                async for chunk in stream:
+                    if not chunks:
+                        timer.first_chunk()
+                    chunks.append(chunk)
+        except Exception as e:
+            error = {"type": type(e).__name__, "message": str(e)}
+            if isinstance(e, AgentError) and e.hint:
+                error["hint"] = e.hint
+        usage = agent.last_usage
+        audio = getattr(agent, "last_audio", None)
+        if error is None:
+            tokens = usage["completion_tokens"] if usage else len(chunks)
+            seconds = timer.finished(tokens)
+        else:
+            timer.failed()
+            seconds = time.perf_counter() - timer.start
+        first_chunk_seconds = None
+        if timer.first_chunk_at is not None:
+            first_chunk_seconds = round(timer.first_chunk_at - timer.start, 6)
+        return {
+            "id": item.id,
+            "agent": config.label,
+            "response": "".join(chunks) if error is None else None,
+            "error": error,
+            "started_at": started_at,
+            "seconds": round(seconds, 6),
+            "first_chunk_seconds": first_chunk_seconds,
+            "chunks": len(chunks),
+            "usage": usage,
+            "audio": str(audio) if error is None and audio is not None else None,
+        }
+
+    async def _report_progress(self, start: float) -> None:
+        """Reports the results recorded so far, every progress_interval."""
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            elapsed = time.perf_counter() - start
+            stats = BatchStats(self.completed, self.failed, self.skipped, elapsed)
+            print(_format_stats(stats), file=self.progress, flush=True)
+
+
+def _format_stats(stats: BatchStats) -> str:
+    """Formats the progress of a run for display."""
+    return (
+        f"{stats.completed} completed, {stats.failed} failed, "
+        f"{stats.skipped} skipped in {stats.elapsed:.1f}s "
+        f"({stats.items_per_second:.2f} items/s)"
+    )
+
+
+async def _close_shared_resources() -> None:
+    """Closes the pooled HTTP clients and audio output, if they were used."""
+    # Only modules that were imported can have anything to close.
+    if player := sys.modules.get("agent_terminal.audio.player"):
+        player.playback_service.close()
+    if clients := sys.modules.get("agent_terminal.agents.clients"):
+        await clients.client_registry.aclose()
+
+
+async def run_batch(args: argparse.Namespace) -> BatchStats:
+    """Runs the batch described by the command line arguments."""
+    registry = AgentRegistry.from_entry_points()
+    configs = [AgentConfig.parse(text, registry) for text in args.agent]
+    cache = ResponseCache.from_env()
+    exporter = MetricsExporter.from_env()
+    log = ResultLog(args.output, restart=args.restart)
+    runner = BatchRunner(
+        configs,
+        concurrency=args.concurrency,
+        registry=registry,
+        cache=cache,
+        progress=sys.stderr,
+        progress_interval=args.progress_interval,
+    )
+    try:
+        return await runner.run(read_items(args.input), log)
+    finally:
+        log.close()
+        await _close_shared_resources()
+        if cache:
+            cache.close()
+        if exporter:
+            exporter.write(metrics)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Runs a batch from the command line and returns the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="The JSONL file of prompts.")
+    parser.add_argument("output", help="The JSONL file to append results to.")
+    parser.add_argument(
+        "--agent",
+        action="append",
+        required=True,
+        help='An agent to send every prompt to, e.g. "OllamaAgent:llama3". '
+        "May be given more than once.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="The most prompts each agent answers at once.",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Discard the results already in the output instead of resuming.",
+    )
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=5.0,
+        help="How often, in seconds, to report progress.",
+    )
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1.")
+
+    try:
+        stats = asyncio.run(run_batch(args))
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print("Interrupted; run again to resume.", file=sys.stderr)
+        return 130
+    print(_format_stats(stats), file=sys.stderr)
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,384 @@
+"""Low-overhead latency and throughput metrics for agent requests and speech."""
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+METRICS_PATH_ENV_VAR = "AGENT_TERMINAL_METRICS"
+
+EXPORT_INTERVAL = 10.0
+"""How often, in seconds, the app rewrites the exported metrics file."""
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)  # fmt: skip
+"""Upper bounds, in seconds, of the buckets latencies are counted in."""
+
+RATE_BUCKETS = (1.0, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0)
+"""Upper bounds, in tokens per second, of the buckets throughput is counted in."""
+
+
+class MetricInfo(NamedTuple):
+    """Describes a metric."""
+
+    help: str
+    buckets: tuple[float, ...] | None = None
+    """The histogram's bucket bounds, or None if the metric is a counter."""
+
+
+METRICS = {
+    "agent_requests_total": MetricInfo("Prompts sent to agents."),
+    "agent_errors_total": MetricInfo("Prompts that ended in an error."),
+    "agent_tokens_total": MetricInfo("Tokens received from agents."),
+    "agent_retries_total": MetricInfo("Requests sent again after failing."),
+    "agent_coalesced_requests_total": MetricInfo(
+        "Requests that shared an identical request already in flight."
+    ),
+    "agent_queue_wait_seconds": MetricInfo(
+        "Time a prompt waited for a free request slot.", LATENCY_BUCKETS
+    ),
+    "agent_rate_limit_wait_seconds": MetricInfo(
+        "Time a request waited for its provider's rate limit.", LATENCY_BUCKETS
+    ),
+    "agent_time_to_first_token_seconds": MetricInfo(
+        "Time from sending a prompt to its first chunk.", LATENCY_BUCKETS
+    ),
+    "agent_response_seconds": MetricInfo(
+        "Time from sending a prompt to the end of its response.", LATENCY_BUCKETS
+    ),
+    "agent_tokens_per_second": MetricInfo(
+        "Tokens received per second after the first chunk.", RATE_BUCKETS
+    ),
+    "semantic_cache_hits_total": MetricInfo(
+        "Prompts answered by the semantic cache."
+    ),
+    "semantic_cache_misses_total": MetricInfo(
+        "Prompts the semantic cache had no similar enough answer for."
+    ),
+    "semantic_cache_lookup_seconds": MetricInfo(
+        "Time taken to search the semantic cache.", LATENCY_BUCKETS
+    ),
+    "tts_sentences_total": MetricInfo("Sentences synthesized."),
+    "tts_synthesis_seconds": MetricInfo(
+        "Time taken to synthesize one sentence.", LATENCY_BUCKETS
+    ),
+    "tts_time_to_first_audio_seconds": MetricInfo(
+        "Time from sending a prompt to its first audio.", LATENCY_BUCKETS
+    ),
+}
+"""Every metric that is recorded, by name."""
+
+request_labels: contextvars.ContextVar[tuple[tuple[str, str], ...]] = (
+    contextvars.ContextVar("request_labels", default=())
+)
+"""The labels of the request being handled, e.g. (("tab", "agent_1"),).
+
+Set for the duration of a request so the agent's stages, such as speech
+synthesis, are recorded against the tab that made it.
+"""
+
+
+class Histogram:
+    """
+    Counts observations in fixed buckets, like a Prometheus histogram.
+
+    Observing is a binary search and an increment, and the memory used does
+    not grow with the number of observations. Quantiles are estimated from
+    the buckets.
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        """
+        Initializes the Histogram.
+
+        Args:
+            buckets: The sorted upper bounds of the buckets. Larger values are
+                counted in a final, unbounded bucket.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Counts one observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Estimates a quantile by interpolating within its bucket.
+
+        Args:
+            q: The quantile, between 0 and 1.
+
+        Returns:
+            The estimate, or None if nothing has been observed. Quantiles
+            that fall in the unbounded bucket are reported as its lower bound.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Metrics:
+    """
+    Counters and histograms, each kept separately for every set of labels.
+
+    Recording is thread-safe, so speech synthesis threads and the UI can
+    record into the same Metrics.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty Metrics."""
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], Histogram] = {}
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        """
+        Adds to a counter.
+
+        Args:
+            name: The name of the counter, one of METRICS.
+            amount: The amount to add.
+            **labels: Labels to add to those of the current request.
+        """
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Records an observation in a histogram.
+
+        Args:
+            name: The name of the histogram, one of METRICS.
+            value: The observed value.
+            **labels: Labels to add to those of the current request.
+        """
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(METRICS[name].buckets)
+            histogram.observe(value)
+
+    def counter(self, name: str, **labels: str) -> float:
+        """Returns the sum of a counter over every label set matching labels."""
+        with self._lock:
+            return sum(
+                value
+                for (key_name, key_labels), value in self._counters.items()
+                if key_name == name and _matches(key_labels, labels)
+            )
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        """Returns a histogram merged over every label set matching labels."""
+        merged = Histogram(METRICS[name].buckets)
+        with self._lock:
+            for (key_name, key_labels), histogram in self._histograms.items():
+                if key_name == name and _matches(key_labels, labels):
+                    merged.counts = [
+                        a + b for a, b in zip(merged.counts, histogram.counts)
+                    ]
+                    merged.count += histogram.count
+                    merged.sum += histogram.sum
+        return merged
+
+    def to_json(self) -> dict:
+        """Returns every counter and histogram as JSON-serializable data."""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "buckets": list(histogram.buckets),
+                    "counts": list(histogram.counts),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                }
+                for (name, labels), histogram in self._histograms.items()
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        """Returns every counter and histogram in the Prometheus text format."""
+        data = self.to_json()
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str) -> None:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {METRICS[name].help}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for counter in data["counters"]:
+            describe(counter["name"], "counter")
+            lines.append(
+                f"{counter['name']}{_format_labels(counter['labels'])} "
+                f"{counter['value']:g}"
+            )
+        for histogram in data["histograms"]:
+            name, labels = histogram["name"], histogram["labels"]
+            describe(name, "histogram")
+            cumulative = 0
+            bounds = [f"{bound:g}" for bound in histogram["buckets"]] + ["+Inf"]
+            for bound, count in zip(bounds, histogram["counts"]):
+                cumulative += count
+                bucket_labels = _format_labels({**labels, "le": bound})
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimer:
+    """
+    Times the stages of one request to an agent and records them.
+
+    Create it when the prompt is dispatched, then call started, first_chunk
+    and finished (or failed) as the request progresses.
+    """
+
+    def __init__(self, metrics: "Metrics") -> None:
+        """
+        Initializes the RequestTimer, starting its clock.
+
+        Args:
+            metrics: The metrics to record the request's timings in.
+        """
+        self.metrics = metrics
+        self.created = time.perf_counter()
+        self.start: float | None = None
+        self.first_chunk_at: float | None = None
+
+    def started(self) -> None:
+        """Records that the request got a slot and was sent."""
+        self.start = time.perf_counter()
+        self.metrics.increment("agent_requests_total")
+        self.metrics.observe("agent_queue_wait_seconds", self.start - self.created)
+
+    def first_chunk(self) -> None:
+        """Records the arrival of the response's first chunk."""
+        if self.first_chunk_at is None and self.start is not None:
+            self.first_chunk_at = time.perf_counter()
+            self.metrics.observe(
+                "agent_time_to_first_token_seconds", self.first_chunk_at - self.start
+            )
+
+    def finished(self, tokens: int) -> float:
+        """
+        Records the end of a response.
+
+        Args:
+            tokens: The number of tokens received.
+
+        Returns:
+            The time, in seconds, from sending the request to its end.
+        """
+        now = time.perf_counter()
+        elapsed = now - (self.start if self.start is not None else self.created)
+        self.metrics.observe("agent_response_seconds", elapsed)
+        self.metrics.increment("agent_tokens_total", tokens)
+        if self.first_chunk_at is not None and now > self.first_chunk_at:
+            self.metrics.observe(
+                "agent_tokens_per_second", tokens / (now - self.first_chunk_at)
+            )
+        return elapsed
+
+    def failed(self) -> None:
+        """Records that the request ended in an error."""
+        self.metrics.increment("agent_errors_total")
+
+
+class MetricsExporter:
+    """Writes metrics to a local file, as JSON or in the Prometheus format."""
+
+    def __init__(self, path: str | Path) -> None:
+        """
+        Initializes the MetricsExporter.
+
+        Args:
+            path: The file to write. Paths ending in .json get JSON; any
+                other path gets the Prometheus text format, e.g. for the
+                node exporter's textfile collector.
+        """
+        self.path = Path(path)
+
+    @classmethod
+    def from_env(cls) -> "MetricsExporter | None":
+        """
+        Creates the exporter configured by the AGENT_TERMINAL_METRICS variable.
+
+        Returns:
+            An exporter writing to the configured file, or None if metrics
+            are not exported.
+        """
+        path = os.environ.get(METRICS_PATH_ENV_VAR)
+        if not path:
+            return None
+        return cls(Path(path).expanduser())
+
+    def write(self, metrics: Metrics) -> None:
+        """Replaces the file with the current metrics, atomically."""
+        if self.path.suffix == ".json":
+            content = json.dumps(metrics.to_json(), indent=2)
+        else:
+            content = metrics.to_prometheus()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_name(self.path.name + ".tmp")
+        partial.write_text(content, encoding="utf-8")
+        partial.replace(self.path)
+
+
+def _labels(extra: dict[str, str]) -> tuple[tuple[str, str], ...]:
+    """Returns the current request's labels merged with extra, sorted."""
+    current = request_labels.get()
+    if not extra:
+        return current
+    return tuple(sorted({**dict(current), **extra}.items()))
+
+
+def _matches(labels: tuple[tuple[str, str], ...], selector: dict[str, str]) -> bool:
+    """Returns whether labels include every label in selector."""
+    present = dict(labels)
+    return all(present.get(name) == value for name, value in selector.items())
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    """Formats labels for the Prometheus text format."""
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+metrics = Metrics()
+"""The metrics of every agent in the app."""
@@ -5,37 +5,73 @@ from textual.containers import Grid
 from textual.screen import ModalScreen
 from textual.widgets import Button, Input, Label, Select
 
-# A registry of available agent configurations.
-# Each tuple contains: (Display Name, AgentClassName, default_model_or_None)
-AGENT_TYPES = [
-    ("OpenAI: GPT-4o", "OpenAIAgent", "gpt-4o"),
-    ("OpenAI: GPT-3.5 Turbo", "OpenAIAgent", "gpt-3.5-turbo"),
-    ("Ollama: Llama 3", "OllamaAgent", "llama3"),
-    ("Ollama: Custom", "OllamaAgent", None),  # Allows user to specify a model
-    ("Voice Cloning (GPT-4o)", "VoiceCloningAgent", "gpt-4o"),
-]
+from agent_terminal.agents.registry import MODEL_INPUT, AgentRegistry, AgentSpec
 
 
 class AgentSelectionScreen(ModalScreen[tuple | None]):
-    """A modal screen for selecting and configuring a new AI agent."""
+    """A modal screen for selecting and configuring a new AI agent.
+
+    The agent types offered, and the inputs each one asks for, come from the
+    specs in the agent registry. The screen dismisses with the chosen agent
+    type's name followed by the values of its inputs.
+    """
+
+    def __init__(self, registry: AgentRegistry) -> None:
+        """Initialize the screen.
+
+        Args:
+            registry: The registry of the agent types to offer.
+        """
+        super().__init__()
+        # Each preset's display name maps to its spec and default model.
+        self.presets: dict[str, tuple[AgentSpec, str | None]] = {
+            display_name: (spec, model)
+            for spec in registry.specs()
+            for display_name, model in spec.presets
+        }
+        # Inputs other than the model, in the order they were first declared.
+        self.extra_inputs = list(
+            dict.fromkeys(
+                agent_input
+                for spec, _ in self.presets.values()
+                for agent_input in spec.inputs
+                if agent_input.name != MODEL_INPUT.name
+            )
+        )
 
     def compose(self) -> ComposeResult:
         """Create the UI elements for the agent selection screen."""
+        extra_widgets = []
+        for agent_input in self.extra_inputs:
+            extra_widgets.append(
+                Label(
+                    agent_input.label,
+                    id=f"{agent_input.name}_label",
+                    classes="hidden",
+                )
+            )
+            extra_widgets.append(
+                Input(
+                    placeholder=agent_input.placeholder,
+                    id=f"{agent_input.name}_input",
+                    classes="hidden",
+                )
+            )
         yield Grid(
             Label("Select Agent Type", id="agent_select_label"),
             Select(
-                [(name, name) for name, _, _ in AGENT_TYPES],
+                [(name, name) for name in self.presets],
                 prompt="Choose an agent...",
                 id="agent_select",
             ),
+            Label("", id="agent_description"),
             Label("Model Name (if custom)", id="model_name_label"),
-            Input(placeholder="e.g., codellama", id="model_name_input", disabled=True),
-            Label("Reference Audio Path", id="audio_path_label", classes="hidden"),
             Input(
-                placeholder="/path/to/voice.wav",
-                id="audio_path_input",
-                classes="hidden",
+                placeholder=MODEL_INPUT.placeholder,
+                id="model_name_input",
+                disabled=True,
             ),
+            *extra_widgets,
             Button("Create", variant="primary", id="create_button"),
             Button("Cancel", variant="default", id="cancel_button"),
             id="agent_selection_grid",
@@ -45,66 +81,61 @@ class AgentSelectionScreen(ModalScreen[tuple | None]):
         """Handle button press events to create or cancel."""
         if event.button.id == "create_button":
             select = self.query_one(Select)
-            if not select.value:
-                self.bell()
-                return
-
-            selected_config = next(
-                (config for config in AGENT_TYPES if config[0] == select.value), None
-            )
-            if not selected_config:
+            if not select.value or select.value not in self.presets:
                 self.bell()
                 return
 
-            _, agent_class_name, default_model = selected_config
-            model_name = default_model
-            if default_model is None:  # This is the "Ollama: Custom" case
-                model_name = self.query_one("#model_name_input", Input).value
-
-            if not model_name:
-                self.bell()
-                return
-
-            if agent_class_name == "VoiceCloningAgent":
-                audio_path = self.query_one("#audio_path_input", Input).value
-                if not audio_path:
+            spec, default_model = self.presets[select.value]
+            values = []
+            for agent_input in spec.inputs:
+                if agent_input.name == MODEL_INPUT.name:
+                    value = default_model
+                    if default_model is None:  # e.g. the "Ollama: Custom" case
+                        value = self.query_one("#model_name_input", Input).value
+                else:
+                    value = self.query_one(f"#{agent_input.name}_input", Input).value
+                if not value:
                     self.bell()
                     return
-                self.dismiss((agent_class_name, model_name, audio_path))
-            else:
-                self.dismiss((agent_class_name, model_name))
+                values.append(value)
+            self.dismiss((spec.name, *values))
         else:
             self.dismiss(None)
 
     def on_select_changed(self, event: Select.Changed) -> None:
-        """Enable or disable inputs based on agent selection."""
+        """Enable, show or hide inputs based on agent selection."""
         model_input = self.query_one("#model_name_input", Input)
-        audio_path_label = self.query_one("#audio_path_label")
-        audio_path_input = self.query_one("#audio_path_input")
-
-        selected_config = next(
-            (config for config in AGENT_TYPES if config[0] == event.value), None
-        )
+        description = self.query_one("#agent_description", Label)
 
         # Default state: hide all optional fields
         model_input.disabled = True
         model_input.clear()
-        audio_path_label.add_class("hidden")
-        audio_path_input.add_class("hidden")
-        audio_path_input.clear()
-
-        if not selected_config:
+        description.update("")
+        for agent_input in self.extra_inputs:
+            self.query_one(f"#{agent_input.name}_label").add_class("hidden")
+            extra_input = self.query_one(f"#{agent_input.name}_input", Input)
+            extra_input.add_class("hidden")
+            extra_input.clear()
+
+        if event.value not in self.presets:
             return
 
-        _, agent_class_name, _ = selected_config
+        spec, default_model = self.presets[event.value]
+        description.update(spec.describe())
 
-        # Handle custom Ollama model input
-        if event.value == "Ollama: Custom":
+        # Handle custom model input
+        if default_model is None:
             model_input.disabled = False
             model_input.focus()
 
-        # Handle voice cloning audio path input
-        if agent_class_name == "VoiceCloningAgent":
-            audio_path_label.remove_class("hidden")
-            audio_path_input.remove_class("hidden")
-            audio_path_input.focus()
\ No newline at end of file
+        # Show the inputs this agent type needs, focusing the first of them
+        focused = False
+        for agent_input in spec.inputs:
+            if agent_input.name == MODEL_INPUT.name:
+                continue
+            self.query_one(f"#{agent_input.name}_label").remove_class("hidden")
+            extra_input = self.query_one(f"#{agent_input.name}_input", Input)
+            extra_input.remove_class("hidden")
+            if not focused:
+                extra_input.focus()
+                focused = True
@@ -0,0 +1,310 @@
+"""Opt-in persistence of the open tabs and their conversations."""
+
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import IO, Iterator, NamedTuple
+
+SESSION_DIR_ENV_VAR = "AGENT_TERMINAL_SESSION"
+
+RESTORE_TAIL_MESSAGES = 50
+"""The number of recent messages shown by a restored tab until it is opened."""
+
+_TABS_FILE = "tabs.jsonl"
+_STOP = object()
+
+
+class SavedTab(NamedTuple):
+    """A tab that was open when the previous session ended."""
+
+    pane_id: str
+    title: str
+    config: tuple
+    """The agent configuration chosen on the AgentSelectionScreen."""
+
+
+class SavedMessage(NamedTuple):
+    """A message shown in a tab's AgentView."""
+
+    sender: str
+    style: str
+    text: str
+    markdown: bool = False
+
+
+class TabLog:
+    """Records what happens in one tab to its session."""
+
+    def __init__(self, session: "Session", pane_id: str) -> None:
+        """
+        Initializes the TabLog; use Session.tab to get one.
+
+        Args:
+            session: The session the tab belongs to.
+            pane_id: The ID of the tab.
+        """
+        self.session = session
+        self.pane_id = pane_id
+
+    def message(
+        self, sender: str, style: str, text: str, markdown: bool = False
+    ) -> None:
+        """Records a message shown in the tab's AgentView."""
+        record = {"message": [sender, style, text, markdown]}
+        self.session._append(self.pane_id, record)
+
+    def turn(self, prompt: str, response: str) -> None:
+        """Records a completed turn of the tab agent's conversation memory."""
+        self.session._append(self.pane_id, {"turn": [prompt, response]})
+
+
+class Session:
+    """
+    A directory of append-only JSONL logs describing the open tabs.
+
+    tabs.jsonl records every tab that is opened or closed, and each tab has
+    a log of its messages and conversation turns named after its pane ID.
+    Records are written by a background thread, so the UI never waits for
+    the disk, and are fsynced in batches at most every fsync_interval
+    seconds.
+
+    Restoring is cheap however long the history grows: tabs.jsonl is
+    compacted to the open tabs every time it is loaded, and the messages
+    shown first are read from the end of each tab's log. A tab's full log is
+    only read when the tab is opened.
+    """
+
+    def __init__(self, directory: str | Path, fsync_interval: float = 1.0) -> None:
+        """
+        Initializes the Session, creating its directory if needed.
+
+        Args:
+            directory: The directory the session's logs are kept in.
+            fsync_interval: The longest time, in seconds, that written
+                records may wait before being fsynced.
+        """
+        self.directory = Path(directory)
+        self.fsync_interval = fsync_interval
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer = threading.Thread(
+            target=self._write_records, name="session-writer", daemon=True
+        )
+        self._writer.start()
+
+    @classmethod
+    def from_env(cls) -> "Session | None":
+        """
+        Opens the session configured by the AGENT_TERMINAL_SESSION variable.
+
+        Returns:
+            A Session kept in the configured directory, or None if sessions
+            are not saved.
+        """
+        path = os.environ.get(SESSION_DIR_ENV_VAR)
+        if not path:
+            return None
+        return cls(Path(path).expanduser())
+
+    def load_tabs(self) -> list[SavedTab]:
+        """
+        Returns the tabs that were open, in the order they were opened.
+
+        Call this before recording anything: it also rewrites tabs.jsonl to
+        contain only these tabs.
+        """
+        tabs: dict[str, SavedTab] = {}
+        for record in _read_records(self.directory / _TABS_FILE):
+            if "open" in record:
+                pane_id, title, config = record["open"]
+                tabs[pane_id] = SavedTab(pane_id, title, tuple(config))
+            elif "close" in record:
+                tabs.pop(record["close"], None)
+
+        compacted = self.directory / (_TABS_FILE + ".tmp")
+        with compacted.open("w", encoding="utf-8") as file:
+            for tab in tabs.values():
+                file.write(_encode({"open": [tab.pane_id, tab.title, tab.config]}))
+            file.flush()
+            os.fsync(file.fileno())
+        compacted.replace(self.directory / _TABS_FILE)
+        return list(tabs.values())
+
+    def open_tab(self, pane_id: str, title: str, config: tuple) -> TabLog:
+        """
+        Records that a tab was opened.
+
+        Args:
+            pane_id: The ID of the tab.
+            title: The title of the tab.
+            config: The agent configuration the tab was created from.
+
+        Returns:
+            The log to record the tab's messages to.
+        """
+        self._append(None, {"open": [pane_id, title, list(config)]})
+        return self.tab(pane_id)
+
+    def close_tab(self, pane_id: str) -> None:
+        """Records that a tab was closed and deletes its log."""
+        self._append(None, {"close": pane_id})
+        self._queue.put((pane_id, None))
+
+    def tab(self, pane_id: str) -> TabLog:
+        """Returns the log of a tab that is already open."""
+        return TabLog(self, pane_id)
+
+    def read_tail(self, pane_id: str, count: int) -> list[SavedMessage]:
+        """
+        Returns the last messages of a tab, reading its log from the end.
+
+        Args:
+            pane_id: The ID of the tab.
+            count: The maximum number of messages to return.
+        """
+        messages = []
+        for record in _read_records_reversed(self._tab_path(pane_id)):
+            if len(messages) == count:
+                break
+            if "message" in record:
+                messages.append(SavedMessage(*record["message"]))
+        messages.reverse()
+        return messages
+
+    def read_tab(
+        self, pane_id: str
+    ) -> tuple[list[SavedMessage], list[tuple[str, str]]]:
+        """
+        Returns everything recorded for a tab.
+
+        Args:
+            pane_id: The ID of the tab.
+
+        Returns:
+            The tab's messages and the turns of its agent's conversation.
+        """
+        messages = []
+        turns = []
+        for record in _read_records(self._tab_path(pane_id)):
+            if "message" in record:
+                messages.append(SavedMessage(*record["message"]))
+            elif "turn" in record:
+                turns.append(tuple(record["turn"]))
+        return messages, turns
+
+    def close(self) -> None:
+        """Writes and fsyncs every pending record and stops the writer."""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+    def _tab_path(self, pane_id: str) -> Path:
+        """Returns the path of a tab's log."""
+        return self.directory / f"{pane_id}.jsonl"
+
+    def _append(self, pane_id: str | None, record: dict) -> None:
+        """Queues a record for a tab's log, or for tabs.jsonl if pane_id is None."""
+        self._queue.put((pane_id, record))
+
+    def _write_records(self) -> None:
+        """Writes queued records, fsyncing in batches (writer thread)."""
+        files: dict[str | None, IO[str]] = {}
+        unsynced: set[str | None] = set()
+        last_sync = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                    continue
+                pane_id, record = item
+                if record is None:
+                    file = files.pop(pane_id, None)
+                    if file is not None:
+                        file.close()
+                    unsynced.discard(pane_id)
+                    self._tab_path(pane_id).unlink(missing_ok=True)
+                    continue
+                file = files.get(pane_id)
+                if file is None:
+                    path = self.directory / _TABS_FILE
+                    if pane_id is not None:
+                        path = self._tab_path(pane_id)
+                    file = files[pane_id] = path.open("a", encoding="utf-8")
+                file.write(_encode(record))
+                unsynced.add(pane_id)
+
+            for pane_id in unsynced:
+                files[pane_id].flush()
+            now = time.monotonic()
+            if unsynced and (stopping or now - last_sync >= self.fsync_interval):
+                for pane_id in unsynced:
+                    os.fsync(files[pane_id].fileno())
+                unsynced.clear()
+                last_sync = now
+
+        for file in files.values():
+            file.close()
+
+
+def _encode(record: dict) -> str:
+    """Encodes a record as one line of JSON."""
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _read_records(path: Path) -> Iterator[dict]:
+    """Yields the records of a log, oldest first, skipping a torn last line."""
+    try:
+        file = path.open(encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _read_records_reversed(path: Path, block_size: int = 64 * 1024) -> Iterator[dict]:
+    """Yields the records of a log, newest first, reading it from the end."""
+    try:
+        file = path.open("rb")
+    except FileNotFoundError:
+        return
+    with file:
+        position = file.seek(0, os.SEEK_END)
+        rest = b""
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            file.seek(position)
+            lines = (file.read(size) + rest).split(b"\n")
+            # The first line may continue in the block before this one.
+            rest = lines.pop(0)
+            for line in reversed(lines):
+                if record := _decode(line):
+                    yield record
+        if record := _decode(rest):
+            yield record
+
+
+def _decode(line: bytes) -> dict | None:
+    """Decodes one line of a log, or returns None if it is empty or torn."""
+    try:
+        return json.loads(line) if line.strip() else None
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
@@ -1,26 +1,454 @@
 """A widget to display agent conversation history."""
 
-from textual.widgets import RichLog
+from bisect import bisect_right
 
+from rich.cells import cell_len
+from rich.console import Group, RenderableType
+from rich.errors import MarkupError
+from rich.highlighter import ReprHighlighter
+from rich.markdown import Markdown
+from rich.text import Text
+from textual.cache import LRUCache
+from textual.geometry import Region, Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+from textual.timer import Timer
 
-class AgentView(RichLog):
+from agent_terminal.session import TabLog
+from agent_terminal.widgets.message_store import Message, MessageStore
+
+STREAM_REFRESH_INTERVAL = 1 / 20
+"""The shortest time, in seconds, between two redraws of a streamed message."""
+
+
+class AgentView(ScrollView, can_focus=True):
     """A widget to display agent conversation history.
 
-    This widget is a subclass of RichLog, configured for displaying
-    chat-like conversations with auto-scrolling and highlighting.
+    The conversation is kept in a MessageStore as raw messages rather than
+    as rendered lines, so a long conversation costs little memory and older
+    messages can be spilled to disk. Only the messages in view are rendered,
+    and their rendered lines are cached per message. Agent responses are
+    rendered as Markdown; other messages as Rich markup. Messages that have not
+    been rendered at the current width have an estimated height, which is
+    corrected once they scroll into view.
+    """
+
+    DEFAULT_CSS = """
+    AgentView {
+        background: $surface;
+        color: $text;
+        overflow-y: scroll;
+    }
     """
 
-    def __init__(self, **kwargs) -> None:
-        """Initialize the AgentView."""
-        super().__init__(highlight=True, markup=True, **kwargs)
+    def __init__(
+        self,
+        max_in_memory: int = 1000,
+        render_cache_size: int = 256,
+        **kwargs,
+    ) -> None:
+        """Initialize the AgentView.
+
+        Args:
+            max_in_memory: The number of most recent messages kept in memory;
+                older ones are spilled to disk.
+            render_cache_size: The number of messages whose rendered lines
+                are cached.
+        """
+        super().__init__(**kwargs)
         self.border_title = "Agent Conversation"
+        self.auto_scroll = True
+        self.highlighter = ReprHighlighter()
+        self.session: TabLog | None = None
+        """The session log every added or finished message is recorded to."""
+        self.store = MessageStore(max_in_memory)
+        # Per message: its height in lines and the line it starts on, at the
+        # width the view was last laid out at. Starts from _dirty_from on
+        # are out of date.
+        self._heights: list[int] = []
+        self._starts: list[int] = []
+        # Per message: the cells and lines of its text, so heights can be
+        # estimated at a new width without reading spilled messages back.
+        self._shapes: list[tuple[int, int]] = []
+        self._dirty_from = 0
+        self._measured = bytearray()
+        self._width = 0
+        self._render_cache: LRUCache[int, tuple[int, list[Strip]]] = LRUCache(
+            render_cache_size
+        )
+        # State for the message currently being streamed, if any: the lines
+        # rendered for its finished lines or Markdown blocks, which are never
+        # rendered again, and how much of the text they cover. For Markdown,
+        # also how far the text has been scanned for block boundaries.
+        self._stream_index: int | None = None
+        self._stream_text = ""
+        self._stream_lines: list[Strip] = []
+        self._stream_rendered = 0
+        self._stream_finished = 0
+        self._stream_scanned = 0
+        self._stream_fenced = False
+        self._stream_width = 0
+        self._stream_timer: Timer | None = None
 
-    def add_message(self, sender: str, message: str, sender_style: str = "bold") -> None:
+    def add_message(
+        self,
+        sender: str,
+        message: str,
+        sender_style: str = "bold",
+        markdown: bool = False,
+    ) -> None:
         """Add a message to the conversation view.
 
         Args:
             sender: The name of the message sender (e.g., "User", "Agent").
             message: The content of the message.
             sender_style: The Rich style to apply to the sender's name.
+            markdown: Whether to render the content as Markdown rather than
+                Rich markup.
         """
-        self.write(f"[{sender_style}]{sender}:[/{sender_style}] {message}")
\ No newline at end of file
+        self._append(sender, message, sender_style, markdown)
+        if self.session is not None:
+            self.session.message(sender, sender_style, message, markdown)
+
+    def clear(self) -> None:
+        """Remove every message from the view."""
+        self.end_message()
+        self.store.close()
+        self.store = MessageStore(self.store.max_in_memory)
+        self._heights = []
+        self._starts = []
+        self._shapes = []
+        self._measured = bytearray()
+        self._dirty_from = 0
+        self._render_cache.clear()
+        self._update_virtual_size()
+
+    def set_busy(self, busy: bool) -> None:
+        """Show or hide the in-progress indicator for this conversation.
+
+        Args:
+            busy: Whether a request is currently in flight for this view.
+        """
+        self.set_class(busy, "-busy")
+        self.border_subtitle = "Thinking... (Esc to cancel)" if busy else ""
+
+    def begin_message(
+        self, sender: str, sender_style: str = "bold", markdown: bool = False
+    ) -> None:
+        """Start a message whose content will arrive in chunks.
+
+        Args:
+            sender: The name of the message sender (e.g., "User", "Agent").
+            sender_style: The Rich style to apply to the sender's name.
+            markdown: Whether to render the content as Markdown rather than
+                Rich markup.
+        """
+        self.end_message()
+        self._stream_index = self._append(sender, "", sender_style, markdown)
+
+    def append_to_message(self, chunk: str) -> None:
+        """Append a chunk to the message started with begin_message.
+
+        Chunks are collected and the message is redrawn at most every
+        STREAM_REFRESH_INTERVAL seconds. Only its last, unfinished line of
+        text, or Markdown block, is rendered again on each redraw.
+
+        Args:
+            chunk: The next piece of the message content.
+        """
+        if self._stream_index is None:
+            return
+        self._stream_text += chunk
+        if self._stream_timer is None:
+            self._stream_timer = self.set_timer(
+                STREAM_REFRESH_INTERVAL, self._flush_stream
+            )
+
+    def end_message(self) -> None:
+        """Finish the message started with begin_message."""
+        index = self._stream_index
+        if index is not None:
+            self._flush_stream()
+            message = self.store[index]
+            self._shapes[index] = _text_shape(message)
+            if self.session is not None:
+                self.session.message(
+                    message.sender,
+                    self.store.style(message.style_id),
+                    message.text,
+                    message.markdown,
+                )
+            if message.markdown:
+                # Blocks rendered on their own can differ slightly from the
+                # whole document, so render it once more when it comes into
+                # view.
+                self._render_cache.discard(index)
+                self._measured[index] = 0
+                self.refresh()
+        self._stream_index = None
+        self._stream_text = ""
+        self._stream_lines = []
+        self._stream_rendered = 0
+        self._stream_finished = 0
+        self._stream_scanned = 0
+        self._stream_fenced = False
+
+    def to_plain_text(self) -> str:
+        """Returns the whole conversation as plain text, one message per line."""
+        return "\n".join(
+            f"{message.sender}: "
+            + (message.text if message.markdown else _parse_markup(message.text).plain)
+            for message in self.store
+        )
+
+    def on_resize(self) -> None:
+        """Re-estimate every message's height when the width changes."""
+        width = self.scrollable_content_region.width
+        if width == self._width:
+            return
+        self._width = width
+        self._heights = [self._estimate_height(shape) for shape in self._shapes]
+        self._measured = bytearray(len(self._heights))
+        self._dirty_from = 0
+        self._update_virtual_size(follow=False)
+
+    def on_unmount(self) -> None:
+        """Delete the messages that were spilled to disk."""
+        self.store.close()
+
+    def render_lines(self, crop: Region) -> list[Strip]:
+        """Measure the messages in view, then render the visible lines."""
+        self._measure_visible()
+        return super().render_lines(crop)
+
+    def render_line(self, y: int) -> Strip:
+        """Render one line of the view from the message it belongs to."""
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.size.width
+        index = self._message_at(scroll_y + y)
+        if index is None or not self._width:
+            return Strip.blank(width, self.rich_style)
+        lines = self._render_message(index)
+        offset = scroll_y + y - self._starts[index]
+        if offset >= len(lines):
+            return Strip.blank(width, self.rich_style)
+        line = lines[offset].crop_extend(scroll_x, scroll_x + width, self.rich_style)
+        return line.apply_style(self.rich_style)
+
+    def _append(
+        self, sender: str, message: str, sender_style: str, markdown: bool
+    ) -> int:
+        """Adds a message to the store and the layout, and returns its index."""
+        index = self.store.append(sender, sender_style, message, markdown)
+        self._shapes.append(_text_shape(self.store[index]))
+        self._heights.append(self._estimate_height(self._shapes[index]))
+        self._starts.append(0)
+        self._measured.append(0)
+        self._dirty_from = min(self._dirty_from, index)
+        self._update_virtual_size()
+        return index
+
+    def _make_renderable(self, message: Message, prefix: bool = True) -> RenderableType:
+        """Turns a stored message, or part of one, into a Rich renderable.
+
+        Args:
+            message: The message to render.
+            prefix: Whether to start with the sender's name.
+        """
+        sender = Text(f"{message.sender}:", self.store.style(message.style_id))
+        if message.markdown:
+            body = Markdown(message.text)
+            return Group(sender, body) if prefix else body
+        text = _parse_markup(message.text)
+        if prefix:
+            text = Text.assemble(sender, " ", text)
+        text = self.highlighter(text)
+        text.expand_tabs()
+        return text
+
+    def _render(self, renderable: RenderableType) -> list[Strip]:
+        """Renders a renderable into lines at the current width."""
+        console = self.app.console
+        options = console.options.update_width(self._width)
+        return Strip.from_lines(
+            console.render_lines(renderable, options, pad=False)
+        ) or [Strip.blank(0)]
+
+    def _render_message(self, index: int) -> list[Strip]:
+        """Returns the lines of a message at the current width, cached."""
+        cached = self._render_cache.get(index)
+        if cached is not None and cached[0] == self._width:
+            return cached[1]
+        lines = self._render(self._make_renderable(self.store[index]))
+        self._cache_lines(index, lines)
+        return lines
+
+    def _cache_lines(self, index: int, lines: list[Strip]) -> None:
+        """Caches the lines of a message rendered at the current width."""
+        # LRUCache.set keeps the existing value of a key, so drop it first.
+        self._render_cache.discard(index)
+        self._render_cache.set(index, (self._width, lines))
+
+    def _flush_stream(self) -> None:
+        """Shows the text streamed so far and re-renders only what changed."""
+        if self._stream_timer is not None:
+            self._stream_timer.stop()
+            self._stream_timer = None
+        index = self._stream_index
+        if index is None:
+            return
+        self.store.set_text(index, self._stream_text)
+        if self._width:
+            lines = self._render_stream()
+            self._cache_lines(index, lines)
+            self._heights[index] = len(lines)
+            self._measured[index] = 1
+        else:
+            self._shapes[index] = _text_shape(self.store[index])
+            self._heights[index] = self._estimate_height(self._shapes[index])
+        self._dirty_from = min(self._dirty_from, index + 1)
+        self._update_virtual_size()
+
+    def _render_stream(self) -> list[Strip]:
+        """Renders the streamed message, reusing the lines of finished text."""
+        message = self.store[self._stream_index]
+        if self._stream_width != self._width:
+            self._stream_lines = []
+            self._stream_rendered = 0
+            self._stream_width = self._width
+        text = self._stream_text
+        finished = self._finished_length(message)
+        if finished > self._stream_rendered:
+            done = message._replace(text=text[self._stream_rendered : finished - 1])
+            self._stream_lines = self._join_blocks(
+                message, self._stream_lines, self._render_part(done)
+            )
+            self._stream_rendered = finished
+        tail = message._replace(text=text[self._stream_rendered :])
+        if self._stream_rendered and message.markdown and not tail.text.strip():
+            return self._stream_lines
+        return self._join_blocks(message, self._stream_lines, self._render_part(tail))
+
+    def _render_part(self, part: Message) -> list[Strip]:
+        """Renders part of the streamed message, prefixed if it is the start."""
+        prefix = not self._stream_rendered
+        return self._render(self._make_renderable(part, prefix=prefix))
+
+    def _finished_length(self, message: Message) -> int:
+        """Returns the length of the streamed text that can no longer change.
+
+        For Rich markup this is every complete line. For Markdown it is every
+        complete block: the text up to the last blank line outside a fenced
+        code block. Only the lines added since the last call are scanned.
+        """
+        text = self._stream_text
+        if not message.markdown:
+            return text.rfind("\n") + 1
+        position = self._stream_scanned
+        while (end := text.find("\n", position)) != -1:
+            line = text[position:end].strip()
+            if line.startswith(("```", "~~~")):
+                self._stream_fenced = not self._stream_fenced
+            elif not line and not self._stream_fenced:
+                self._stream_finished = end + 1
+            position = end + 1
+        self._stream_scanned = position
+        return self._stream_finished
+
+    @staticmethod
+    def _join_blocks(
+        message: Message, head: list[Strip], tail: list[Strip]
+    ) -> list[Strip]:
+        """Joins the lines of two parts of a message rendered separately."""
+        if message.markdown and head and tail and tail[0].cell_length:
+            # Markdown separates blocks with an empty line, which some blocks,
+            # such as lists, already start with.
+            return head + [Strip.blank(0)] + tail
+        return head + tail
+
+    def _estimate_height(self, shape: tuple[int, int]) -> int:
+        """Estimates the number of lines a message wraps to, without rendering.
+
+        Args:
+            shape: The cells and lines of the message's text, from _text_shape.
+        """
+        cells, lines = shape
+        if not self._width:
+            return lines
+        return max(lines, -(-cells // self._width))
+
+    def _update_starts(self) -> None:
+        """Recomputes the start lines that are out of date."""
+        start = self._dirty_from
+        if start >= len(self._heights):
+            return
+        line = self._starts[start - 1] + self._heights[start - 1] if start else 0
+        for index in range(start, len(self._heights)):
+            self._starts[index] = line
+            line += self._heights[index]
+        self._dirty_from = len(self._heights)
+
+    def _message_at(self, line: int) -> int | None:
+        """Returns the index of the message a line of the view belongs to."""
+        self._update_starts()
+        if not self._starts or line >= self._total_height():
+            return None
+        return bisect_right(self._starts, line) - 1
+
+    def _total_height(self) -> int:
+        """Returns the height of the whole conversation in lines."""
+        if not self._heights:
+            return 0
+        return self._starts[-1] + self._heights[-1]
+
+    def _measure_visible(self) -> None:
+        """Replaces estimated heights by real ones for the messages in view."""
+        if not self._width:
+            return
+        top = self.scroll_offset.y
+        bottom = top + self.scrollable_content_region.height
+        index = self._message_at(top)
+        changed = False
+        while index is not None and index < len(self._heights):
+            self._update_starts()
+            if self._starts[index] >= bottom:
+                break
+            if not self._measured[index]:
+                height = len(self._render_message(index))
+                self._measured[index] = 1
+                if height != self._heights[index]:
+                    self._heights[index] = height
+                    self._dirty_from = min(self._dirty_from, index + 1)
+                    changed = True
+            index += 1
+        if changed:
+            # Only follow the end if it was in view, so reading back through
+            # the conversation is not interrupted.
+            self._update_virtual_size(follow=top >= self.max_scroll_y)
+
+    def _update_virtual_size(self, follow: bool | None = None) -> None:
+        """Resizes the scrollable area to the conversation.
+
+        Args:
+            follow: Whether to scroll to the end, or None to use auto_scroll.
+        """
+        follow = self.auto_scroll if follow is None else follow
+        self._update_starts()
+        self.virtual_size = Size(self._width, self._total_height())
+        if follow:
+            self.scroll_end(animate=False)
+        self.refresh()
+
+
+def _text_shape(message: Message) -> tuple[int, int]:
+    """Returns the cells and lines a message's text takes, unwrapped."""
+    text = f"{message.sender}: {message.text}"
+    return cell_len(text), text.count("\n") + 1
+
+
+def _parse_markup(text: str) -> Text:
+    """Parses Rich markup, showing text that is not valid markup as is."""
+    try:
+        return Text.from_markup(text)
+    except MarkupError:
+        return Text(text)
@@ -0,0 +1,124 @@
+"""Compact storage for the messages of a conversation."""
+
+import json
+import tempfile
+from collections import deque
+from typing import IO, Iterator, NamedTuple
+
+
+class Message(NamedTuple):
+    """One message of a conversation."""
+
+    sender: str
+    style_id: int
+    text: str
+    markdown: bool = False
+
+
+class MessageStore:
+    """
+    Keeps a conversation's messages, spilling the oldest ones to disk.
+
+    Each message is stored as its sender, an interned style id, its raw
+    text and whether that text is Markdown. Only the newest max_in_memory
+    messages are held in memory; older ones are appended to an anonymous
+    temporary file, which the operating system deletes once the store is
+    closed, and are read back on demand.
+    Messages are addressed by their position in the whole conversation.
+    """
+
+    def __init__(self, max_in_memory: int = 1000) -> None:
+        """
+        Initializes the MessageStore.
+
+        Args:
+            max_in_memory: The number of most recent messages kept in memory.
+        """
+        self.max_in_memory = max_in_memory
+        self._styles: list[str] = []
+        self._style_ids: dict[str, int] = {}
+        self._messages: deque[Message] = deque()
+        self._spill_file: IO[bytes] | None = None
+        self._spill_offsets: list[int] = []
+
+    @property
+    def spilled(self) -> int:
+        """The number of messages that have been moved to disk."""
+        return len(self._spill_offsets)
+
+    def style(self, style_id: int) -> str:
+        """Returns the Rich style string for a style id."""
+        return self._styles[style_id]
+
+    def append(
+        self, sender: str, style: str, text: str, markdown: bool = False
+    ) -> int:
+        """
+        Adds a message to the end of the conversation.
+
+        Args:
+            sender: The name of the message sender.
+            style: The Rich style of the sender's name.
+            text: The content of the message.
+            markdown: Whether the content is Markdown rather than Rich markup.
+
+        Returns:
+            The index of the new message.
+        """
+        style_id = self._style_ids.get(style)
+        if style_id is None:
+            style_id = self._style_ids[style] = len(self._styles)
+            self._styles.append(style)
+        self._messages.append(Message(sender, style_id, text, markdown))
+        while len(self._messages) > self.max_in_memory:
+            self._spill(self._messages.popleft())
+        return len(self) - 1
+
+    def set_text(self, index: int, text: str) -> None:
+        """
+        Replaces the content of a message that is still in memory.
+
+        Args:
+            index: The index of the message.
+            text: The new content of the message.
+        """
+        position = index - self.spilled
+        if position < 0:
+            raise IndexError("Cannot change a message that has been spilled to disk")
+        self._messages[position] = self._messages[position]._replace(text=text)
+
+    def close(self) -> None:
+        """Deletes the messages that were spilled to disk."""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def __len__(self) -> int:
+        """Returns the number of messages in the conversation."""
+        return self.spilled + len(self._messages)
+
+    def __getitem__(self, index: int) -> Message:
+        """Returns a message, reading it back from disk if necessary."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        if index >= self.spilled:
+            return self._messages[index - self.spilled]
+        self._spill_file.seek(self._spill_offsets[index])
+        return Message(*json.loads(self._spill_file.readline()))
+
+    def __iter__(self) -> Iterator[Message]:
+        """Iterates over every message, oldest first."""
+        for index in range(self.spilled):
+            yield self[index]
+        yield from list(self._messages)
+
+    def _spill(self, message: Message) -> None:
+        """Appends a message to the spill file."""
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="agent-terminal-")
+        self._spill_file.seek(0, 2)
+        self._spill_offsets.append(self._spill_file.tell())
+        line = json.dumps(message, ensure_ascii=False) + "\n"
+        self._spill_file.write(line.encode("utf-8"))
@@ -0,0 +1,84 @@
+"""A panel summarizing one tab's request and speech metrics."""
+
+from rich.table import Table
+from textual.widgets import Static
+
+from agent_terminal.metrics import Metrics
+
+REFRESH_INTERVAL = 1.0
+"""How often, in seconds, a visible panel re-reads the metrics."""
+
+_LATENCIES = (
+    ("Queue wait", "agent_queue_wait_seconds"),
+    ("First token", "agent_time_to_first_token_seconds"),
+    ("Response", "agent_response_seconds"),
+    ("Synthesis", "tts_synthesis_seconds"),
+    ("First audio", "tts_time_to_first_audio_seconds"),
+)
+
+
+class MetricsPanel(Static):
+    """
+    Shows the latency percentiles and throughput of one tab's requests.
+
+    The panel starts hidden. It only reads the metrics while it is shown, so
+    hidden panels cost nothing.
+    """
+
+    def __init__(self, metrics: Metrics, tab: str, **kwargs) -> None:
+        """
+        Initializes the MetricsPanel.
+
+        Args:
+            metrics: The metrics to summarize.
+            tab: The pane ID of the tab whose requests are summarized.
+            **kwargs: Passed to Static.
+        """
+        super().__init__(classes="hidden", **kwargs)
+        self.metrics = metrics
+        self.tab = tab
+
+    def on_mount(self) -> None:
+        """Start refreshing the panel while it is shown."""
+        self.set_interval(REFRESH_INTERVAL, self._refresh_if_shown)
+
+    def toggle(self) -> None:
+        """Show or hide the panel."""
+        self.toggle_class("hidden")
+        self._refresh_if_shown()
+
+    def _refresh_if_shown(self) -> None:
+        """Re-read the metrics if the panel is shown."""
+        if not self.has_class("hidden"):
+            self.update(self.summary())
+
+    def summary(self) -> Table:
+        """Returns a table of the tab's metrics."""
+        requests = self.metrics.counter("agent_requests_total", tab=self.tab)
+        errors = self.metrics.counter("agent_errors_total", tab=self.tab)
+        tokens = self.metrics.counter("agent_tokens_total", tab=self.tab)
+        rate = self.metrics.histogram("agent_tokens_per_second", tab=self.tab)
+
+        table = Table(
+            title=f"{requests:g} requests, {errors:g} errors, {tokens:g} tokens",
+            box=None,
+            expand=True,
+        )
+        table.add_column("Stage")
+        table.add_column("p50", justify="right")
+        table.add_column("p95", justify="right")
+        for label, name in _LATENCIES:
+            histogram = self.metrics.histogram(name, tab=self.tab)
+            if histogram.count:
+                table.add_row(
+                    label,
+                    f"{histogram.quantile(0.5):.2f}s",
+                    f"{histogram.quantile(0.95):.2f}s",
+                )
+        if rate.count:
+            table.add_row(
+                "Tokens/s",
+                f"{rate.quantile(0.5):.1f}",
+                f"{rate.quantile(0.95):.1f}",
+            )
+        return table
@@ -0,0 +1,302 @@
+"""Local stand-ins for the OpenAI and Ollama chat APIs and for the TTS model.
+
+The servers speak just enough HTTP/1.1 (keep-alive and chunked streaming)
+for the real SDK clients to talk to them, so benchmarks exercise the same
+client, agent and UI code as a real session. Each response streams a
+deterministic text after a configurable delay and at a configurable token
+rate, so runs are reproducible.
+
+Usage, to try an agent against them by hand:
+    python benchmarks/mock_servers.py [--latency S] [--tokens-per-second N]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import AsyncIterator, NamedTuple
+
+import numpy as np
+
+
+class ResponseProfile(NamedTuple):
+    """How a mock server responds to every chat request."""
+
+    latency: float = 0.05
+    """Seconds before the first token, like a model processing the prompt."""
+    tokens_per_second: float = 200.0
+    """The rate at which tokens are streamed after the first."""
+    response_tokens: int = 100
+    """The number of tokens in every response."""
+
+
+def response_tokens(count: int) -> list[str]:
+    """Returns a deterministic response of count tokens, in short sentences."""
+    tokens = []
+    for index in range(count):
+        word = f" word{index}"
+        if index % 12 == 11 or index == count - 1:
+            word += "."
+        tokens.append(word)
+    return tokens
+
+
+class MockLLMServer:
+    """
+    Serves /v1/chat/completions (OpenAI) and /api/chat (Ollama) on localhost.
+
+    Ollama's /api/generate is answered too, as agents use it to load models.
+    Only chat requests are counted in requests.
+
+    Point the SDKs at it with OPENAI_BASE_URL=<url>/v1 and OLLAMA_HOST=<url>.
+    """
+
+    def __init__(self, profile: ResponseProfile = ResponseProfile()) -> None:
+        """
+        Initializes the MockLLMServer.
+
+        Args:
+            profile: How every chat request is answered.
+        """
+        self.profile = profile
+        self.requests = 0
+        self._server: asyncio.Server | None = None
+
+    @property
+    def url(self) -> str:
+        """The base URL of the running server."""
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self) -> None:
+        """Starts listening on a free port."""
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+
+    async def stop(self) -> None:
+        """Stops listening and closes every connection."""
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self) -> "MockLLMServer":
+        """Starts the server."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Stops the server."""
+        await self.stop()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serves the requests of one keep-alive connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                await self._respond(writer, path, json.loads(body or b"{}"))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # The server is stopping while a response is still streaming.
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(
+        self, writer: asyncio.StreamWriter, path: str, request: dict
+    ) -> None:
+        """Streams the response to one request as chunked HTTP."""
+        if path.startswith("/v1/chat/completions"):
+            content_type, events = "text/event-stream", self._openai_events(request)
+        elif path.startswith("/api/chat"):
+            content_type, events = "application/x-ndjson", self._ollama_events(request)
+        elif path.startswith("/api/generate"):
+            # A generate request without a prompt only loads or unloads the
+            # model, which the mock has no need to do.
+            body = json.dumps({"model": request.get("model"), "done": True}).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+            )
+            await writer.drain()
+            return
+        else:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            return
+
+        self.requests += 1
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            + f"Content-Type: {content_type}\r\n".encode()
+            + b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        async for event in events:
+            writer.write(b"%x\r\n%s\r\n" % (len(event), event))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _tokens(self) -> AsyncIterator[str]:
+        """Yields the response's tokens at the profile's pace."""
+        await asyncio.sleep(self.profile.latency)
+        interval = 1 / self.profile.tokens_per_second
+        start = time.perf_counter()
+        for index, token in enumerate(response_tokens(self.profile.response_tokens)):
+            # Paced against the start so sleep overshoot does not accumulate.
+            delay = start + index * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield token
+
+    async def _openai_events(self, request: dict) -> AsyncIterator[bytes]:
+        """Yields a chat completion as OpenAI server-sent events."""
+        model = request.get("model", "mock")
+
+        def event(delta: dict, usage: dict | None = None) -> bytes:
+            choices = [{"index": 0, "delta": delta, "finish_reason": None}]
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": model,
+                "choices": [] if usage else choices,
+                "usage": usage,
+            }
+            return b"data: " + json.dumps(chunk).encode() + b"\n\n"
+
+        async for token in self._tokens():
+            yield event({"content": token})
+        tokens = self.profile.response_tokens
+        yield event(
+            {},
+            usage={
+                "prompt_tokens": 10,
+                "completion_tokens": tokens,
+                "total_tokens": 10 + tokens,
+            },
+        )
+        yield b"data: [DONE]\n\n"
+
+    async def _ollama_events(self, request: dict) -> AsyncIterator[bytes]:
+        """Yields a chat response as Ollama's newline-delimited JSON."""
+        model = request.get("model", "mock")
+
+        def event(content: str, done: bool, **extra: int) -> bytes:
+            part = {
+                "model": model,
+                "message": {"role": "assistant", "content": content},
+                "done": done,
+                **extra,
+            }
+            return json.dumps(part).encode() + b"\n"
+
+        async for token in self._tokens():
+            yield event(token, done=False)
+        yield event(
+            "", done=True, prompt_eval_count=10, eval_count=self.profile.response_tokens
+        )
+
+
+class FakeWaveform:
+    """Stands in for the torch tensor a TTS model returns."""
+
+    def __init__(self, samples: np.ndarray) -> None:
+        """Wraps mono float32 samples."""
+        self.samples = samples
+
+    def detach(self) -> "FakeWaveform":
+        """Returns the waveform itself."""
+        return self
+
+    def reshape(self, *shape: int) -> "FakeWaveform":
+        """Returns the waveform with its samples reshaped."""
+        return FakeWaveform(self.samples.reshape(*shape))
+
+    def cpu(self) -> "FakeWaveform":
+        """Returns the waveform itself."""
+        return self
+
+    def float(self) -> "FakeWaveform":
+        """Returns the waveform itself."""
+        return self
+
+    def numpy(self) -> np.ndarray:
+        """Returns the samples."""
+        return self.samples
+
+
+class FakeTTSModel:
+    """
+    A TTS model that spends a controlled amount of CPU per character.
+
+    generate busy-loops for seconds_per_char of CPU time per character while
+    holding the GIL, which is harsher than torch (that releases it), so the
+    benchmarks show the worst case for the event loop.
+    """
+
+    sr = 24000
+    device = "cpu"
+
+    def __init__(
+        self, seconds_per_char: float = 0.0005, audio_per_char: float = 0.06
+    ) -> None:
+        """
+        Initializes the FakeTTSModel.
+
+        Args:
+            seconds_per_char: CPU seconds spent per character synthesized.
+            audio_per_char: Seconds of audio produced per character.
+        """
+        self.seconds_per_char = seconds_per_char
+        self.audio_per_char = audio_per_char
+        self.conds = None
+
+    def prepare_conditionals(self, audio_path: str) -> None:
+        """Pretends to encode a reference voice."""
+        self.conds = audio_path
+
+    def generate(self, text: str) -> FakeWaveform:
+        """Burns CPU in proportion to text's length and returns silence."""
+        deadline = time.thread_time() + self.seconds_per_char * len(text)
+        while time.thread_time() < deadline:
+            pass
+        frames = int(self.sr * self.audio_per_char * len(text))
+        return FakeWaveform(np.zeros((1, frames), dtype=np.float32))
+
+
+async def _serve(profile: ResponseProfile) -> None:
+    """Runs a mock server until interrupted."""
+    async with MockLLMServer(profile) as server:
+        print(f"OPENAI_BASE_URL={server.url}/v1")
+        print(f"OLLAMA_HOST={server.url}")
+        await asyncio.Event().wait()
+
+
+def main() -> None:
+    """Serves the mock APIs from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--response-tokens", type=int, default=100)
+    args = parser.parse_args()
+    profile = ResponseProfile(
+        args.latency, args.tokens_per_second, args.response_tokens
+    )
+    try:
+        asyncio.run(_serve(profile))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
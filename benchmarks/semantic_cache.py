@@ -0,0 +1,99 @@
+"""Measure how fast the semantic cache's vector index is searched.
+
+Fills a VectorIndex with random unit vectors, like the embeddings of
+unrelated prompts, and times lookups of near-duplicates of stored entries.
+Reports the median and 99th percentile lookup latency for each index size,
+how many lookups found the entry they were derived from and the memory the
+index takes.
+
+Usage:
+    python benchmarks/semantic_cache.py [--entries 1000 10000 100000]
+        [--dim 768] [--k 1 5] [--lookups 500] [--namespaces 1]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from agent_terminal.agents.semantic_cache import VectorIndex  # noqa: E402
+
+
+def fill_index(
+    entries: int, dim: int, namespaces: int, rng: np.random.Generator
+) -> tuple[VectorIndex, np.ndarray]:
+    """
+    Builds an index of random entries, spread over several namespaces.
+
+    Returns:
+        The index and the vectors stored in it.
+    """
+    vectors = rng.standard_normal((entries, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Room for every vector and a short response, with a little to spare.
+    index = VectorIndex(max_bytes=entries * (dim * 4 + 12 + 16) * 2)
+    for position, vector in enumerate(vectors):
+        index.add(f"ns{position % namespaces}", vector, f"response {position}")
+    return index, vectors
+
+
+def run_scenario(
+    entries: int, dim: int, k: int, lookups: int, namespaces: int, seed: int = 0
+) -> dict:
+    """
+    Times lookups of slightly perturbed copies of stored vectors.
+
+    Returns:
+        The median and 99th percentile latency in milliseconds, the share of
+        lookups whose best match was the original entry and the index's size
+        in megabytes.
+    """
+    rng = np.random.default_rng(seed)
+    index, vectors = fill_index(entries, dim, namespaces, rng)
+    targets = rng.integers(0, entries, size=lookups)
+    latencies = []
+    found = 0
+    for target in targets:
+        query = vectors[target] + rng.standard_normal(dim, dtype=np.float32) * 0.01
+        start = time.perf_counter()
+        matches = index.search(f"ns{target % namespaces}", query, k)
+        latencies.append(time.perf_counter() - start)
+        found += matches[0].response == f"response {target}"
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "recall": found / lookups,
+        "index_mb": index.nbytes / 2**20,
+    }
+
+
+def main() -> None:
+    """Runs the benchmark and prints a report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--entries", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--namespaces", type=int, default=1)
+    args = parser.parse_args()
+
+    for entries in args.entries:
+        for k in args.k:
+            result = run_scenario(
+                entries, args.dim, k, args.lookups, args.namespaces
+            )
+            values = ", ".join(f"{name} {value:.3f}" for name, value in result.items())
+            print(f"entries={entries} dim={args.dim} k={k}: {values}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure how long the Agent Terminal takes to import, module by module.
+
+Runs ``python -X importtime -c "import agent_terminal.app"`` in fresh
+interpreters and reports the total import time, the slowest top-level
+imports and which heavy third-party packages were loaded at startup.
+
+Usage:
+    python benchmarks/startup.py [--runs N] [--top N]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+TARGET = "agent_terminal.app"
+HEAVY_PACKAGES = ("openai", "ollama", "httpx", "numpy", "soundfile", "sounddevice")
+
+
+def measure_once() -> dict[str, int]:
+    """Imports the app in a fresh interpreter.
+
+    Returns:
+        The cumulative import time, in microseconds, of every module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {TARGET}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> None:
+    """Runs the benchmark and prints a report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Interpreters to start.")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to show.")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    totals = [run[TARGET] / 1000 for run in runs]
+    print(
+        f"import {TARGET}: median {statistics.median(totals):.1f} ms, "
+        f"min {min(totals):.1f} ms over {args.runs} runs"
+    )
+
+    last = runs[-1]
+    top_level = {name: us for name, us in last.items() if "." not in name}
+    print("\nSlowest top-level imports (last run):")
+    for name, us in sorted(top_level.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    loaded = [name for name in HEAVY_PACKAGES if name in last]
+    print(f"\nHeavy packages imported at startup: {', '.join(loaded) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
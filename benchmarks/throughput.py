@@ -0,0 +1,215 @@
+"""Measure how the Agent Terminal copes with many tabs streaming at once.
+
+Drives a headless AgentTerminal through Textual's Pilot against local mock
+OpenAI and Ollama servers, broadcasting one prompt to every tab for each
+combination of tab count, concurrency and response size. A second suite
+runs the fake TTS model through the shared TTS executor to measure speech
+synthesis throughput and how far it stalls the event loop.
+
+Every scenario is repeated and the median is reported. Use --output to save
+the results as JSON and --compare to diff them against an earlier run.
+
+Usage:
+    python benchmarks/throughput.py [--tabs 1 4 8] [--concurrency 1 4]
+        [--tokens 100 1000] [--repeat 3] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from mock_servers import FakeTTSModel, MockLLMServer, ResponseProfile  # noqa: E402
+
+from agent_terminal.app import AgentTerminal  # noqa: E402
+from agent_terminal.audio.tts import TTSModelRegistry  # noqa: E402
+from agent_terminal.metrics import metrics  # noqa: E402
+
+AGENT_CONFIGS = (("OpenAIAgent", "mock-gpt"), ("OllamaAgent", "mock-llama"))
+"""The agents the tabs alternate between."""
+
+
+class Scenario(NamedTuple):
+    """One point of the benchmark matrix."""
+
+    tabs: int
+    concurrency: int
+    tokens: int
+
+    @property
+    def name(self) -> str:
+        """A stable name, used to match results across runs."""
+        return f"tabs={self.tabs} concurrency={self.concurrency} tokens={self.tokens}"
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Returns the longest the event loop was late to wake up until stop."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run_scenario(scenario: Scenario, profile: ResponseProfile) -> dict:
+    """
+    Broadcasts one prompt to every tab of a fresh app and times it.
+
+    Returns:
+        The wall time of the broadcast, the tokens per second shown by the
+        UI, the median and worst time to first token, the worst event loop
+        lag seen while it ran and the number of requests served.
+    """
+    profile = profile._replace(response_tokens=scenario.tokens)
+    async with MockLLMServer(profile) as server:
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        os.environ["OLLAMA_HOST"] = server.url
+        app = AgentTerminal(max_in_flight=scenario.concurrency, prewarm=False)
+        async with app.run_test(size=(120, 40)) as pilot:
+            for index in range(scenario.tabs):
+                if index:
+                    await pilot.press("ctrl+t")
+                config = AGENT_CONFIGS[index % len(AGENT_CONFIGS)]
+                pilot.app.screen.dismiss(config)
+                await pilot.pause()
+
+            before = metrics.histogram("agent_time_to_first_token_seconds")
+            prompt_input = pilot.app.query_one("#prompt_input")
+            prompt_input.value = "Benchmark prompt."
+
+            stop = asyncio.Event()
+            lag = asyncio.create_task(loop_lag(stop))
+            start = time.perf_counter()
+            await pilot.press("ctrl+b")
+            # Give the broadcast's workers a moment to be created.
+            await pilot.pause()
+            while app.requests:
+                await asyncio.sleep(0.001)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            worst_lag = await lag
+
+            after = metrics.histogram("agent_time_to_first_token_seconds")
+            # Only this run's observations: the difference of the histograms.
+            after.counts = [a - b for a, b in zip(after.counts, before.counts)]
+            after.count -= before.count
+            first_tokens = [after.quantile(0.5), after.quantile(1.0)]
+
+    tokens = scenario.tabs * scenario.tokens
+    return {
+        "seconds": elapsed,
+        "tokens_per_second": tokens / elapsed,
+        "ttft_p50": first_tokens[0],
+        "ttft_max": first_tokens[1],
+        "loop_lag_max": worst_lag,
+        "requests": server.requests,
+    }
+
+
+async def run_tts_scenario(agents: int, sentences: int) -> dict:
+    """
+    Synthesizes sentences for several agents at once on the fake TTS model.
+
+    Returns:
+        The wall time, the sentences synthesized per second and the worst
+        event loop lag seen while synthesizing.
+    """
+    registry = TTSModelRegistry(idle_timeout=0, loader=lambda device: FakeTTSModel())
+    sentence = "This is a sentence of a benchmark response."
+
+    async def speak() -> None:
+        async with registry.use() as tts:
+            for _ in range(sentences):
+                await tts.executor.run(tts.model.generate, sentence)
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(speak() for _ in range(agents)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return {
+        "seconds": elapsed,
+        "sentences_per_second": agents * sentences / elapsed,
+        "loop_lag_max": await lag,
+    }
+
+
+def median_result(runs: list[dict]) -> dict:
+    """Returns the median of every measurement over several runs."""
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+async def run_all(args: argparse.Namespace) -> dict[str, dict]:
+    """Runs every scenario the repeated number of times."""
+    # The mock servers do not check the key, but the OpenAI agent needs one.
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    profile = ResponseProfile(args.latency, args.tokens_per_second)
+    results = {}
+    for tabs, concurrency, tokens in itertools.product(
+        args.tabs, args.concurrency, args.tokens
+    ):
+        scenario = Scenario(tabs, concurrency, tokens)
+        runs = [await run_scenario(scenario, profile) for _ in range(args.repeat)]
+        results[scenario.name] = median_result(runs)
+        print_result(scenario.name, results[scenario.name])
+    for agents in args.tts_agents:
+        name = f"tts agents={agents} sentences={args.tts_sentences}"
+        runs = [
+            await run_tts_scenario(agents, args.tts_sentences)
+            for _ in range(args.repeat)
+        ]
+        results[name] = median_result(runs)
+        print_result(name, results[name])
+    return results
+
+
+def print_result(name: str, result: dict) -> None:
+    """Prints one scenario's results on a line."""
+    values = ", ".join(f"{key} {value:.3f}" for key, value in result.items())
+    print(f"{name}: {values}")
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict]) -> None:
+    """Prints how each scenario's wall time changed against a baseline."""
+    print("\nChange in wall time against the baseline:")
+    for name, result in results.items():
+        if name in baseline:
+            change = result["seconds"] / baseline[name]["seconds"] - 1
+            print(f"{name}: {change:+.1%}")
+
+
+def main() -> None:
+    """Runs the benchmark and prints a report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tabs", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--tts-agents", type=int, nargs="*", default=[1, 4])
+    parser.add_argument("--tts-sentences", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Save the results as JSON.")
+    parser.add_argument("--compare", type=Path, help="Results to compare with.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_all(args))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Tests for the virtualized AgentView."""
+
+from unittest.mock import patch
+
+import pytest
+from textual.app import App, ComposeResult
+
+from agent_terminal.widgets.agent_view import AgentView
+from agent_terminal.widgets.message_store import MessageStore
+
+pytestmark = pytest.mark.asyncio
+
+
+class ViewApp(App):
+    """A bare app hosting a single AgentView."""
+
+    def __init__(self, view: AgentView) -> None:
+        super().__init__()
+        self.view = view
+
+    def compose(self) -> ComposeResult:
+        yield self.view
+
+
+async def test_long_conversation_renders_only_the_visible_messages():
+    """Test that a long conversation is spilled and rendered lazily."""
+    view = AgentView(max_in_memory=50, render_cache_size=30)
+    async with ViewApp(view).run_test(size=(60, 20)) as pilot:
+        for i in range(500):
+            view.add_message("User", f"message {i}")
+        await pilot.pause()
+
+        assert view.store.spilled == 450
+        assert view.virtual_size.height == 500
+        assert view.scroll_offset.y == view.max_scroll_y
+        # Only the messages around the end were rendered.
+        assert len(view._render_cache) <= 30
+        assert view._render_cache.get(499) is not None
+        assert view._render_cache.get(0) is None
+
+        view.scroll_home(animate=False)
+        await pilot.pause()
+        assert view._render_cache.get(0) is not None
+        assert "User: message 0" in view.to_plain_text()
+
+
+async def test_resizing_does_not_read_spilled_messages_back():
+    """Test that a resize re-estimates heights without reading every message."""
+    view = AgentView(max_in_memory=50)
+    async with ViewApp(view).run_test(size=(60, 20)) as pilot:
+        for i in range(500):
+            view.add_message("User", f"message {i} " * (i % 7))
+        await pilot.pause()
+        read = []
+        get_message = view.store.__getitem__
+
+        def reading(index):
+            read.append(index)
+            return get_message(index)
+
+        with patch.object(MessageStore, "__getitem__", lambda _, i: reading(i)):
+            await pilot.resize_terminal(30, 20)
+            await pilot.pause()
+
+        assert view._width < 60
+        # Only the messages in view were read, not the whole history.
+        assert 0 < len(set(read)) <= 20
+
+
+async def test_estimated_heights_are_corrected_when_rendered():
+    """Test that wrapped messages take their real height once in view."""
+    view = AgentView()
+    async with ViewApp(view).run_test(size=(40, 20)) as pilot:
+        view.add_message("Agent", "word " * 30)
+        view.add_message("User", "short")
+        await pilot.pause()
+
+        lines = view._render_message(0)
+        assert len(lines) > 1
+        assert view._heights[0] == len(lines)
+        assert view.virtual_size.height == len(lines) + 1
+
+
+async def test_streamed_message_is_updated_in_place():
+    """Test that chunks extend the streamed message and invalid markup is kept."""
+    view = AgentView()
+    async with ViewApp(view).run_test() as pilot:
+        view.begin_message("Agent", sender_style="bold blue")
+        view.append_to_message("Use [/b] to ")
+        view.append_to_message("close bold.")
+        view.end_message()
+        view.append_to_message("ignored")
+        await pilot.pause()
+
+        assert view.to_plain_text() == "Agent: Use [/b] to close bold."
+        assert view._render_message(0)[0].text.startswith("Agent: Use [/b]")
+
+
+async def test_streamed_chunks_are_redrawn_at_a_bounded_rate():
+    """Test that chunks are batched and finished lines are not rendered again."""
+    view = AgentView()
+    async with ViewApp(view).run_test() as pilot:
+        view.begin_message("Agent")
+        for word in "first line\nsecond".split(" "):
+            view.append_to_message(word + " ")
+        # Nothing is redrawn until the refresh interval has passed.
+        assert view.store[0].text == ""
+
+        await pilot.pause(0.1)
+        assert view.store[0].text == "first line\nsecond "
+        first_line = view._render_message(0)[0]
+
+        view.append_to_message("line")
+        view.end_message()
+
+        lines = view._render_message(0)
+        assert lines[0] is first_line
+        assert [line.text.rstrip() for line in lines] == [
+            "Agent: first line",
+            "second line",
+        ]
+
+
+MARKDOWN_RESPONSE = (
+    "Here is the fix.\n\n"
+    "```python\nx = 1\n\ny = 2\n```\n\n"
+    "It sets **two** variables.\n"
+)
+
+
+async def test_streamed_markdown_renders_like_the_whole_document():
+    """Test that Markdown streamed block by block matches a full render."""
+    view = AgentView()
+    async with ViewApp(view).run_test() as pilot:
+        view.begin_message("Agent", markdown=True)
+        for position in range(0, len(MARKDOWN_RESPONSE), 7):
+            view.append_to_message(MARKDOWN_RESPONSE[position : position + 7])
+            view._flush_stream()
+        streamed = [line.text for line in view._render_message(0)]
+        view.end_message()
+        await pilot.pause()
+
+        full = [line.text for line in view._render_message(0)]
+        assert streamed == full
+        assert any(line.strip() == "x = 1" for line in full)
+        assert "**" not in "".join(full)
+
+
+async def test_finished_markdown_blocks_are_not_rendered_again():
+    """Test that only the unfinished block is parsed on each redraw."""
+    view = AgentView()
+    async with ViewApp(view).run_test():
+        view.begin_message("Agent", markdown=True)
+        view.append_to_message("First paragraph.\n\n```\ncode\n\n")
+        view._flush_stream()
+        # The blank line inside the open code fence does not end a block.
+        assert view._stream_rendered == len("First paragraph.\n\n")
+        finished = list(view._stream_lines)
+
+        view.append_to_message("more code\n```\n\nLast")
+        view._flush_stream()
+
+        assert view._stream_lines[: len(finished)] == finished
+        assert view._render_message(0)[-1].text.startswith("Last")
@@ -1,14 +1,26 @@
 """Tests for the AgentTerminal application."""
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from textual.pilot import Pilot
 from textual.widgets import Button, Input, Select, TabbedContent
 
-from agent_terminal.app import AgentTerminal
+from agent_terminal.agents.base import Agent
+from agent_terminal.agents.errors import AgentConnectionError
+from agent_terminal.agents.history import ConversationHistory
+from agent_terminal.agents.residency import ModelResidency
+from agent_terminal.app import (
+    DEFAULT_MAX_IN_FLIGHT,
+    MAX_IN_FLIGHT_ENV_VAR,
+    AgentTerminal,
+    max_in_flight_from_env,
+)
+from agent_terminal.metrics import metrics
 from agent_terminal.screens import AgentSelectionScreen
 from agent_terminal.widgets.agent_view import AgentView
+from agent_terminal.widgets.metrics_panel import MetricsPanel
 
 # Mark all tests in this file as asyncio
 pytestmark = pytest.mark.asyncio
@@ -17,12 +29,27 @@ pytestmark = pytest.mark.asyncio
 
 MOCK_RESPONSE = "This is a mocked AI response."
 
+
+async def mock_stream_response(prompt: str):
+    """Yields the mocked response in two chunks, like a streaming agent."""
+    yield MOCK_RESPONSE[:10]
+    yield MOCK_RESPONSE[10:]
+
+
 # Mock the agent classes to avoid real API calls and dependencies
 mock_openai_agent_instance = MagicMock()
 mock_openai_agent_instance.get_response = AsyncMock(return_value=MOCK_RESPONSE)
+mock_openai_agent_instance.last_usage = None
+mock_openai_agent_instance.stream_response = MagicMock(
+    side_effect=mock_stream_response
+)
 
 mock_ollama_agent_instance = MagicMock()
 mock_ollama_agent_instance.get_response = AsyncMock(return_value=MOCK_RESPONSE)
+mock_ollama_agent_instance.last_usage = None
+mock_ollama_agent_instance.stream_response = MagicMock(
+    side_effect=mock_stream_response
+)
 
 MockOpenAIAgent = MagicMock(return_value=mock_openai_agent_instance)
 MockOllamaAgent = MagicMock(return_value=mock_ollama_agent_instance)
@@ -30,9 +57,24 @@ MockOllamaAgent = MagicMock(return_value=mock_ollama_agent_instance)
 # Mock the VoiceCloningAgent to prevent model downloads during tests
 mock_vc_agent_instance = MagicMock()
 mock_vc_agent_instance.get_response = AsyncMock(return_value=MOCK_RESPONSE)
+mock_vc_agent_instance.last_usage = None
+mock_vc_agent_instance.stream_response = MagicMock(side_effect=mock_stream_response)
 MockVoiceCloningAgent = MagicMock(return_value=mock_vc_agent_instance)
 
 
+async def add_agent(pilot: Pilot, config: tuple) -> None:
+    """Adds an agent tab by dismissing the selection screen with a config."""
+    if not isinstance(pilot.app.screen, AgentSelectionScreen):
+        await pilot.press("ctrl+t")
+    pilot.app.screen.dismiss(config)
+    await pilot.pause()
+
+
+def view_text(agent_view: AgentView) -> str:
+    """Returns the plain text currently rendered in an AgentView."""
+    return agent_view.to_plain_text()
+
+
 @patch.dict(
     "agent_terminal.app.AgentTerminal.agent_classes",
     {
@@ -123,6 +165,7 @@ class TestAgentTerminal:
             test_prompt = "Hello, mocked AI!"
             prompt_input.value = test_prompt
             await pilot.press("enter")
+            await pilot.app.workers.wait_for_complete()
             await pilot.pause()
 
             # Verify the flow
@@ -134,7 +177,213 @@ class TestAgentTerminal:
             assert f"OpenAIAgent: {MOCK_RESPONSE}" in log_content
 
             # Verify the mock was called
-            mock_openai_agent_instance.get_response.assert_awaited_with(test_prompt)
+            mock_openai_agent_instance.stream_response.assert_called_with(test_prompt)
+
+    async def test_prompt_runs_in_background_and_can_be_cancelled(self):
+        """Test that a slow agent neither blocks the input nor its cancellation."""
+        release = asyncio.Event()
+
+        async def slow_stream_response(prompt: str):
+            yield "partial"
+            await release.wait()
+            yield " never shown"
+
+        mock_openai_agent_instance.stream_response.side_effect = slow_stream_response
+        app = AgentTerminal()
+        try:
+            async with app.run_test() as pilot:
+                await add_agent(pilot, ("OpenAIAgent", "gpt-4o"))
+
+                prompt_input = pilot.app.query_one("#prompt_input", Input)
+                prompt_input.focus()
+                prompt_input.value = "Take your time."
+                await pilot.press("enter")
+                await pilot.pause()
+
+                # The request is in flight, but the input stays usable.
+                agent_view = pilot.app.query_one(AgentView)
+                assert "agent_1" in app.requests
+                assert prompt_input.disabled is False
+                assert agent_view.has_class("-busy")
+
+                await pilot.press("escape")
+                await pilot.app.workers.wait_for_complete()
+                await pilot.pause()
+
+                assert "agent_1" not in app.requests
+                assert not agent_view.has_class("-busy")
+                assert "Request cancelled." in view_text(agent_view)
+        finally:
+            mock_openai_agent_instance.stream_response.side_effect = (
+                mock_stream_response
+            )
+
+    async def test_agent_errors_are_shown_with_their_hint(self):
+        """Test that a structured agent error is shown apart from the response."""
+
+        async def failing_stream_response(prompt: str):
+            yield "Partial"
+            raise AgentConnectionError(
+                "Could not connect to [service].", "Mock", "Start the service."
+            )
+
+        mock_openai_agent_instance.stream_response.side_effect = (
+            failing_stream_response
+        )
+        app = AgentTerminal(prewarm=False)
+        try:
+            async with app.run_test() as pilot:
+                await add_agent(pilot, ("OpenAIAgent", "gpt-4o"))
+                prompt_input = pilot.app.query_one("#prompt_input", Input)
+                prompt_input.focus()
+                prompt_input.value = "Hello?"
+                await pilot.press("enter")
+                await pilot.app.workers.wait_for_complete()
+                await pilot.pause()
+
+                log_content = view_text(pilot.app.query_one(AgentView))
+                assert "Partial" in log_content
+                assert "Error: Could not connect to [service]." in log_content
+                assert "Start the service." in log_content
+        finally:
+            mock_openai_agent_instance.stream_response.side_effect = (
+                mock_stream_response
+            )
+
+    async def test_broadcast_sends_prompt_to_every_agent(self):
+        """Test that a broadcast fans one prompt out to every open tab."""
+        app = AgentTerminal(max_in_flight=1)
+        async with app.run_test() as pilot:
+            await add_agent(pilot, ("OpenAIAgent", "gpt-4o"))
+            await add_agent(pilot, ("OllamaAgent", "llama3"))
+
+            prompt_input = pilot.app.query_one("#prompt_input", Input)
+            prompt_input.value = "Compare yourselves."
+            await pilot.press("ctrl+b")
+            await pilot.app.workers.wait_for_complete()
+            await pilot.pause()
+
+            assert prompt_input.value == ""
+            assert app.requests == {}
+            mock_openai_agent_instance.stream_response.assert_called_with(
+                "Compare yourselves."
+            )
+            mock_ollama_agent_instance.stream_response.assert_called_with(
+                "Compare yourselves."
+            )
+            for agent_view in pilot.app.query(AgentView):
+                log_content = view_text(agent_view)
+                assert "User: Compare yourselves." in log_content
+                assert MOCK_RESPONSE in log_content
+                assert "Completed in" in log_content
+
+    async def test_metrics_panel_shows_the_tab_requests(self, monkeypatch, tmp_path):
+        """Test that requests are timed per tab, shown on F2 and exported."""
+        monkeypatch.setenv("AGENT_TERMINAL_METRICS", str(tmp_path / "metrics.prom"))
+        # Metrics are process-wide, so earlier tests may have counted agent_1.
+        before = metrics.counter("agent_requests_total", tab="agent_1")
+        app = AgentTerminal(prewarm=False)
+        async with app.run_test() as pilot:
+            await add_agent(pilot, ("OpenAIAgent", "gpt-4o"))
+            panel = pilot.app.query_one(MetricsPanel)
+            assert panel.has_class("hidden")
+
+            prompt_input = pilot.app.query_one("#prompt_input", Input)
+            prompt_input.focus()
+            prompt_input.value = "Time me."
+            await pilot.press("enter")
+            await pilot.app.workers.wait_for_complete()
+            await pilot.press("f2")
+            await pilot.pause()
+
+            assert not panel.has_class("hidden")
+            assert metrics.counter("agent_requests_total", tab="agent_1") == before + 1
+            assert panel.summary().title.startswith(f"{before + 1:g} requests")
+
+        exported = (tmp_path / "metrics.prom").read_text()
+        assert 'agent_requests_total{agent="MagicMock",tab="agent_1"}' in exported
+
+    async def test_session_is_restored_lazily(self, monkeypatch, tmp_path):
+        """Test that tabs come back after a restart, each agent once opened."""
+        monkeypatch.setenv("AGENT_TERMINAL_SESSION", str(tmp_path))
+        history = ConversationHistory()
+
+        async def remembering_stream_response(prompt: str):
+            history.add_turn(prompt, MOCK_RESPONSE)
+            yield MOCK_RESPONSE
+
+        mock_ollama_agent_instance.history = history
+        mock_ollama_agent_instance.stream_response.side_effect = (
+            remembering_stream_response
+        )
+        try:
+            app = AgentTerminal()
+            async with app.run_test() as pilot:
+                await add_agent(pilot, ("OllamaAgent", "llama3"))
+                await add_agent(pilot, ("OpenAIAgent", "gpt-4o"))
+                pilot.app.query_one(TabbedContent).active = "agent_1"
+                await pilot.pause()
+                prompt_input = pilot.app.query_one("#prompt_input", Input)
+                prompt_input.focus()
+                prompt_input.value = "Remember this."
+                await pilot.press("enter")
+                await pilot.app.workers.wait_for_complete()
+                await pilot.pause()
+                pilot.app.query_one(TabbedContent).active = "agent_2"
+                await pilot.pause()
+
+            history.clear()
+            MockOllamaAgent.reset_mock()
+            app = AgentTerminal()
+            async with app.run_test() as pilot:
+                await pilot.pause()
+                tabs = pilot.app.query_one(TabbedContent)
+                assert not isinstance(pilot.app.screen, AgentSelectionScreen)
+                assert tabs.active == "agent_2"
+                assert list(app.agents) == ["agent_2"]
+                # The other tab only shows its latest messages for now.
+                assert "agent_1" in app.saved_tabs
+                MockOllamaAgent.assert_not_called()
+                ollama_view = tabs.get_pane("agent_1").query_one(AgentView)
+                assert "User: Remember this." in view_text(ollama_view)
+
+                tabs.active = "agent_1"
+                await pilot.pause()
+
+                MockOllamaAgent.assert_called_once_with(model="llama3")
+                assert "agent_1" in app.agents
+                assert history.last_turn == ("Remember this.", MOCK_RESPONSE)
+                assert f"MagicMock: {MOCK_RESPONSE}" in view_text(ollama_view)
+
+                await add_agent(pilot, ("OpenAIAgent", "gpt-4o"))
+                assert tabs.active == "agent_3"
+        finally:
+            del mock_ollama_agent_instance.history
+            mock_ollama_agent_instance.stream_response.side_effect = (
+                mock_stream_response
+            )
+
+    async def test_selection_screen_asks_for_the_inputs_an_agent_declares(self):
+        """Test that the selection screen is built from the agent specs."""
+        app = AgentTerminal(prewarm=False)
+        async with app.run_test() as pilot:
+            screen = pilot.app.screen
+            audio_path_input = screen.query_one("#audio_path_input", Input)
+            assert audio_path_input.has_class("hidden")
+
+            screen.query_one("#agent_select", Select).value = "Voice Cloning (GPT-4o)"
+            await pilot.pause()
+            assert not audio_path_input.has_class("hidden")
+
+            audio_path_input.value = "/voices/alice.wav"
+            await pilot.click("#create_button")
+            await pilot.pause()
+
+            tab = pilot.app.query_one(TabbedContent).get_tab("agent_1")
+            assert str(tab.label) == "VC: alice"
+            MockVoiceCloningAgent.assert_called_with(
+                model="gpt-4o", audio_path="/voices/alice.wav"
+            )
 
     async def test_agent_creation_error_handling(self):
         """Test that UI shows an error if agent instantiation fails."""
@@ -161,4 +410,48 @@ class TestAgentTerminal:
 
         # Reset the mock for other tests
         MockOpenAIAgent.side_effect = None
-        MockOpenAIAgent.return_value = mock_openai_agent_instance
\ No newline at end of file
+        MockOpenAIAgent.return_value = mock_openai_agent_instance
+
+    async def test_local_models_are_warmed_up_and_show_their_load_state(self):
+        """Test that an Ollama tab loads its model and shows it loading."""
+        loaded = asyncio.Event()
+
+        class LocalAgent(Agent):
+            residency = ModelResidency()
+
+            def __init__(self, model):
+                self.model = model
+
+            async def warm_up(self):
+                await self.residency.warm(
+                    self.model, loaded.wait, AsyncMock(), keep_alive="5m"
+                )
+
+            async def stream_response(self, prompt):
+                yield MOCK_RESPONSE
+
+        app = AgentTerminal(prewarm=False)
+        with patch.dict(app.agent_classes, {"OllamaAgent": LocalAgent}):
+            async with app.run_test() as pilot:
+                await add_agent(pilot, ("OllamaAgent", "llama3"))
+                await pilot.pause()
+                tab = pilot.app.query_one(TabbedContent).get_tab("agent_1")
+                assert str(tab.label) == "OllamaAgent: llama3 (loading)"
+
+                loaded.set()
+                await pilot.pause()
+                assert str(tab.label) == "OllamaAgent: llama3"
+
+
+def test_broadcast_limit_is_configured_from_the_environment(monkeypatch):
+    """Test that users can change how many requests a broadcast runs at once."""
+    monkeypatch.delenv(MAX_IN_FLIGHT_ENV_VAR, raising=False)
+    assert max_in_flight_from_env() == DEFAULT_MAX_IN_FLIGHT
+
+    monkeypatch.setenv(MAX_IN_FLIGHT_ENV_VAR, "8")
+    assert AgentTerminal().max_in_flight == 8
+    assert AgentTerminal(max_in_flight=2).max_in_flight == 2
+
+    monkeypatch.setenv(MAX_IN_FLIGHT_ENV_VAR, "0")
+    with pytest.raises(ValueError, match=MAX_IN_FLIGHT_ENV_VAR):
+        max_in_flight_from_env()
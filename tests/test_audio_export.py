@@ -0,0 +1,43 @@
+"""Unit tests for exporting spoken responses to WAV files."""
+
+import numpy as np
+import soundfile as sf
+
+from agent_terminal.audio.export import WavExporter
+
+
+def test_finished_recording_is_saved(tmp_path):
+    """Test that every written chunk ends up in the finished WAV file."""
+    exporter = WavExporter(tmp_path / "exports")
+
+    recording = exporter.start("voice", samplerate=16000)
+    recording.write(np.full(100, 0.5, dtype=np.float32))
+    recording.write(np.full(50, -0.5, dtype=np.float32))
+    path = recording.finish()
+
+    assert path.parent == tmp_path / "exports"
+    assert path.name.endswith("-voice.wav")
+    data, samplerate = sf.read(path, dtype="float32")
+    assert samplerate == 16000
+    assert len(data) == 150
+    assert list(tmp_path.joinpath("exports").iterdir()) == [path]
+
+
+def test_discarded_recording_leaves_no_file(tmp_path):
+    """Test that an unfinished recording is removed."""
+    exporter = WavExporter(tmp_path)
+
+    recording = exporter.start("voice", samplerate=16000)
+    recording.write(np.zeros(100, dtype=np.float32))
+    recording.discard()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_from_env(monkeypatch, tmp_path):
+    """Test that exporting is only enabled by the environment variable."""
+    monkeypatch.delenv("AGENT_TERMINAL_VOICE_EXPORT", raising=False)
+    assert WavExporter.from_env() is None
+
+    monkeypatch.setenv("AGENT_TERMINAL_VOICE_EXPORT", str(tmp_path))
+    assert WavExporter.from_env().directory == tmp_path
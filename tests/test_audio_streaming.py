@@ -0,0 +1,149 @@
+"""Unit tests for sentence splitting and the audio playback service."""
+
+import asyncio
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import sounddevice as sd
+
+from agent_terminal.audio.player import PlaybackService
+from agent_terminal.audio.sentences import SentenceSplitter
+
+
+def test_sentences_are_emitted_as_soon_as_they_end():
+    """Test that a sentence is returned by the chunk that completes it."""
+    splitter = SentenceSplitter(min_length=5)
+
+    assert splitter.feed("The first sent") == []
+    assert splitter.feed("ence ends here. The sec") == ["The first sentence ends here."]
+    assert splitter.feed("ond one is short!\nThird") == ["The second one is short!"]
+    assert splitter.flush() == ["Third"]
+    assert splitter.flush() == []
+
+
+def test_short_sentences_are_merged():
+    """Test that fragments below the minimum length are spoken together."""
+    splitter = SentenceSplitter(min_length=20)
+
+    sentences = splitter.feed("Sure. Here is what you asked for. ")
+
+    assert sentences == ["Sure. Here is what you asked for."]
+
+
+@pytest.fixture
+def service():
+    """A PlaybackService whose output stream is mocked out."""
+    with patch("agent_terminal.audio.player.sd.OutputStream"):
+        service = PlaybackService()
+        yield service
+        service.close()
+
+
+def pull(service, frames):
+    """Runs the output callback once and returns the samples it produced."""
+    outdata = np.ones((frames, 1), dtype=np.float32)
+    service._callback(outdata, frames, None, None)
+    return outdata[:, 0].tolist()
+
+
+@pytest.mark.asyncio
+async def test_clip_chunks_play_back_to_back(service):
+    """Test that a clip's chunks fill the output buffer without gaps."""
+    clip = service.play("a", samplerate=24000)
+    clip.write(np.array([0.1, 0.2, 0.3], dtype=np.float32))
+    clip.write(np.array([0.4, 0.5], dtype=np.float32))
+    clip.end()
+
+    np.testing.assert_allclose(pull(service, 4), [0.1, 0.2, 0.3, 0.4])
+    np.testing.assert_allclose(pull(service, 4), [0.5, 0.0, 0.0, 0.0])
+    await asyncio.wait_for(clip.wait(), 1)
+
+
+@pytest.mark.asyncio
+async def test_stream_is_opened_once(service):
+    """Test that every clip shares one long-lived output stream."""
+    service.play("a", samplerate=24000).end()
+    service.play("b", samplerate=24000).end()
+
+    sd.OutputStream.assert_called_once()
+    sd.OutputStream.return_value.start.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_clips_do_not_cut_each_other_off(service):
+    """Test that a second clip waits until the first one has played."""
+    first = service.play("a", samplerate=24000)
+    second = service.play("b", samplerate=24000)
+    second.write(np.array([0.9, 0.9], dtype=np.float32))
+    second.end()
+    first.write(np.array([0.1], dtype=np.float32))
+
+    assert pull(service, 2) == pytest.approx([0.1, 0.0])
+    first.write(np.array([0.2], dtype=np.float32))
+    first.end()
+    assert pull(service, 3) == pytest.approx([0.2, 0.9, 0.9])
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_clips_play_first(service):
+    """Test that queued clips are ordered by priority, then arrival."""
+    for channel, priority, value in [("a", 0, 0.1), ("b", 0, 0.2), ("c", 5, 0.3)]:
+        clip = service.play(channel, samplerate=24000, priority=priority)
+        clip.write(np.array([value], dtype=np.float32))
+        clip.end()
+
+    assert pull(service, 3) == pytest.approx([0.3, 0.1, 0.2])
+
+
+@pytest.mark.asyncio
+async def test_interrupt_skip_and_stop(service):
+    """Test dropping the current clip and the queued clips of a channel."""
+    playing = service.play("a", samplerate=24000)
+    playing.write(np.ones(10, dtype=np.float32))
+    pull(service, 1)
+    queued = service.play("a", samplerate=24000)
+    other = service.play("b", samplerate=24000)
+
+    urgent = service.play("c", samplerate=24000, priority=1, interrupt=True)
+    assert playing.finished
+    await asyncio.wait_for(playing.wait(), 1)
+    urgent.write(np.array([0.5], dtype=np.float32))
+    assert pull(service, 1) == pytest.approx([0.5])
+
+    service.stop("a")
+    await asyncio.wait_for(queued.wait(), 1)
+    service.skip("b")
+    assert not other.finished
+    service.skip()
+    await asyncio.wait_for(urgent.wait(), 1)
+    pull(service, 1)
+    service.skip()
+    await asyncio.wait_for(other.wait(), 1)
+
+
+@pytest.mark.asyncio
+async def test_underruns_are_counted_per_channel(service):
+    """Test that a starved clip counts one underrun per gap."""
+    clip = service.play("a", samplerate=24000)
+    pull(service, 2)  # Not started yet: waiting for audio is not an underrun.
+    clip.write(np.array([0.1], dtype=np.float32))
+    pull(service, 2)
+    pull(service, 2)
+    clip.write(np.array([0.2], dtype=np.float32))
+    pull(service, 2)
+
+    assert clip.underruns == 2
+    assert service.underruns == {"a": 2}
+
+
+@pytest.mark.asyncio
+async def test_mismatched_sample_rate_is_rejected_while_playing(service):
+    """Test that the stream is only reopened at another rate when idle."""
+    clip = service.play("a", samplerate=24000)
+    with pytest.raises(ValueError, match="16000 Hz"):
+        service.play("b", samplerate=16000)
+
+    clip.cancel()
+    service.play("b", samplerate=16000)
+    assert service.samplerate == 16000
@@ -0,0 +1,181 @@
+"""Tests for the headless batch runner."""
+
+import asyncio
+import json
+
+import pytest
+
+from agent_terminal.agents.base import Agent
+from agent_terminal.agents.errors import AgentConnectionError
+from agent_terminal.agents.history import ConversationHistory
+from agent_terminal.agents.registry import (
+    VOICE_CLONING_AGENT,
+    AgentRegistry,
+    AgentSpec,
+)
+from agent_terminal.batch import (
+    AgentConfig,
+    BatchItem,
+    BatchRunner,
+    ResultLog,
+    main,
+    read_items,
+)
+
+
+class _EchoAgent(Agent):
+    """Answers a prompt with the prompt, and how many turns it remembers."""
+
+    running = 0
+    most_running = 0
+
+    def __init__(self, model):
+        self.model = model
+        self.history = ConversationHistory()
+
+    async def stream_response(self, prompt):
+        type(self).running += 1
+        type(self).most_running = max(type(self).most_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            if prompt == "fail":
+                raise AgentConnectionError("Service down.", hint="Start it.")
+            remembered = len(self.history)
+            yield f"{self.model}: {prompt}"
+            yield f" ({remembered})"
+            self.history.add_turn(prompt, prompt)
+        finally:
+            type(self).running -= 1
+
+
+@pytest.fixture
+def registry():
+    """A registry holding only the echo agent."""
+    _EchoAgent.running = _EchoAgent.most_running = 0
+    return AgentRegistry({"Echo": _EchoAgent})
+
+
+def _read_results(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_every_prompt_is_answered_by_every_agent(registry, tmp_path):
+    """Test results, their timings, isolation and the concurrency bound."""
+    configs = [AgentConfig.parse(text, registry) for text in ("Echo:a", "Echo:b")]
+    runner = BatchRunner(configs, concurrency=2, registry=registry)
+    items = [BatchItem(str(n), f"prompt {n}") for n in range(5)]
+    items.append(BatchItem("bad", "fail"))
+    log = ResultLog(tmp_path / "results.jsonl")
+
+    stats = await runner.run(iter(items), log)
+    log.close()
+
+    assert (stats.completed, stats.failed, stats.skipped) == (10, 2, 0)
+    assert stats.items_per_second > 0
+    # Each agent pool answers at most two prompts at once.
+    assert _EchoAgent.most_running == 4
+    results = {(r["id"], r["agent"]): r for r in _read_results(log.path)}
+    assert len(results) == 12
+    answered = results[("3", "Echo:b")]
+    # Every prompt is answered without the conversation before it.
+    assert answered["response"] == "b: prompt 3 (0)"
+    assert answered["error"] is None
+    assert answered["chunks"] == 2
+    assert 0 < answered["first_chunk_seconds"] <= answered["seconds"]
+    assert results[("bad", "Echo:a")]["error"] == {
+        "type": "AgentConnectionError",
+        "message": "Service down.",
+        "hint": "Start it.",
+    }
+
+
+@pytest.mark.asyncio
+async def test_a_run_resumes_from_the_results_already_written(registry, tmp_path):
+    """Test that answered prompts are skipped and failed ones tried again."""
+    path = tmp_path / "results.jsonl"
+    path.write_text(
+        json.dumps({"id": "1", "agent": "Echo:a", "error": None}) + "\n"
+        + json.dumps({"id": "2", "agent": "Echo:a", "error": {"type": "X"}}) + "\n"
+        + '{"id": "3", "agent": "Ec'
+    )  # fmt: skip
+    log = ResultLog(path)
+    runner = BatchRunner([AgentConfig.parse("Echo:a", registry)], registry=registry)
+    items = [BatchItem(str(n), f"prompt {n}") for n in range(1, 4)]
+
+    stats = await runner.run(iter(items), log)
+    log.close()
+
+    assert (stats.completed, stats.failed, stats.skipped) == (2, 0, 1)
+    # The torn last record is dropped rather than merged with the next one.
+    results = _read_results(path)
+    assert sorted(result["id"] for result in results) == ["1", "2", "2", "3"]
+    reopened = ResultLog(path)
+    assert reopened.done == {("1", "Echo:a"), ("2", "Echo:a"), ("3", "Echo:a")}
+    reopened.close()
+
+    restarted = ResultLog(path, restart=True)
+    assert restarted.done == set()
+    restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_speaking_agents_export_instead_of_playing(tmp_path):
+    """Test that agents that can skip playback are told to, and their audio kept."""
+
+    class _SpeakingAgent(_EchoAgent):
+        def __init__(self, model, play=True):
+            super().__init__(model)
+            assert not play
+            self.last_audio = tmp_path / "speech.wav"
+
+    registry = AgentRegistry()
+    registry.register(AgentSpec("Speaker", "", (), options=("cache", "play")))
+    registry["Speaker"] = _SpeakingAgent
+    runner = BatchRunner([AgentConfig.parse("Speaker:m", registry)], registry=registry)
+    log = ResultLog(tmp_path / "results.jsonl")
+
+    await runner.run(iter([BatchItem("1", "Hi")]), log)
+    log.close()
+
+    [result] = _read_results(log.path)
+    assert result["response"] == "m: Hi (0)"
+    assert result["audio"] == str(tmp_path / "speech.wav")
+
+
+def test_prompts_are_read_with_their_ids_or_line_numbers(tmp_path):
+    """Test the input format, and that a bad line is reported by number."""
+    path = tmp_path / "prompts.jsonl"
+    path.write_text('{"id": "q1", "prompt": "Hi"}\n\n{"prompt": "Bye"}\n[1]\n')
+
+    items = read_items(path)
+
+    assert next(items) == BatchItem("q1", "Hi")
+    assert next(items) == BatchItem("3", "Bye")
+    with pytest.raises(ValueError, match="prompts.jsonl:4"):
+        next(items)
+
+
+def test_agents_are_given_by_type_and_inputs():
+    """Test parsing agents, whose last input may contain colons."""
+    registry = AgentRegistry()
+    registry.register(VOICE_CLONING_AGENT)
+
+    config = AgentConfig.parse("VoiceCloningAgent:gpt-4o:C:/voices/me.wav", registry)
+
+    assert config.values == ("gpt-4o", "C:/voices/me.wav")
+    with pytest.raises(ValueError, match="Reference Audio Path"):
+        AgentConfig.parse("VoiceCloningAgent:gpt-4o", registry)
+    with pytest.raises(ValueError, match="Unknown agent type"):
+        AgentConfig.parse("NoSuchAgent:x", registry)
+
+
+def test_the_command_line_reports_bad_agents(tmp_path, capsys):
+    """Test that a misconfigured run fails before anything is written."""
+    status = main(
+        [str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"), "--agent", "Nope"]
+    )
+
+    assert status == 2
+    assert "Unknown agent type" in capsys.readouterr().err
+    assert not (tmp_path / "out.jsonl").exists()
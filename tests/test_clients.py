@@ -0,0 +1,73 @@
+"""Unit tests for the shared client registry."""
+
+import httpx
+import pytest
+
+from agent_terminal.agents.clients import (
+    CONNECTION_LIMITS_ENV_VAR,
+    DEFAULT_LIMITS,
+    ClientRegistry,
+)
+
+
+@pytest.mark.asyncio
+async def test_openai_clients_are_shared_per_key_and_url():
+    """Test that agents with the same credentials share one client."""
+    registry = ClientRegistry()
+
+    first = registry.get_openai_client("key-a")
+    assert registry.get_openai_client("key-a") is first
+    assert registry.get_openai_client("key-b") is not first
+    assert registry.get_openai_client("key-a", "http://localhost:8000") is not first
+
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_ollama_clients_use_configured_limits():
+    """Test that Ollama clients are shared per host and use the pool limits."""
+    limits = httpx.Limits(max_connections=3, max_keepalive_connections=2)
+    registry = ClientRegistry()
+    registry.configure(limits)
+
+    client = registry.get_ollama_client("http://ollama:11434")
+
+    assert registry.get_ollama_client("http://ollama:11434") is client
+    pool = client._client._transport._pool
+    assert pool._max_connections == 3
+    assert pool._max_keepalive_connections == 2
+
+    await registry.aclose()
+
+
+def test_limits_are_configured_from_the_environment(monkeypatch):
+    """Test the connection limits syntax, and that unset limits keep defaults."""
+    monkeypatch.delenv(CONNECTION_LIMITS_ENV_VAR, raising=False)
+    assert ClientRegistry.from_env().limits == DEFAULT_LIMITS
+
+    monkeypatch.setenv(
+        CONNECTION_LIMITS_ENV_VAR, "max_connections=50, max_keepalive=none"
+    )
+    limits = ClientRegistry.from_env().limits
+    assert limits.max_connections == 50
+    assert limits.max_keepalive_connections is None
+    assert limits.keepalive_expiry == DEFAULT_LIMITS.keepalive_expiry
+
+    monkeypatch.setenv(CONNECTION_LIMITS_ENV_VAR, "pool=5")
+    with pytest.raises(ValueError, match=CONNECTION_LIMITS_ENV_VAR):
+        ClientRegistry.from_env()
+
+
+@pytest.mark.asyncio
+async def test_aclose_closes_and_forgets_clients():
+    """Test that closing the registry closes every pooled client."""
+    registry = ClientRegistry()
+    openai_client = registry.get_openai_client("key-a")
+    ollama_client = registry.get_ollama_client()
+
+    await registry.aclose()
+
+    assert openai_client.is_closed()
+    assert ollama_client._client.is_closed
+    assert registry.get_openai_client("key-a") is not openai_client
+    await registry.aclose()
@@ -0,0 +1,131 @@
+"""Unit tests for single-flight request coalescing."""
+
+import asyncio
+
+import pytest
+
+from agent_terminal.agents.coalescing import RequestCoalescer
+from agent_terminal.agents.errors import AgentConnectionError
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Upstream:
+    """A fake upstream request that streams chunks when released."""
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.calls = 0
+        self.closed = False
+        self.release = asyncio.Event()
+
+    async def open(self):
+        self.calls += 1
+        try:
+            for chunk in self.chunks:
+                await self.release.wait()
+                yield chunk
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.closed = True
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+async def test_identical_requests_share_one_upstream_call():
+    """Test that concurrent subscribers all receive the whole stream."""
+    coalescer = RequestCoalescer()
+    upstream = _Upstream(["a", "b", "c"])
+    first = asyncio.create_task(_collect(coalescer.stream("key", upstream.open)))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(_collect(coalescer.stream("key", upstream.open)))
+    await asyncio.sleep(0)
+    upstream.release.set()
+
+    assert await first == await second == ["a", "b", "c"]
+    assert upstream.calls == 1
+    assert len(coalescer) == 0
+
+
+async def test_a_late_subscriber_receives_the_chunks_it_missed():
+    """Test that joining mid-stream replays what was already received."""
+    coalescer = RequestCoalescer()
+    gate = asyncio.Event()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        yield "a"
+        await gate.wait()
+        yield "b"
+
+    first = coalescer.stream("key", upstream)
+    assert await first.__anext__() == "a"
+    second = asyncio.create_task(_collect(coalescer.stream("key", upstream)))
+    await asyncio.sleep(0)
+    gate.set()
+
+    assert await second == ["a", "b"]
+    assert [chunk async for chunk in first] == ["b"]
+    assert calls == 1
+
+
+async def test_different_requests_and_later_requests_go_upstream():
+    """Test that only identical requests in flight at once are shared."""
+    coalescer = RequestCoalescer()
+    upstream = _Upstream(["a"])
+    upstream.release.set()
+
+    await asyncio.gather(
+        _collect(coalescer.stream("one", upstream.open)),
+        _collect(coalescer.stream("two", upstream.open)),
+    )
+    await _collect(coalescer.stream("one", upstream.open))
+
+    assert upstream.calls == 3
+
+
+async def test_an_error_reaches_every_subscriber():
+    """Test that a failed request fails each request sharing it."""
+    coalescer = RequestCoalescer()
+    upstream = _Upstream(["a"], error=AgentConnectionError("lost"))
+    upstream.release.set()
+
+    results = await asyncio.gather(
+        _collect(coalescer.stream("key", upstream.open)),
+        _collect(coalescer.stream("key", upstream.open)),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, AgentConnectionError) for result in results)
+    assert upstream.calls == 1
+
+
+async def test_the_request_is_closed_once_every_subscriber_has_left():
+    """Test that one tab cancelling does not cut off another."""
+    coalescer = RequestCoalescer()
+    closed = False
+
+    async def stalling():
+        nonlocal closed
+        try:
+            yield "a"
+            await asyncio.Event().wait()
+        finally:
+            closed = True
+
+    first = coalescer.stream("key", stalling)
+    second = coalescer.stream("key", stalling)
+    assert await first.__anext__() == "a"
+    assert await second.__anext__() == "a"
+
+    await first.aclose()
+    assert not closed
+    await second.aclose()
+    assert closed
+    assert len(coalescer) == 0
@@ -0,0 +1,89 @@
+"""Unit tests for the token-budgeted conversation history."""
+
+from unittest.mock import MagicMock
+
+from agent_terminal.agents.history import (
+    MESSAGE_OVERHEAD_TOKENS,
+    ConversationHistory,
+    estimate_tokens,
+)
+
+
+def word_count(text: str) -> int:
+    """A predictable token counter for the tests: one token per word."""
+    return len(text.split())
+
+
+def test_build_messages_includes_system_history_and_prompt():
+    """Test that recorded turns are sent in order around the new prompt."""
+    history = ConversationHistory(system_prompt="Be brief.")
+    history.add_turn("Hi", "Hello!")
+
+    assert history.build_messages("How are you?") == [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello!"},
+        {"role": "user", "content": "How are you?"},
+    ]
+
+
+def test_oldest_turns_are_left_out_to_fit_the_budget():
+    """Test that only the most recent turns that fit the budget are sent."""
+    # Every one-word message costs 1 + overhead tokens; a turn costs twice that.
+    turn_tokens = 2 * (1 + MESSAGE_OVERHEAD_TOKENS)
+    history = ConversationHistory(
+        max_tokens=3 * turn_tokens, count_tokens=word_count
+    )
+    for i in range(5):
+        history.add_turn(f"q{i}", f"a{i}")
+
+    messages = history.build_messages("next")
+
+    # The prompt takes half a turn, so two full turns still fit.
+    assert [m["content"] for m in messages] == ["q3", "a3", "q4", "a4", "next"]
+    # Turns that could never fit again are dropped from memory.
+    assert len(history) == 3
+
+
+def test_token_counts_are_cached_per_message():
+    """Test that building messages does not re-tokenize the history."""
+    counter = MagicMock(side_effect=word_count)
+    history = ConversationHistory(system_prompt="sys", count_tokens=counter)
+    for i in range(10):
+        history.add_turn(f"q{i}", f"a{i}")
+    calls_after_adding = counter.call_count
+
+    history.build_messages("one")
+    history.build_messages("two")
+
+    # Only the two new prompts were counted.
+    assert counter.call_count == calls_after_adding + 2
+
+
+def test_prompt_is_sent_even_when_it_exceeds_the_budget():
+    """Test that an oversized prompt is still sent, without any history."""
+    history = ConversationHistory(max_tokens=10, count_tokens=word_count)
+    history.add_turn("q", "a")
+
+    messages = history.build_messages("word " * 50)
+
+    assert messages == [{"role": "user", "content": "word " * 50}]
+
+
+def test_estimate_tokens():
+    """Test the characters-per-token estimate."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_last_turn_and_turns_recorded():
+    """Test that the newest turn and the number of turns are tracked."""
+    history = ConversationHistory(max_tokens=100, count_tokens=word_count)
+    assert history.last_turn is None
+
+    history.add_turn("Hi", "Hello!")
+    history.add_turn("How are you?", "Fine.")
+
+    assert history.last_turn == ("How are you?", "Fine.")
+    assert history.turns_recorded == 2
@@ -0,0 +1,48 @@
+"""Unit tests for the conversation message store."""
+
+import pytest
+
+from agent_terminal.widgets.message_store import Message, MessageStore
+
+
+def test_styles_are_interned():
+    """Test that messages with the same style share one style id."""
+    store = MessageStore()
+    store.append("User", "bold", "Hi")
+    store.append("Agent", "bold blue", "Hello!")
+    store.append("User", "bold", "How are you?")
+
+    assert store[0].style_id == store[2].style_id
+    assert store.style(store[1].style_id) == "bold blue"
+
+
+def test_oldest_messages_are_spilled_and_read_back():
+    """Test that messages beyond the cap move to disk but stay readable."""
+    store = MessageStore(max_in_memory=2)
+    for i in range(5):
+        store.append("User", "bold", f"message {i} – ünïcode")
+
+    assert len(store) == 5
+    assert store.spilled == 3
+    assert store[1] == Message("User", 0, "message 1 – ünïcode")
+    assert store[-1].text == "message 4 – ünïcode"
+    assert [message.text for message in store] == [
+        f"message {i} – ünïcode" for i in range(5)
+    ]
+    store.close()
+
+
+def test_only_messages_in_memory_can_be_changed():
+    """Test that set_text updates recent messages and refuses spilled ones."""
+    store = MessageStore(max_in_memory=1)
+    store.append("Agent", "bold", "first")
+    index = store.append("Agent", "bold", "Hel")
+
+    store.set_text(index, "Hello")
+
+    assert store[index].text == "Hello"
+    with pytest.raises(IndexError):
+        store.set_text(0, "changed")
+    with pytest.raises(IndexError):
+        store[2]
+    store.close()
@@ -0,0 +1,84 @@
+"""Tests for request metrics and their export."""
+
+import json
+
+import pytest
+
+from agent_terminal.metrics import (
+    Histogram,
+    Metrics,
+    MetricsExporter,
+    RequestTimer,
+    request_labels,
+)
+
+
+def test_histogram_estimates_quantiles_from_buckets():
+    """Test that quantiles are interpolated within their bucket."""
+    histogram = Histogram((1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 2, 1, 0]
+    assert histogram.sum == pytest.approx(6.5)
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert histogram.quantile(1.0) == pytest.approx(4.0)
+    assert Histogram((1.0,)).quantile(0.5) is None
+
+
+def test_metrics_are_labelled_with_the_current_request():
+    """Test that recordings carry the request's labels and can be filtered."""
+    metrics = Metrics()
+    token = request_labels.set((("tab", "agent_1"),))
+    try:
+        metrics.increment("agent_requests_total")
+        metrics.observe("tts_synthesis_seconds", 0.2)
+    finally:
+        request_labels.reset(token)
+    metrics.increment("agent_requests_total", tab="agent_2")
+
+    assert metrics.counter("agent_requests_total") == 2
+    assert metrics.counter("agent_requests_total", tab="agent_1") == 1
+    assert metrics.histogram("tts_synthesis_seconds", tab="agent_1").count == 1
+    assert metrics.histogram("tts_synthesis_seconds", tab="agent_2").count == 0
+
+
+def test_request_timer_records_each_stage():
+    """Test that a timed request records queue wait, TTFT, latency and rate."""
+    metrics = Metrics()
+    timer = RequestTimer(metrics)
+    timer.started()
+    timer.first_chunk()
+    timer.first_chunk()
+    elapsed = timer.finished(tokens=10)
+
+    assert elapsed >= 0
+    assert metrics.counter("agent_requests_total") == 1
+    assert metrics.counter("agent_tokens_total") == 10
+    for name in (
+        "agent_queue_wait_seconds",
+        "agent_time_to_first_token_seconds",
+        "agent_response_seconds",
+    ):
+        assert metrics.histogram(name).count == 1
+
+
+def test_metrics_export_as_prometheus_text_and_json(tmp_path):
+    """Test that the exporter picks the format from the file name."""
+    metrics = Metrics()
+    metrics.increment("agent_errors_total", tab='say "hi"')
+    metrics.observe("agent_response_seconds", 0.3, tab="agent_1")
+
+    MetricsExporter(tmp_path / "metrics.prom").write(metrics)
+    text = (tmp_path / "metrics.prom").read_text()
+    assert "# TYPE agent_response_seconds histogram" in text
+    assert 'agent_errors_total{tab="say \\"hi\\""} 1' in text
+    assert 'agent_response_seconds_bucket{tab="agent_1",le="0.25"} 0' in text
+    assert 'agent_response_seconds_bucket{tab="agent_1",le="0.5"} 1' in text
+    assert 'agent_response_seconds_bucket{tab="agent_1",le="+Inf"} 1' in text
+    assert 'agent_response_seconds_count{tab="agent_1"} 1' in text
+
+    MetricsExporter(tmp_path / "metrics.json").write(metrics)
+    data = json.loads((tmp_path / "metrics.json").read_text())
+    assert data["counters"][0]["value"] == 1
+    assert data["histograms"][0]["count"] == 1
@@ -0,0 +1,116 @@
+"""Tests for the lazily importing agent registry."""
+
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from agent_terminal.agents.registry import (
+    BUILTIN_AGENTS,
+    VOICE_CLONING_AGENT,
+    AgentRegistry,
+    AgentSpec,
+    prewarm,
+)
+
+PLUGIN_AGENT = AgentSpec(
+    name="PluginAgent",
+    target="agent_terminal.no_such_module:PluginAgent",
+    presets=(("Plugin", "plugin-model"),),
+)
+
+
+def test_classes_are_imported_on_first_lookup():
+    """Test that an entry is imported when looked up, and only then."""
+    registry = AgentRegistry({"Ordered": "collections:OrderedDict"})
+    assert not registry.is_loaded("Ordered")
+
+    from collections import OrderedDict
+
+    assert registry["Ordered"] is OrderedDict
+    assert registry.is_loaded("Ordered")
+    assert list(registry) == ["Ordered"]
+
+
+def test_registry_can_be_patched_without_importing():
+    """Test that patch.dict swaps entries without importing the others."""
+    registry = AgentRegistry({"Missing": "agent_terminal.no_such_module:Agent"})
+    mock_agent = MagicMock()
+
+    with patch.dict(registry, {"Mock": mock_agent}):
+        assert registry["Mock"] is mock_agent
+
+    assert "Mock" not in registry
+    assert not registry.is_loaded("Missing")
+
+
+def test_app_import_does_not_load_agent_dependencies():
+    """Test that starting the app imports no provider SDK or audio library."""
+    code = (
+        "import sys, agent_terminal.app; "
+        "print(','.join(m for m in ('openai', 'ollama', 'httpx', 'numpy', "
+        "'soundfile', 'sounddevice') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_spec_pairs_values_with_inputs_and_titles_the_tab():
+    """Test that a spec builds the agent's arguments and its tab title."""
+    arguments = VOICE_CLONING_AGENT.arguments(("gpt-4o", "/voices/alice.wav"))
+
+    assert arguments == {"model": "gpt-4o", "audio_path": "/voices/alice.wav"}
+    assert VOICE_CLONING_AGENT.tab_title(arguments) == "VC: alice"
+    with pytest.raises(ValueError, match="Reference Audio Path is required"):
+        VOICE_CLONING_AGENT.arguments(("gpt-4o",))
+
+
+def test_plugins_are_discovered_without_importing_them():
+    """Test that entry point plugins are registered but not imported."""
+    plugin = MagicMock()
+    plugin.load.return_value = PLUGIN_AGENT
+    broken = MagicMock()
+    broken.name = "broken"
+    broken.load.side_effect = ImportError("missing dependency")
+    # An entry point pointing at the agent class rather than its spec.
+    not_a_spec = MagicMock()
+    not_a_spec.name = "not_a_spec"
+    not_a_spec.load.return_value = dict
+
+    with patch(
+        "agent_terminal.agents.registry.entry_points",
+        return_value=[plugin, broken, not_a_spec],
+    ), pytest.warns(UserWarning) as warned:
+        registry = AgentRegistry.from_entry_points()
+
+    assert list(registry) == [spec.name for spec in BUILTIN_AGENTS] + ["PluginAgent"]
+    assert registry.spec("PluginAgent") is PLUGIN_AGENT
+    assert not registry.is_loaded("PluginAgent")
+    assert [str(warning.message).split(":")[0] for warning in warned] == [
+        "Could not load agent plugin broken",
+        "Could not load agent plugin not_a_spec",
+    ]
+
+
+def test_only_declared_options_are_passed_to_agents():
+    """Test that agents without a cache option are never given a cache."""
+    cache = MagicMock()
+
+    assert VOICE_CLONING_AGENT.optional_arguments(cache=cache) == {"cache": cache}
+    assert VOICE_CLONING_AGENT.optional_arguments(cache=None) == {}
+    assert PLUGIN_AGENT.optional_arguments(cache=cache) == {}
+
+
+def test_prewarm_skips_heavy_agents():
+    """Test that prewarming leaves agents with a heavy import cost alone."""
+    registry = AgentRegistry()
+    registry.register(PLUGIN_AGENT._replace(target="collections:OrderedDict"))
+    registry.register(VOICE_CLONING_AGENT._replace(target="collections:Counter"))
+
+    prewarm(registry)
+
+    assert registry.is_loaded("PluginAgent")
+    assert not registry.is_loaded("VoiceCloningAgent")
@@ -0,0 +1,132 @@
+"""Unit tests for tracking which local models are loaded."""
+
+import asyncio
+
+import pytest
+
+from agent_terminal.agents.residency import (
+    COLD,
+    FAILED,
+    LOADED,
+    LOADING,
+    ModelResidency,
+    keep_alive_seconds,
+)
+
+
+class _Service:
+    """A fake model service that records loads and unloads."""
+
+    def __init__(self):
+        self.loads = []
+        self.unloads = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    def load(self, model, error=None):
+        async def load():
+            self.loads.append(model)
+            await self.gate.wait()
+            if error is not None:
+                raise error
+
+        return load
+
+    async def unload(self, model):
+        self.unloads.append(model)
+
+
+def test_keep_alive_durations_are_converted_to_seconds():
+    """Test Ollama's keep_alive formats, including keeping models forever."""
+    assert keep_alive_seconds(90) == 90
+    assert keep_alive_seconds("45") == 45
+    assert keep_alive_seconds("1h30m") == 5400
+    assert keep_alive_seconds("500ms") == 0.5
+    assert keep_alive_seconds(-1) is None
+    assert keep_alive_seconds("-1m") is None
+    with pytest.raises(ValueError):
+        keep_alive_seconds("soon")
+
+
+@pytest.mark.asyncio
+async def test_warming_loads_a_model_once_and_reports_its_state():
+    """Test that concurrent warm-ups share one load and notify listeners."""
+    residency = ModelResidency()
+    service = _Service()
+    service.gate.clear()
+    changes = []
+    residency.add_listener(lambda model, state: changes.append((model, state)))
+
+    warm_ups = [
+        asyncio.create_task(
+            residency.warm("llama3", service.load("llama3"), service.unload, "5m")
+        )
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+    assert residency.state("llama3") == LOADING
+    service.gate.set()
+    await asyncio.gather(*warm_ups)
+
+    assert service.loads == ["llama3"]
+    assert residency.state("llama3") == LOADED
+    assert changes == [("llama3", LOADING), ("llama3", LOADED)]
+
+    await residency.warm("llama3", service.load("llama3"), service.unload, "5m")
+    assert service.loads == ["llama3"]
+
+
+@pytest.mark.asyncio
+async def test_a_failed_load_is_reported():
+    """Test that a model that cannot be loaded is marked as failed."""
+    residency = ModelResidency()
+    service = _Service()
+
+    with pytest.raises(RuntimeError):
+        await residency.warm(
+            "nope", service.load("nope", RuntimeError("no")), service.unload, "5m"
+        )
+
+    assert residency.state("nope") == FAILED
+
+
+@pytest.mark.asyncio
+async def test_models_expire_with_their_keep_alive():
+    """Test that a model is cold once its keep-alive has run out."""
+    residency = ModelResidency()
+    service = _Service()
+
+    await residency.warm("llama3", service.load("llama3"), service.unload, 0)
+
+    assert residency.state("llama3") == COLD
+    assert residency.loaded() == []
+
+
+@pytest.mark.asyncio
+async def test_the_least_recently_used_idle_model_makes_room():
+    """Test that loading past the limit unloads an idle model, not a busy one."""
+    residency = ModelResidency(max_loaded=2)
+    service = _Service()
+    for model in ("a", "b"):
+        await residency.warm(model, service.load(model), service.unload, "5m")
+
+    async with residency.in_use("a", service.unload, "5m"):
+        await residency.warm("c", service.load("c"), service.unload, "5m")
+
+    assert service.unloads == ["b"]
+    assert residency.loaded() == ["c", "a"]
+    assert residency.state("b") == COLD
+
+
+@pytest.mark.asyncio
+async def test_a_request_marks_a_cold_model_as_loaded():
+    """Test that a prompt to a cold model loads it, as far as we know."""
+    residency = ModelResidency(max_loaded=1)
+    service = _Service()
+    await residency.warm("a", service.load("a"), service.unload, "5m")
+
+    async with residency.in_use("b", service.unload, "5m"):
+        assert residency.state("b") == LOADING
+
+    assert residency.state("b") == LOADED
+    assert service.unloads == ["a"]
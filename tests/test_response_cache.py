@@ -0,0 +1,88 @@
+"""Unit tests for the persistent response cache."""
+
+from unittest.mock import patch
+
+import pytest
+
+from agent_terminal.agents.cache import ResponseCache
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """A cache stored in a temporary directory."""
+    cache = ResponseCache(tmp_path / "cache.sqlite3", max_entries=3, ttl=None)
+    yield cache
+    cache.close()
+
+
+def test_key_depends_on_every_part_of_the_request():
+    """Test that changing any part of a request changes its key."""
+    key = ResponseCache.make_key("OpenAIAgent", "gpt-4o", MESSAGES, {"t": 0.7})
+
+    assert key == ResponseCache.make_key("OpenAIAgent", "gpt-4o", MESSAGES, {"t": 0.7})
+    assert key != ResponseCache.make_key("OllamaAgent", "gpt-4o", MESSAGES, {"t": 0.7})
+    assert key != ResponseCache.make_key("OpenAIAgent", "gpt-4", MESSAGES, {"t": 0.7})
+    assert key != ResponseCache.make_key("OpenAIAgent", "gpt-4o", [], {"t": 0.7})
+    assert key != ResponseCache.make_key("OpenAIAgent", "gpt-4o", MESSAGES, {"t": 0})
+
+
+def test_get_and_put_count_hits_and_misses(cache):
+    """Test that lookups are counted and stored responses are returned."""
+    assert cache.get("key") is None
+    cache.put("key", "A cached answer.")
+
+    assert cache.get("key") == "A cached answer."
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_responses_persist_across_instances(tmp_path):
+    """Test that the cache survives reopening the database."""
+    first = ResponseCache(tmp_path / "cache.sqlite3")
+    first.put("key", "Still here.")
+    first.close()
+
+    second = ResponseCache(tmp_path / "cache.sqlite3")
+    assert second.get("key") == "Still here."
+    second.close()
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    """Test that the size cap evicts the entry used longest ago."""
+    with patch("agent_terminal.agents.cache.time.time") as mock_time:
+        for now, key in enumerate(["a", "b", "c"]):
+            mock_time.return_value = float(now)
+            cache.put(key, key.upper())
+        mock_time.return_value = 10.0
+        cache.get("a")
+        mock_time.return_value = 11.0
+        cache.put("d", "D")
+
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    """Test that responses older than the TTL count as misses."""
+    cache = ResponseCache(tmp_path / "cache.sqlite3", ttl=60)
+    with patch("agent_terminal.agents.cache.time.time") as mock_time:
+        mock_time.return_value = 0.0
+        cache.put("key", "Old news.")
+        mock_time.return_value = 61.0
+        assert cache.get("key") is None
+
+    assert len(cache) == 0
+    cache.close()
+
+
+def test_from_env_is_opt_in(monkeypatch, tmp_path):
+    """Test that the cache is only enabled when a path is configured."""
+    monkeypatch.delenv("AGENT_TERMINAL_CACHE", raising=False)
+    assert ResponseCache.from_env() is None
+
+    monkeypatch.setenv("AGENT_TERMINAL_CACHE", str(tmp_path / "cache.sqlite3"))
+    cache = ResponseCache.from_env()
+    assert cache is not None
+    cache.close()
@@ -0,0 +1,190 @@
+"""Unit tests for the shared request scheduler."""
+
+import asyncio
+
+import pytest
+
+from agent_terminal.agents.errors import (
+    AgentConnectionError,
+    AgentTimeoutError,
+    ModelNotFoundError,
+)
+from agent_terminal.agents.scheduler import (
+    RATE_LIMITS_ENV_VAR,
+    RateLimit,
+    RequestScheduler,
+    RetryPolicy,
+    TokenBucket,
+    estimate_request_tokens,
+)
+from agent_terminal.metrics import request_labels
+
+
+def _failing_then(*attempts):
+    """Returns an open_stream whose attempts raise or yield in turn."""
+    calls = iter(attempts)
+
+    async def open_stream():
+        outcome = next(calls)
+        if isinstance(outcome, Exception):
+            raise outcome
+        for item in outcome:
+            yield item
+
+    return open_stream
+
+
+def test_token_bucket_refills_at_its_per_minute_rate():
+    """Test that a drained bucket refills continuously up to its capacity."""
+    bucket = TokenBucket(60, now=0.0)
+    bucket.take(60, now=0.0)
+
+    assert bucket.wait_time(1, now=0.0) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now=1.0) == 0
+    # Oversized requests wait for a full bucket rather than forever.
+    assert bucket.wait_time(600, now=1.0) == pytest.approx(59.0)
+    bucket.give_back(1000)
+    assert bucket.tokens == 60
+
+
+def test_retry_delay_is_jittered_capped_and_honors_retry_after():
+    """Test that backoff grows, stays under its cap and respects Retry-After."""
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+
+    for attempt in range(1, 10):
+        assert 0 <= policy.delay(attempt) <= min(4.0, 2 ** (attempt - 1))
+    assert policy.delay(1, retry_after=10.0) >= 10.0
+
+
+def test_rate_limits_are_read_from_the_environment(monkeypatch):
+    """Test the quota syntax and that a model's quota beats its provider's."""
+    monkeypatch.setenv(
+        RATE_LIMITS_ENV_VAR, "openai=500/30000, OpenAI/gpt-4o=100/none"
+    )
+    scheduler = RequestScheduler.from_env()
+
+    assert scheduler.limit("OpenAI", "gpt-4o") == RateLimit(100, None)
+    assert scheduler.limit("OpenAI", "gpt-4o-mini") == RateLimit(500, 30000)
+    assert scheduler.limit("Ollama", "llama3") == RateLimit()
+
+    monkeypatch.setenv(RATE_LIMITS_ENV_VAR, "openai=lots")
+    with pytest.raises(ValueError, match=RATE_LIMITS_ENV_VAR):
+        RequestScheduler.from_env()
+
+
+def test_request_cost_counts_the_prompt_and_the_response_limit():
+    """Test that the reserved tokens cover every message and the response."""
+    messages = [{"role": "user", "content": "x" * 40}]
+
+    assert estimate_request_tokens(messages) == 14
+    assert estimate_request_tokens(messages, completion_tokens=100) == 114
+
+
+@pytest.mark.asyncio
+async def test_retryable_errors_are_retried_until_the_stream_succeeds():
+    """Test that transient failures are retried with backoff."""
+    scheduler = RequestScheduler(retry=RetryPolicy(base_delay=0.001))
+    open_stream = _failing_then(
+        AgentConnectionError("refused"), AgentConnectionError("refused"), ["ok"]
+    )
+
+    items = [item async for item in scheduler.stream("Test", "m", 1, open_stream)]
+
+    assert items == ["ok"]
+
+
+@pytest.mark.asyncio
+async def test_errors_that_cannot_succeed_are_not_retried():
+    """Test that non-retryable errors and exhausted attempts are raised."""
+    scheduler = RequestScheduler(retry=RetryPolicy(max_attempts=2, base_delay=0))
+
+    with pytest.raises(ModelNotFoundError):
+        async for _ in scheduler.stream(
+            "Test", "m", 1, _failing_then(ModelNotFoundError("nope"))
+        ):
+            pass
+    with pytest.raises(AgentConnectionError):
+        async for _ in scheduler.stream(
+            "Test",
+            "m",
+            1,
+            _failing_then(AgentConnectionError("1"), AgentConnectionError("2")),
+        ):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_a_stream_that_failed_midway_is_not_retried():
+    """Test that a partly delivered response is never sent again."""
+
+    async def open_stream():
+        yield "partial"
+        raise AgentConnectionError("lost")
+
+    scheduler = RequestScheduler(retry=RetryPolicy(base_delay=0))
+    items = []
+    with pytest.raises(AgentConnectionError):
+        async for item in scheduler.stream("Test", "m", 1, open_stream):
+            items.append(item)
+
+    assert items == ["partial"]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_holds_back_the_whole_lane():
+    """Test that other requests also wait out a provider's Retry-After."""
+    error = AgentConnectionError("slow down")
+    error.retry_after = 0.1
+    scheduler = RequestScheduler(retry=RetryPolicy(base_delay=0.001))
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def rate_limited():
+        open_stream = _failing_then(error, ["retried"])
+        return [item async for item in scheduler.stream("Test", "m", 1, open_stream)]
+
+    async def later():
+        await asyncio.sleep(0.02)
+        await scheduler.acquire("Test", "m", 1)
+        return loop.time() - start
+
+    items, waited = await asyncio.gather(rate_limited(), later())
+
+    assert items == ["retried"]
+    assert waited >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_waiting_requests_take_turns_across_tabs():
+    """Test that one busy tab cannot starve another of the quota."""
+    scheduler = RequestScheduler({"Test": RateLimit(requests_per_minute=6000)})
+    lane = scheduler._lane("Test", "m")
+    lane.requests.take(lane.requests.tokens, asyncio.get_running_loop().time())
+    granted = []
+
+    async def request(tab, name):
+        request_labels.set((("tab", tab),))
+        await scheduler.acquire("Test", "m", 1)
+        granted.append(name)
+
+    tasks = [
+        asyncio.create_task(request("busy", "busy 1")),
+        asyncio.create_task(request("busy", "busy 2")),
+        asyncio.create_task(request("busy", "busy 3")),
+        asyncio.create_task(request("quiet", "quiet 1")),
+    ]
+    await asyncio.gather(*tasks)
+
+    assert granted == ["busy 1", "quiet 1", "busy 2", "busy 3"]
+
+
+@pytest.mark.asyncio
+async def test_waiting_for_the_quota_respects_the_deadline():
+    """Test that a request gives up if the quota frees up too late."""
+    scheduler = RequestScheduler({"Test": RateLimit(requests_per_minute=1)})
+    await scheduler.acquire("Test", "m", 1)
+    deadline = asyncio.get_running_loop().time() + 0.01
+
+    with pytest.raises(AgentTimeoutError):
+        await scheduler.acquire("Test", "m", 1, deadline)
+    assert not scheduler._lane("Test", "m").flows
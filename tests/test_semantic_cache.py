@@ -0,0 +1,150 @@
+"""Unit tests for the semantic response cache and its vector index."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+
+from agent_terminal.agents.errors import AgentConnectionError
+from agent_terminal.agents.timeouts import Timeouts
+from agent_terminal.agents.semantic_cache import (
+    SEMANTIC_CACHE_ENV_VAR,
+    OllamaEmbedder,
+    SemanticCache,
+    VectorIndex,
+)
+
+
+def _vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_search_finds_the_most_similar_entries_in_a_namespace():
+    """Test cosine top-k lookup, restricted to the namespace searched."""
+    index = VectorIndex(max_bytes=2**20)
+    index.add("a", _vector(1, 0, 0), "x")
+    index.add("a", _vector(1, 1, 0), "xy")
+    index.add("a", _vector(0, 0, 1), "z")
+    index.add("b", _vector(1, 0, 0), "other namespace")
+
+    matches = index.search("a", _vector(2, 0.1, 0), k=2)
+
+    assert [match.response for match in matches] == ["x", "xy"]
+    assert matches[0].similarity == pytest.approx(0.9988, abs=1e-3)
+    assert index.search("c", _vector(1, 0, 0)) == []
+    assert len(index.search("b", _vector(0, 0, 1), k=5)) == 1
+
+
+def test_the_least_recently_used_entries_are_evicted_at_the_memory_cap():
+    """Test that the index stays within max_bytes, keeping what is used."""
+    # Each entry takes 3 * 4 bytes of vector, 16 of bookkeeping and 1 of
+    # text, and the namespace 1 byte and 16 of bookkeeping.
+    index = VectorIndex(max_bytes=3 * 29 + 17)
+    for response, vector in (("x", (1, 0, 0)), ("y", (0, 1, 0)), ("z", (0, 0, 1))):
+        index.add("a", _vector(*vector), response)
+    index.search("a", _vector(1, 0, 0))
+
+    index.add("a", _vector(1, 1, 1), "w")
+
+    assert len(index) == 3
+    assert index.nbytes <= index.max_bytes
+    remaining = {match.response for match in index.search("a", _vector(1, 1, 1), 3)}
+    assert remaining == {"x", "z", "w"}
+
+
+def test_namespaces_are_forgotten_with_their_last_entry():
+    """Test that one namespace per conversation does not grow without bound."""
+    # Room for two entries of 1 byte of text in namespaces of 7 bytes.
+    index = VectorIndex(max_bytes=2 * (12 + 16 + 1) + 2 * (7 + 16))
+    for turn in range(10, 100):
+        index.add(f"turn {turn}", _vector(1, 0, 0), "x")
+
+    assert len(index) == 2
+    assert len(index._namespace_ids) == 2
+    assert index.nbytes <= index.max_bytes
+    assert index.search("turn 10", _vector(1, 0, 0)) == []
+    assert index.search("turn 99", _vector(1, 0, 0))[0].response == "x"
+
+
+def test_vectors_must_all_have_the_same_dimension():
+    """Test that mixing embedding models is caught."""
+    index = VectorIndex(max_bytes=2**20)
+    index.add("a", _vector(1, 0), "x")
+
+    with pytest.raises(ValueError, match="dimension 2"):
+        index.add("a", _vector(1, 0, 0), "y")
+
+
+@pytest.mark.asyncio
+async def test_only_prompts_above_the_threshold_are_answered():
+    """Test the similarity threshold, and that embedding failures are misses."""
+    embeddings = {
+        "What is the capital of France?": _vector(1, 0.1, 0),
+        "Which city is France's capital?": _vector(1, 0.15, 0),
+        "How tall is Everest?": _vector(0, 1, 0),
+    }
+    cache = SemanticCache(
+        AsyncMock(side_effect=lambda text, timeouts: embeddings[text]),
+        threshold=0.95,
+    )
+    vector = await cache.embed("What is the capital of France?")
+    cache.put("ns", vector, "Paris.")
+
+    assert cache.get("ns", await cache.embed("Which city is France's capital?")) == (
+        "Paris."
+    )
+    assert cache.get("ns", await cache.embed("How tall is Everest?")) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.embed_text.side_effect = AgentConnectionError("down")
+    assert await cache.embed("Anything") is None
+
+
+@pytest.mark.asyncio
+async def test_embedding_counts_towards_the_request_deadline():
+    """Test that a hung embedding model is a miss rather than a hang."""
+
+    async def hang(text, timeouts):
+        await asyncio.sleep(60)
+
+    cache = SemanticCache(hang)
+    deadline = asyncio.get_running_loop().time() + 0.05
+
+    assert await cache.embed("Hi", deadline=deadline) is None
+
+
+@pytest.mark.asyncio
+async def test_embeddings_are_requested_within_the_agent_timeouts():
+    """Test that the embedding client is given the agent's timeouts."""
+    timeouts = Timeouts(connect=1, read=2, total=3)
+    client = AsyncMock()
+    client.embeddings.return_value = {"embedding": [0.5, 0.5]}
+
+    with patch(
+        "agent_terminal.agents.semantic_cache.client_registry.get_ollama_client",
+        return_value=client,
+    ) as get_client:
+        vector = await OllamaEmbedder("nomic-embed-text")("Hi", timeouts)
+
+    get_client.assert_called_once_with(timeouts=timeouts)
+    assert vector.tolist() == [0.5, 0.5]
+
+
+def test_the_cache_is_configured_from_the_environment(monkeypatch):
+    """Test the embedding model and settings syntax."""
+    monkeypatch.setenv(
+        SEMANTIC_CACHE_ENV_VAR, "nomic-embed-text,threshold=0.8,max_mb=2"
+    )
+    cache = SemanticCache.from_env()
+
+    assert isinstance(cache.embed_text, OllamaEmbedder)
+    assert cache.embed_text.model == "nomic-embed-text"
+    assert cache.threshold == 0.8
+    assert cache.index.max_bytes == 2 * 2**20
+
+    monkeypatch.setenv(SEMANTIC_CACHE_ENV_VAR, "nomic-embed-text,size=1")
+    with pytest.raises(ValueError, match=SEMANTIC_CACHE_ENV_VAR):
+        SemanticCache.from_env()
+    monkeypatch.delenv(SEMANTIC_CACHE_ENV_VAR)
+    assert SemanticCache.from_env() is None
@@ -0,0 +1,88 @@
+"""Unit tests for session persistence."""
+
+import pytest
+
+from agent_terminal.session import (
+    SESSION_DIR_ENV_VAR,
+    SavedMessage,
+    SavedTab,
+    Session,
+    _read_records_reversed,
+)
+
+
+@pytest.fixture
+def session(tmp_path):
+    """A session stored in a temporary directory."""
+    session = Session(tmp_path / "session")
+    yield session
+    session.close()
+
+
+def test_from_env_is_opt_in(monkeypatch, tmp_path):
+    """Test that sessions are only saved when the variable is set."""
+    monkeypatch.delenv(SESSION_DIR_ENV_VAR, raising=False)
+    assert Session.from_env() is None
+
+    monkeypatch.setenv(SESSION_DIR_ENV_VAR, str(tmp_path / "saved"))
+    session = Session.from_env()
+    assert session.directory == tmp_path / "saved"
+    session.close()
+
+
+def test_open_tabs_and_their_history_are_restored(session):
+    """Test that open tabs, messages and turns survive a restart."""
+    log = session.open_tab("agent_1", "OllamaAgent: llama3", ("OllamaAgent", "llama3"))
+    log.message("User", "bold", "Hi")
+    log.turn("Hi", "Hello!")
+    log.message("OllamaAgent", "bold blue", "Hello!", markdown=True)
+    session.open_tab("agent_2", "VC: me", ("VoiceCloningAgent", "gpt-4o", "me.wav"))
+    session.close_tab("agent_2")
+    session.close()
+
+    restored = Session(session.directory)
+    assert restored.load_tabs() == [
+        SavedTab("agent_1", "OllamaAgent: llama3", ("OllamaAgent", "llama3"))
+    ]
+    messages, turns = restored.read_tab("agent_1")
+    assert messages == [
+        SavedMessage("User", "bold", "Hi"),
+        SavedMessage("OllamaAgent", "bold blue", "Hello!", True),
+    ]
+    assert turns == [("Hi", "Hello!")]
+    assert not (session.directory / "agent_2.jsonl").exists()
+    # Loading compacts the tab list to the tabs that are still open.
+    assert (session.directory / "tabs.jsonl").read_text().count("\n") == 1
+    restored.close()
+
+
+def test_tail_is_read_from_the_end_of_the_log(session):
+    """Test that the latest messages are found without reading the whole log."""
+    log = session.open_tab("agent_1", "Agent", ("OpenAIAgent", "gpt-4o"))
+    for i in range(100):
+        log.message("User", "bold", f"message {i} ✓")
+        log.turn(f"message {i} ✓", "ok")
+    session.close()
+
+    tail = session.read_tail("agent_1", 3)
+
+    assert [message.text for message in tail] == [
+        f"message {i} ✓" for i in (97, 98, 99)
+    ]
+    records = list(
+        _read_records_reversed(session.directory / "agent_1.jsonl", block_size=7)
+    )
+    assert len(records) == 200
+    assert records[0] == {"turn": ["message 99 ✓", "ok"]}
+
+
+def test_torn_last_record_is_skipped(session):
+    """Test that a record cut short by a crash does not break restoring."""
+    log = session.open_tab("agent_1", "Agent", ("OpenAIAgent", "gpt-4o"))
+    log.message("User", "bold", "Hi")
+    session.close()
+    with (session.directory / "agent_1.jsonl").open("a") as file:
+        file.write('{"message": ["User", "bo')
+
+    assert session.read_tail("agent_1", 10) == [SavedMessage("User", "bold", "Hi")]
+    assert session.read_tab("agent_1")[0] == [SavedMessage("User", "bold", "Hi")]
@@ -0,0 +1,405 @@
+"""Unit tests for the streaming response API of the text agents."""
+
+import asyncio
+import contextlib
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import ollama
+import openai
+import pytest
+
+from agent_terminal.agents.cache import ResponseCache
+from agent_terminal.agents.errors import (
+    AgentConnectionError,
+    AgentTimeoutError,
+    ModelNotFoundError,
+    ProviderError,
+)
+from agent_terminal.agents.ollama_agent import OllamaAgent
+from agent_terminal.agents.openai_agent import OpenAIAgent
+from agent_terminal.agents.residency import FAILED, LOADED, ModelResidency
+from agent_terminal.agents.scheduler import RequestScheduler, RetryPolicy
+from agent_terminal.agents.semantic_cache import SemanticCache
+from agent_terminal.agents.timeouts import Timeouts, request_deadline
+
+pytestmark = pytest.mark.asyncio
+
+# Sends every request once, so errors reach the test without being retried.
+NO_RETRIES = RequestScheduler(retry=RetryPolicy(max_attempts=1))
+
+
+async def _aiter(items):
+    """Wraps a list in an async iterator, like a streamed API response."""
+    for item in items:
+        yield item
+
+
+class _OpenAIStream:
+    """A stand-in for the SDK's AsyncStream, which is closed with close()."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __aiter__(self):
+        return _aiter(self.chunks)
+
+    async def close(self):
+        self.closed = True
+
+
+def _openai_chunk(content, usage=None):
+    """Builds a minimal stand-in for an OpenAI ChatCompletionChunk."""
+    if usage is not None:
+        # The final chunk of a stream carries usage and no choices.
+        return SimpleNamespace(choices=[], usage=usage)
+    delta = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+@pytest.fixture
+def mock_openai_client(monkeypatch):
+    """Patches the shared OpenAI client so no real API calls are made."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    with patch("agent_terminal.agents.openai_agent.client_registry") as mock_registry:
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock()
+        mock_registry.get_openai_client.return_value = client
+        yield client
+
+
+async def test_openai_stream_response_yields_chunks(mock_openai_client):
+    """Test that OpenAIAgent yields each content delta as it arrives."""
+    mock_openai_client.chat.completions.create.return_value = _OpenAIStream(
+        [_openai_chunk("Hello"), _openai_chunk(None), _openai_chunk(", world")]
+    )
+    agent = OpenAIAgent(model="gpt-4o")
+
+    chunks = [chunk async for chunk in agent.stream_response("Hi")]
+
+    assert chunks == ["Hello", ", world"]
+    kwargs = mock_openai_client.chat.completions.create.call_args.kwargs
+    assert kwargs["stream"] is True
+    assert kwargs["messages"][-1] == {"role": "user", "content": "Hi"}
+
+
+async def test_openai_get_response_joins_stream(mock_openai_client):
+    """Test that get_response returns the concatenated stream."""
+    mock_openai_client.chat.completions.create.return_value = _OpenAIStream(
+        [_openai_chunk("Hello"), _openai_chunk(", world")]
+    )
+    agent = OpenAIAgent(model="gpt-4o")
+
+    assert await agent.get_response("Hi") == "Hello, world"
+
+
+async def test_openai_sends_conversation_history(mock_openai_client):
+    """Test that completed turns are sent as context with the next prompt."""
+    mock_openai_client.chat.completions.create.side_effect = [
+        _OpenAIStream([_openai_chunk("Paris.")]),
+        _OpenAIStream([_openai_chunk("About 2 million.")]),
+    ]
+    agent = OpenAIAgent(model="gpt-4o")
+
+    await agent.get_response("Capital of France?")
+    await agent.get_response("Population?")
+
+    messages = mock_openai_client.chat.completions.create.call_args.kwargs["messages"]
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "user"]
+    assert messages[2] == {"role": "assistant", "content": "Paris."}
+    assert messages[3] == {"role": "user", "content": "Population?"}
+
+
+async def test_openai_replays_cached_response(mock_openai_client, tmp_path):
+    """Test that a repeated request is answered from the cache."""
+    mock_openai_client.chat.completions.create.return_value = _OpenAIStream(
+        [_openai_chunk("Hello"), _openai_chunk(", world")]
+    )
+    cache = ResponseCache(tmp_path / "cache.sqlite3")
+    first_agent = OpenAIAgent(model="gpt-4o", cache=cache)
+    second_agent = OpenAIAgent(model="gpt-4o", cache=cache)
+
+    assert await first_agent.get_response("Hi") == "Hello, world"
+    chunks = [chunk async for chunk in second_agent.stream_response("Hi")]
+
+    assert chunks == ["Hello, world"]
+    assert mock_openai_client.chat.completions.create.await_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(second_agent.history) == 1
+    cache.close()
+
+
+async def test_openai_records_usage_from_final_chunk(mock_openai_client):
+    """Test that the usage chunk sent at the end of a stream is recorded."""
+    usage = SimpleNamespace(prompt_tokens=12, completion_tokens=3)
+    mock_openai_client.chat.completions.create.return_value = _OpenAIStream(
+        [_openai_chunk("Hi there"), _openai_chunk(None, usage=usage)]
+    )
+    agent = OpenAIAgent(model="gpt-4o")
+
+    assert await agent.get_response("Hi") == "Hi there"
+    assert agent.last_usage == {"prompt_tokens": 12, "completion_tokens": 3}
+
+
+async def test_openai_empty_stream(mock_openai_client):
+    """Test that an empty stream produces a readable message."""
+    mock_openai_client.chat.completions.create.return_value = _OpenAIStream([])
+    agent = OpenAIAgent(model="gpt-4o")
+
+    assert await agent.get_response("Hi") == "The AI returned an empty response."
+
+
+async def test_ollama_stream_response_yields_chunks():
+    """Test that OllamaAgent requests a stream and yields message content."""
+    parts = [
+        {"message": {"content": "Hel"}, "done": False},
+        {"message": {"content": "lo"}, "done": False},
+        {
+            "message": {"content": ""},
+            "done": True,
+            "prompt_eval_count": 7,
+            "eval_count": 2,
+        },
+    ]
+    with patch("agent_terminal.agents.ollama_agent.client_registry") as mock_registry:
+        client = mock_registry.get_ollama_client.return_value
+        client.chat = AsyncMock(return_value=_aiter(parts))
+        agent = OllamaAgent(model="llama3")
+
+        chunks = [chunk async for chunk in agent.stream_response("Hi")]
+
+    assert chunks == ["Hel", "lo"]
+    assert agent.last_usage == {"prompt_tokens": 7, "completion_tokens": 2}
+    assert client.chat.call_args.kwargs["stream"] is True
+    assert client.chat.call_args.kwargs["keep_alive"] == "30m"
+
+
+async def test_ollama_warm_up_loads_the_model_with_its_keep_alive():
+    """Test that warming up asks Ollama to load the model without a prompt."""
+    with patch("agent_terminal.agents.ollama_agent.client_registry") as mock_registry:
+        client = mock_registry.get_ollama_client.return_value
+        client.generate = AsyncMock(return_value={"done": True})
+        residency = ModelResidency()
+        agent = OllamaAgent(model="llama3", keep_alive=-1, residency=residency)
+
+        await agent.warm_up()
+
+    client.generate.assert_awaited_once_with(model="llama3", keep_alive=-1)
+    assert residency.state("llama3") == LOADED
+
+
+async def test_ollama_warm_up_reports_a_missing_model():
+    """Test that a model that cannot be loaded fails the same way a prompt does."""
+    with patch("agent_terminal.agents.ollama_agent.client_registry") as mock_registry:
+        client = mock_registry.get_ollama_client.return_value
+        client.generate = AsyncMock(
+            side_effect=ollama.ResponseError("model 'nope' not found", 404)
+        )
+        residency = ModelResidency()
+        agent = OllamaAgent(model="nope", residency=residency)
+
+        with pytest.raises(ModelNotFoundError):
+            await agent.warm_up()
+
+    assert residency.state("nope") == FAILED
+
+
+async def test_ollama_connection_error_is_raised():
+    """Test that connection failures raise a structured, retryable error."""
+    with patch("agent_terminal.agents.ollama_agent.client_registry") as mock_registry:
+        client = mock_registry.get_ollama_client.return_value
+        client.chat = AsyncMock(side_effect=httpx.ConnectError("refused"))
+        agent = OllamaAgent(model="llama3", scheduler=NO_RETRIES)
+
+        with pytest.raises(AgentConnectionError) as excinfo:
+            await agent.get_response("Hi")
+
+    assert "Could not connect to Ollama service" in str(excinfo.value)
+    assert excinfo.value.hint and excinfo.value.retryable
+
+
+async def test_ollama_missing_model_is_not_reported_as_a_connection_error():
+    """Test that API errors are told apart from connection failures."""
+    with patch("agent_terminal.agents.ollama_agent.client_registry") as mock_registry:
+        client = mock_registry.get_ollama_client.return_value
+        client.chat = AsyncMock(
+            side_effect=ollama.ResponseError("model 'nope' not found", 404)
+        )
+        agent = OllamaAgent(model="nope")
+
+        with pytest.raises(ModelNotFoundError, match="Model 'nope' not found"):
+            await agent.get_response("Hi")
+
+
+async def test_openai_rate_limit_is_a_retryable_provider_error(mock_openai_client):
+    """Test that API status errors keep their status code."""
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(
+        429, headers={"retry-after-ms": "1500"}, request=request
+    )
+    mock_openai_client.chat.completions.create.side_effect = openai.RateLimitError(
+        "Rate limit reached", response=response, body=None
+    )
+    agent = OpenAIAgent(model="gpt-4o", scheduler=NO_RETRIES)
+
+    with pytest.raises(ProviderError) as excinfo:
+        await agent.get_response("Hi")
+
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.retryable
+    assert excinfo.value.retry_after == 1.5
+
+
+async def test_identical_prompts_in_flight_share_one_request(mock_openai_client):
+    """Test that two tabs asking the same thing at once make one API call."""
+    release = asyncio.Event()
+
+    class SlowStream(_OpenAIStream):
+        async def _chunks(self):
+            await release.wait()
+            yield _openai_chunk("Hello")
+
+        def __aiter__(self):
+            return self._chunks()
+
+    mock_openai_client.chat.completions.create.return_value = SlowStream([])
+    agents = [OpenAIAgent(model="gpt-4o"), OpenAIAgent(model="gpt-4o")]
+
+    responses = asyncio.gather(*(agent.get_response("Hi") for agent in agents))
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await responses == ["Hello", "Hello"]
+    assert mock_openai_client.chat.completions.create.call_count == 1
+    assert all(len(agent.history) == 1 for agent in agents)
+
+
+async def test_a_shared_request_outlives_a_requester_with_a_shorter_deadline(
+    mock_openai_client,
+):
+    """Test that each requester of a shared request keeps its own deadline."""
+    release = asyncio.Event()
+
+    class SlowStream(_OpenAIStream):
+        async def _chunks(self):
+            await release.wait()
+            yield _openai_chunk("Hello")
+
+        def __aiter__(self):
+            return self._chunks()
+
+    mock_openai_client.chat.completions.create.return_value = SlowStream([])
+    hasty = OpenAIAgent(model="gpt-4o", timeouts=Timeouts(total=0.05))
+    patient = OpenAIAgent(model="gpt-4o")
+
+    hasty_response = asyncio.create_task(hasty.get_response("Hi"))
+    patient_response = asyncio.create_task(patient.get_response("Hi"))
+    with pytest.raises(AgentTimeoutError):
+        await hasty_response
+    release.set()
+
+    assert await patient_response == "Hello"
+    assert mock_openai_client.chat.completions.create.call_count == 1
+
+
+async def test_rephrased_prompts_are_answered_from_the_semantic_cache(
+    mock_openai_client,
+):
+    """Test that a prompt meaning the same as an earlier one is not sent."""
+    embeddings = {"Capital of France?": [1.0, 0.1], "France's capital?": [1.0, 0.12]}
+    semantic_cache = SemanticCache(
+        AsyncMock(side_effect=lambda text, timeouts: embeddings[text])
+    )
+    mock_openai_client.chat.completions.create.return_value = _OpenAIStream(
+        [_openai_chunk("Paris.")]
+    )
+    first = OpenAIAgent(model="gpt-4o", semantic_cache=semantic_cache)
+    second = OpenAIAgent(model="gpt-4o", semantic_cache=semantic_cache)
+    other_model = OpenAIAgent(model="gpt-4o-mini", semantic_cache=semantic_cache)
+
+    assert await first.get_response("Capital of France?") == "Paris."
+    assert await second.get_response("France's capital?") == "Paris."
+    assert mock_openai_client.chat.completions.create.call_count == 1
+    assert len(second.history) == 1
+
+    await other_model.get_response("France's capital?")
+    assert mock_openai_client.chat.completions.create.call_count == 2
+
+
+async def test_rate_limited_requests_are_retried(mock_openai_client):
+    """Test that a 429 is retried by the scheduler instead of shown."""
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": "0"}, request=request)
+    mock_openai_client.chat.completions.create.side_effect = [
+        openai.RateLimitError("Rate limit reached", response=response, body=None),
+        _OpenAIStream([_openai_chunk("Hello")]),
+    ]
+    scheduler = RequestScheduler(retry=RetryPolicy(base_delay=0.001))
+    agent = OpenAIAgent(model="gpt-4o", scheduler=scheduler)
+
+    assert await agent.get_response("Hi") == "Hello"
+    assert mock_openai_client.chat.completions.create.call_count == 2
+
+
+async def test_stalled_stream_times_out_and_is_closed(mock_openai_client):
+    """Test that the total timeout ends a stalled stream and closes it."""
+    stalled = asyncio.Event()
+
+    class StalledStream(_OpenAIStream):
+        async def _chunks(self):
+            yield _openai_chunk("Hello")
+            await stalled.wait()
+
+        def __aiter__(self):
+            return self._chunks()
+
+    stream = StalledStream([])
+    mock_openai_client.chat.completions.create.return_value = stream
+    agent = OpenAIAgent(model="gpt-4o", timeouts=Timeouts(total=0.05))
+
+    chunks = []
+    with pytest.raises(AgentTimeoutError):
+        async for chunk in agent.stream_response("Hi"):
+            chunks.append(chunk)
+
+    assert chunks == ["Hello"]
+    assert stream.closed
+    assert len(agent.history) == 0
+
+
+async def test_cancelling_the_consumer_closes_the_stream(mock_openai_client):
+    """Test that a cancelled request aborts its HTTP stream right away."""
+    stream = _OpenAIStream([_openai_chunk("Hello"), _openai_chunk(", world")])
+    mock_openai_client.chat.completions.create.return_value = stream
+    agent = OpenAIAgent(model="gpt-4o")
+
+    async with contextlib.aclosing(agent.stream_response("Hi")) as response:
+        assert await response.__anext__() == "Hello"
+
+    assert stream.closed
+
+
+async def test_inherited_deadline_wins_over_a_longer_timeout():
+    """Test that a request never outlives the request it is part of."""
+    loop = asyncio.get_running_loop()
+    token = request_deadline.set(loop.time() + 1)
+    try:
+        deadline = Timeouts(total=60).deadline()
+    finally:
+        request_deadline.reset(token)
+
+    assert deadline <= loop.time() + 1
+    assert Timeouts(total=None).deadline() is None
+
+
+async def test_timeouts_are_read_from_the_environment(monkeypatch):
+    """Test that AGENT_TERMINAL_TIMEOUTS overrides individual timeouts."""
+    monkeypatch.setenv("AGENT_TERMINAL_TIMEOUTS", "connect=2, total=none")
+
+    assert Timeouts.from_env() == Timeouts(connect=2.0, read=60.0, total=None)
+
+    monkeypatch.setenv("AGENT_TERMINAL_TIMEOUTS", "patience=3")
+    with pytest.raises(ValueError, match="patience"):
+        Timeouts.from_env()
@@ -0,0 +1,152 @@
+"""Unit tests for running and sharing TTS models off the event loop."""
+
+import asyncio
+import threading
+
+import pytest
+
+from agent_terminal.audio.tts import TTSExecutor, TTSModelRegistry
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_run_calls_function_on_worker_thread():
+    """Test that blocking calls run on the executor's thread, not the loop's."""
+    executor = TTSExecutor()
+
+    thread_name = await executor.run(lambda: threading.current_thread().name)
+
+    assert thread_name.startswith("tts")
+    executor.shutdown()
+
+
+async def test_run_passes_arguments_and_returns_result():
+    """Test that arguments are forwarded and the result returned."""
+    executor = TTSExecutor()
+
+    assert await executor.run(pow, 2, exp=10) == 1024
+    executor.shutdown()
+
+
+async def test_callers_wait_for_a_free_slot():
+    """Test that no more than max_pending calls are queued at once."""
+    executor = TTSExecutor(max_pending=1)
+    release = threading.Event()
+
+    first = asyncio.create_task(executor.run(release.wait))
+    second = asyncio.create_task(executor.run(lambda: "second"))
+    await asyncio.sleep(0.05)
+
+    # The second call is held back until the first one finishes.
+    assert not second.done()
+    release.set()
+    assert await first is True
+    assert await second == "second"
+    executor.shutdown()
+
+
+async def test_cancelled_call_that_has_not_started_is_dropped():
+    """Test that cancelling a queued call means it never runs."""
+    executor = TTSExecutor(max_pending=2)
+    release = threading.Event()
+    calls = []
+
+    first = asyncio.create_task(executor.run(release.wait))
+    second = asyncio.create_task(executor.run(calls.append, "ran"))
+    await asyncio.sleep(0.05)
+    second.cancel()
+    await asyncio.sleep(0.01)
+    release.set()
+    await first
+    await asyncio.sleep(0.05)
+
+    assert second.cancelled()
+    assert calls == []
+    executor.shutdown()
+
+
+async def test_registry_loads_each_device_once():
+    """Test that concurrent users of a device share a single load."""
+    loads = []
+    registry = TTSModelRegistry(loader=lambda device: loads.append(device) or object())
+
+    async def use():
+        async with registry.use("cpu") as tts:
+            await asyncio.sleep(0.01)
+            return tts.model
+
+    models = await asyncio.gather(use(), use(), use())
+
+    assert loads == ["cpu"]
+    assert models[0] is models[1] is models[2]
+
+
+async def test_registry_serializes_inference():
+    """Test that calls on a shared model never overlap."""
+    registry = TTSModelRegistry(loader=lambda device: object())
+    active = []
+    overlaps = []
+
+    def infer():
+        active.append(1)
+        overlaps.append(len(active))
+        threading.Event().wait(0.01)
+        active.pop()
+
+    async def use():
+        async with registry.use() as tts:
+            await tts.executor.run(infer)
+
+    await asyncio.gather(use(), use(), use())
+
+    assert overlaps == [1, 1, 1]
+
+
+async def test_registry_unloads_idle_model():
+    """Test that a model without users is dropped after the idle timeout."""
+    loads = []
+    registry = TTSModelRegistry(
+        idle_timeout=0.05, loader=lambda device: loads.append(device) or object()
+    )
+
+    async with registry.use():
+        pass
+    assert registry.is_loaded()
+    await asyncio.sleep(0.1)
+    assert not registry.is_loaded()
+
+    # The next user loads it again.
+    async with registry.use():
+        pass
+    assert loads == [None, None]
+
+
+async def test_registry_keeps_model_reused_before_timeout():
+    """Test that a new user cancels the pending unload."""
+    registry = TTSModelRegistry(idle_timeout=0.05, loader=lambda device: object())
+
+    async with registry.use():
+        pass
+    async with registry.use():
+        await asyncio.sleep(0.1)
+        assert registry.is_loaded()
+
+
+async def test_registry_retries_failed_load():
+    """Test that a failed load is not cached."""
+    attempts = []
+
+    def loader(device):
+        attempts.append(device)
+        if len(attempts) == 1:
+            raise RuntimeError("out of memory")
+        return object()
+
+    registry = TTSModelRegistry(loader=loader)
+
+    with pytest.raises(RuntimeError, match="out of memory"):
+        async with registry.use():
+            pass
+    async with registry.use() as tts:
+        assert tts.model is not None
+    assert len(attempts) == 2
@@ -1,12 +1,19 @@
 """Unit tests for the VoiceCloningAgent."""
 
 import asyncio
-from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from agent_terminal.agents.voice_cloning_agent import VoiceCloningAgent
+from agent_terminal.audio.tts import TTSModelRegistry
+
+
+async def fake_text_stream(prompt: str):
+    """Streams a two-sentence text response in uneven chunks."""
+    yield "This is a test"
+    yield " response. And this is"
+    yield " the second sentence."
 
 
 @pytest.fixture
@@ -17,17 +24,19 @@ def mock_dependencies():
     ) as mock_openai_agent, patch(
         "chatterbox.tts.ChatterboxTTS", autospec=True
     ) as mock_chatterbox, patch(
-        "agent_terminal.agents.voice_cloning_agent.sf", autospec=True
-    ) as mock_soundfile, patch(
-        "agent_terminal.agents.voice_cloning_agent.sd", autospec=True
-    ) as mock_sounddevice, patch(
+        "agent_terminal.agents.voice_cloning_agent.playback_service"
+    ) as mock_playback_service, patch(
+        "agent_terminal.agents.voice_cloning_agent.conditioning_cache"
+    ) as mock_conditioning_cache, patch(
+        "agent_terminal.agents.voice_cloning_agent.tts_model_registry",
+        TTSModelRegistry(),
+    ) as registry, patch(
         "agent_terminal.agents.voice_cloning_agent.Path.is_file", return_value=True
-    ), patch(
-        "agent_terminal.agents.voice_cloning_agent.Path.unlink"
-    ) as mock_unlink:
+    ):
         # Configure the ChatterboxTTS mock
         mock_tts_instance = MagicMock()
         mock_tts_instance.generate.return_value = MagicMock()  # Mock waveform
+        mock_tts_instance.sr = 24000
         mock_chatterbox.from_pretrained.return_value = mock_tts_instance
 
         # Configure the OpenAIAgent mock
@@ -35,19 +44,23 @@ def mock_dependencies():
         mock_openai_instance.get_response = AsyncMock(
             return_value="This is a test response."
         )
+        mock_openai_instance.stream_response = MagicMock(side_effect=fake_text_stream)
         mock_openai_agent.return_value = mock_openai_instance
 
-        # Configure the soundfile mock to return dummy data
-        mock_soundfile.read.return_value = (MagicMock(), 44100)
+        # Configure the playback mock so clips finish playing immediately
+        mock_clip = mock_playback_service.play.return_value
+        mock_clip.wait = AsyncMock()
+        mock_clip.finished = False
 
         yield {
+            "conditioning_cache": mock_conditioning_cache,
+            "registry": registry,
             "openai_agent": mock_openai_agent,
             "chatterbox": mock_chatterbox,
-            "soundfile": mock_soundfile,
-            "sounddevice": mock_sounddevice,
-            "unlink": mock_unlink,
+            "playback_service": mock_playback_service,
             "tts_instance": mock_tts_instance,
             "openai_instance": mock_openai_instance,
+            "clip": mock_clip,
         }
 
 
@@ -56,9 +69,11 @@ def test_initialization_success(mock_dependencies):
     agent = VoiceCloningAgent(model="gpt-4o", audio_path="/fake/path/voice.wav")
     assert agent.model == "gpt-4o"
     assert agent.audio_path == "/fake/path/voice.wav"
-    assert agent.tts_model is None
+    assert not mock_dependencies["registry"].is_loaded()
     mock_dependencies["chatterbox"].from_pretrained.assert_not_called()
-    mock_dependencies["openai_agent"].assert_called_once_with(model="gpt-4o")
+    mock_dependencies["openai_agent"].assert_called_once_with(
+        model="gpt-4o", timeouts=agent.timeouts
+    )
 
 
 def test_initialization_file_not_found():
@@ -72,7 +87,7 @@ def test_initialization_file_not_found():
 async def test_get_response(mock_dependencies):
     """Test the complete get_response flow, including lazy model loading."""
     agent = VoiceCloningAgent(model="gpt-4o", audio_path="/fake/path/voice.wav")
-    assert agent.tts_model is None
+    assert not mock_dependencies["registry"].is_loaded()
 
     prompt = "Tell me a story."
     response = await agent.get_response(prompt)
@@ -82,24 +97,151 @@ async def test_get_response(mock_dependencies):
 
     # Verify the TTS model was lazy-loaded
     mock_dependencies["chatterbox"].from_pretrained.assert_called_once()
-    assert agent.tts_model is not None
+    assert mock_dependencies["registry"].is_loaded()
 
-    # Verify the text agent was called correctly
-    mock_dependencies["openai_instance"].get_response.assert_awaited_once_with(prompt)
+    # Verify the text agent was streamed with the prompt
+    mock_dependencies["openai_instance"].stream_response.assert_called_once_with(
+        prompt
+    )
 
-    # Verify the TTS model was used correctly
-    mock_dependencies["tts_instance"].generate.assert_called_once_with(
-        "This is a test response.",
-        audio_prompt_path="/fake/path/voice.wav",
+    # Verify the cached voice was used for each sentence, synthesized in order
+    tts = mock_dependencies["tts_instance"]
+    conditioning_cache = mock_dependencies["conditioning_cache"]
+    conditioning_cache.get.assert_called_once_with(tts, "/fake/path/voice.wav")
+    assert tts.conds is conditioning_cache.get.return_value
+    assert [c.args for c in tts.generate.call_args_list] == [
+        ("This is a test response.",),
+        ("And this is the second sentence.",),
+    ]
+
+    # Verify every sentence was queued as one clip on the agent's channel
+    mock_dependencies["playback_service"].play.assert_called_once_with(
+        agent.channel, 24000
     )
+    clip = mock_dependencies["clip"]
+    assert clip.write.call_count == 2
+    clip.end.assert_called_once()
+    clip.wait.assert_awaited_once()
 
-    # Verify the audio was saved
-    mock_dependencies["soundfile"].write.assert_called_once()
 
-    # Allow the async _play_audio task to run
-    await asyncio.sleep(0.01)
+@pytest.mark.asyncio
+async def test_stream_announces_playback_after_first_sentence(mock_dependencies):
+    """Test that playback is announced before the rest is synthesized."""
+    agent = VoiceCloningAgent(model="gpt-4o", audio_path="/fake/path/voice.wav")
+    tts = mock_dependencies["tts_instance"]
+
+    stream = agent.stream_response("Tell me a story.")
+    first_chunk = await stream.__anext__()
+
+    assert first_chunk == "Playing audio response for: 'Tell me a story.'"
+    assert tts.generate.call_count == 1
+
+    # Closing the stream early drops the clip from playback.
+    await stream.aclose()
+    mock_dependencies["clip"].cancel.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_agents_share_one_tts_model(mock_dependencies):
+    """Test that several voice agents load the TTS model only once."""
+    first = VoiceCloningAgent(model="gpt-4o", audio_path="/fake/path/one.wav")
+    second = VoiceCloningAgent(model="gpt-4o", audio_path="/fake/path/two.wav")
+
+    await asyncio.gather(first.get_response("Hi."), second.get_response("Hey."))
+
+    mock_dependencies["chatterbox"].from_pretrained.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_response_is_exported_when_complete(mock_dependencies):
+    """Test that a finished response is saved by the exporter."""
+    exporter = MagicMock()
+    agent = VoiceCloningAgent(
+        model="gpt-4o", audio_path="/fake/path/voice.wav", exporter=exporter
+    )
+
+    await agent.get_response("Tell me a story.")
+
+    exporter.start.assert_called_once_with("voice", 24000)
+    recording = exporter.start.return_value
+    assert recording.write.call_count == 2
+    recording.finish.assert_called_once()
+    recording.discard.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_unplayed_speech_is_exported_and_the_text_returned(mock_dependencies):
+    """Test that without playback the response text is yielded instead."""
+    exporter = MagicMock()
+    agent = VoiceCloningAgent(
+        model="gpt-4o", audio_path="/fake/path/voice.wav", exporter=exporter, play=False
+    )
+
+    response = await agent.get_response("Tell me a story.")
+
+    assert response == "This is a test response. And this is the second sentence."
+    mock_dependencies["playback_service"].play.assert_not_called()
+    recording = exporter.start.return_value
+    assert recording.write.call_count == 2
+    assert agent.last_audio == recording.finish.return_value
+
+
+def test_unplayed_speech_needs_an_exporter(mock_dependencies, monkeypatch):
+    """Test that speech that is neither played nor saved is refused."""
+    monkeypatch.delenv("AGENT_TERMINAL_VOICE_EXPORT", raising=False)
+
+    with pytest.raises(ValueError, match="AGENT_TERMINAL_VOICE_EXPORT"):
+        VoiceCloningAgent(model="gpt-4o", audio_path="/fake/voice.wav", play=False)
+
+
+@pytest.mark.asyncio
+async def test_interrupted_export_is_discarded(mock_dependencies):
+    """Test that an export is removed when the response is cut short."""
+    exporter = MagicMock()
+    agent = VoiceCloningAgent(
+        model="gpt-4o", audio_path="/fake/path/voice.wav", exporter=exporter
+    )
+
+    stream = agent.stream_response("Tell me a story.")
+    await stream.__anext__()
+    await stream.aclose()
+
+    recording = exporter.start.return_value
+    recording.finish.assert_not_called()
+    recording.discard.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_failed_export_does_not_start_the_text_request(mock_dependencies):
+    """Test that no text is requested when the export cannot be started."""
+    exporter = MagicMock()
+    exporter.start.side_effect = OSError("Read-only file system")
+    agent = VoiceCloningAgent(
+        model="gpt-4o", audio_path="/fake/path/voice.wav", exporter=exporter
+    )
+
+    with pytest.raises(OSError, match="Read-only file system"):
+        await agent.get_response("Tell me a story.")
+
+    mock_dependencies["openai_instance"].stream_response.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_skipped_speech_stops_synthesis(mock_dependencies):
+    """Test that skipping a clip stops synthesizing the rest of the response."""
+    clip = mock_dependencies["clip"]
+
+    def skip_after_write(samples):
+        clip.finished = True
+
+    clip.write.side_effect = skip_after_write
+    exporter = MagicMock()
+    agent = VoiceCloningAgent(
+        model="gpt-4o", audio_path="/fake/path/voice.wav", exporter=exporter
+    )
+
+    await agent.get_response("Tell me a story.")
 
-    # Verify audio playback and cleanup
-    mock_dependencies["sounddevice"].play.assert_called_once()
-    mock_dependencies["sounddevice"].wait.assert_called_once()
-    mock_dependencies["unlink"].assert_called_once()
\ No newline at end of file
+    assert mock_dependencies["tts_instance"].generate.call_count == 1
+    clip.end.assert_not_called()
+    exporter.start.return_value.discard.assert_called_once()
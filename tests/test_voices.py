@@ -0,0 +1,73 @@
+"""Unit tests for the speaker conditioning cache."""
+
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from agent_terminal.audio.voices import ConditioningCache
+
+
+@pytest.fixture
+def voice_file(tmp_path):
+    """A reference voice file on disk."""
+    path = tmp_path / "voice.wav"
+    path.write_bytes(b"RIFF fake wav data")
+    return path
+
+
+def make_model():
+    """Builds a stand-in TTS model whose conditioning is a fresh object."""
+    model = MagicMock()
+    model.device = "cpu"
+    model.prepare_conditionals.side_effect = lambda path: setattr(
+        model, "conds", MagicMock(name=f"conds for {path}")
+    )
+    return model
+
+
+def test_conditioning_is_computed_once_per_voice(voice_file):
+    """Test that the voice is encoded once and then served from memory."""
+    cache = ConditioningCache()
+    model = make_model()
+
+    first = cache.get(model, str(voice_file))
+    second = cache.get(model, str(voice_file))
+
+    assert first is second
+    model.prepare_conditionals.assert_called_once_with(str(voice_file))
+
+
+def test_conditioning_is_shared_between_models_on_a_device(voice_file):
+    """Test that agents cloning the same voice share its conditioning."""
+    cache = ConditioningCache()
+    first_model, second_model = make_model(), make_model()
+
+    conditionals = cache.get(first_model, str(voice_file))
+
+    assert cache.get(second_model, str(voice_file)) is conditionals
+    second_model.prepare_conditionals.assert_not_called()
+
+
+def test_modified_voice_file_is_encoded_again(voice_file):
+    """Test that editing the reference file invalidates its conditioning."""
+    cache = ConditioningCache()
+    model = make_model()
+    first = cache.get(model, str(voice_file))
+
+    voice_file.write_bytes(b"RIFF a different recording")
+    os.utime(voice_file, ns=(0, 0))
+
+    assert cache.get(model, str(voice_file)) is not first
+    assert model.prepare_conditionals.call_count == 2
+
+
+def test_conditioning_is_saved_to_the_cache_directory(voice_file, tmp_path):
+    """Test that computed conditioning is persisted when a directory is set."""
+    cache = ConditioningCache(cache_dir=tmp_path / "voices")
+    model = make_model()
+
+    conditionals = cache.get(model, str(voice_file))
+
+    key = ConditioningCache.make_key(str(voice_file), "cpu")
+    conditionals.save.assert_called_once_with(tmp_path / "voices" / f"{key}.pt")